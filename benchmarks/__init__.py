@@ -0,0 +1,4 @@
+"""
+Performance benchmarks for the quiz app
+Run from the project root, e.g. ``python -m benchmarks.bench_quiz_insert``
+"""
@@ -0,0 +1,112 @@
+"""
+Load test: sync views on a fixed pool of WSGI worker threads vs async views on one event loop,
+for concurrent in-request quiz generations against a latency-injecting fake model
+
+    python -m benchmarks.bench_async_views --requests 200 --latency 0.5 --wsgi-workers 8
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import setup_django, test_database, summarize, use_model
+
+
+def make_request(factory, topic):
+    from django.contrib.messages.storage.fallback import FallbackStorage
+    from django.contrib.sessions.backends.db import SessionStore
+
+    request = factory.post('/generate/', {'topic': topic, 'difficulty': 'easy', 'num_questions': 5})
+    request.session = SessionStore()
+    request._messages = FallbackStorage(request)
+    return request
+
+
+def run_wsgi(num_requests, workers):
+    """Each request holds one of `workers` threads (gunicorn sync/gthread) for the whole generation"""
+    from django.db import close_old_connections
+    from django.test import RequestFactory
+    from quiz import views
+
+    factory = RequestFactory()
+
+    def handle(i):
+        started = time.perf_counter()
+        try:
+            response = views.generate_quiz(make_request(factory, f'WSGI topic {i}'))
+        finally:
+            close_old_connections()
+        return time.perf_counter() - started, response.status_code
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(handle, range(num_requests)))
+
+
+def run_asgi(num_requests):
+    """All requests are in flight at once on a single event loop (one uvicorn worker)"""
+    from django.test import AsyncRequestFactory
+    from quiz import async_views
+
+    factory = AsyncRequestFactory()
+
+    async def handle(i):
+        started = time.perf_counter()
+        response = await async_views.generate_quiz(make_request(factory, f'ASGI topic {i}'))
+        return time.perf_counter() - started, response.status_code
+
+    async def main():
+        return await asyncio.gather(*(handle(i) for i in range(num_requests)))
+
+    return asyncio.run(main())
+
+
+def report(label, results, elapsed):
+    latencies = [seconds for seconds, _ in results]
+    errors = sum(1 for _, status in results if status >= 400)
+    stats = summarize(latencies)
+    print(f"  {label:<20} {len(results) / elapsed:>8.1f}  {stats['median_ms']:>9.0f}  "
+          f"{stats['p95_ms']:>9.0f}  {elapsed:>7.2f}  {errors:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help="Concurrent generation requests")
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds per fake model call")
+    parser.add_argument('--wsgi-workers', type=int, default=8, help="Sync worker threads (WSGI side)")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test.utils import override_settings
+    from quiz.fake_llm import FakeGenerativeModel
+    from quiz.generation_cache import reset_generation_cache
+
+    # Generation runs inside the request on both sides; no cache, bank or chunking shortcuts
+    overrides = override_settings(
+        QUIZ_ASYNC_GENERATION=False,
+        QUIZ_BANK_ENABLED=False,
+        QUIZ_GENERATION_CACHE_BACKEND='none',
+        QUIZ_GENERATION_CHUNK_SIZE=0,
+        QUIZ_RATE_LIMIT_CAPACITY=0,
+        QUIZ_ADMISSION_MAX_IN_FLIGHT=0,
+    )
+
+    print(f"{args.requests} generation requests, fake model latency {args.latency}s\n")
+    print(f"  {'server':<20} {'req/s':>8}  {'p50 ms':>9}  {'p95 ms':>9}  {'wall s':>7}  {'errors':>6}")
+
+    with test_database(threaded=True), overrides:
+        reset_generation_cache()
+        model = FakeGenerativeModel(latency=args.latency)
+        with use_model(model):
+            started = time.perf_counter()
+            results = run_wsgi(args.requests, args.wsgi_workers)
+            report(f"WSGI sync x{args.wsgi_workers}", results, time.perf_counter() - started)
+
+            started = time.perf_counter()
+            results = run_asgi(args.requests)
+            report("ASGI async x1 loop", results, time.perf_counter() - started)
+        reset_generation_cache()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Wall-clock time of one-shot vs chunked quiz generation against a latency-simulating fake model
+
+    python -m benchmarks.bench_chunked_generation --latency 0.3 --per-question 0.1
+"""
+
+import argparse
+import time
+
+from benchmarks.utils import setup_django, use_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.3, help="Fixed seconds per model call")
+    parser.add_argument('--per-question', type=float, default=0.1, help="Extra seconds per requested question")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 10, 20])
+    parser.add_argument('--chunk-size', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test.utils import override_settings
+    from quiz.ai_service import ai_quiz_service
+    from quiz.fake_llm import FakeGenerativeModel
+
+    print(f"Fake model: {args.latency}s + {args.per_question}s/question, "
+          f"chunks of {args.chunk_size}, concurrency {args.concurrency}\n")
+    print(f"{'questions':>9}  {'one-shot s':>10}  {'chunked s':>9}  {'speedup':>7}  {'calls':>5}")
+
+    for size in args.sizes:
+        timings = {}
+        for label, chunk_size in (('one-shot', 0), ('chunked', args.chunk_size)):
+            model = FakeGenerativeModel(latency=args.latency, latency_per_question=args.per_question)
+            # Threshold 0: chunk every size measured, not only those above QUIZ_GENERATION_CHUNK_THRESHOLD
+            with override_settings(QUIZ_GENERATION_CHUNK_SIZE=chunk_size, QUIZ_GENERATION_CHUNK_THRESHOLD=0,
+                                   QUIZ_GENERATION_CHUNK_CONCURRENCY=args.concurrency), \
+                    use_model(model):
+                started = time.perf_counter()
+                quiz_data = ai_quiz_service.generate_quiz('Benchmarking', 'medium', size)
+                timings[label] = time.perf_counter() - started
+            assert len(quiz_data.questions) == size, f"{label} produced {len(quiz_data.questions)} questions"
+
+        print(f"{size:>9}  {timings['one-shot']:>10.2f}  {timings['chunked']:>9.2f}  "
+              f"{timings['one-shot'] / timings['chunked']:>6.1f}x  {model.calls:>5}")
+
+
+if __name__ == '__main__':
+    main()
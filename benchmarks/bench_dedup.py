@@ -0,0 +1,156 @@
+"""
+Throughput of near-duplicate question detection (quiz/dedup.py) over a large stored question set
+
+    python -m benchmarks.bench_dedup                       # 100k stored questions
+    python -m benchmarks.bench_dedup --questions 20000 --no-db
+
+Generates --questions synthetic questions on one topic, builds a SimilarityIndex over them and
+times nearest-neighbour lookups for reworded copies of stored questions (which should be found)
+and for new questions (which should not). The same lookups are timed against a linear scan of
+word-set Jaccard similarities, the check QuestionMerger did before. Unless --no-db is given, the
+questions are also stored as QuizQuestion rows and the per-topic index is built from the database.
+"""
+
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+from benchmarks.utils import setup_django, test_database, save_results
+
+TOPIC = 'Distributed systems'
+SUBJECTS = ['consensus', 'replication', 'sharding', 'leader election', 'vector clocks', 'gossip protocols',
+            'two-phase commit', 'quorum reads', 'write-ahead logs', 'snapshot isolation', 'CRDTs',
+            'load balancing', 'backpressure', 'idempotent retries', 'clock skew', 'partition tolerance']
+ASPECTS = ['latency', 'throughput', 'failure recovery', 'consistency', 'availability', 'storage overhead',
+           'network partitions', 'membership changes', 'read amplification', 'tail latency', 'durability']
+TEMPLATES = [
+    "How does {subject} affect {aspect} when {count} nodes take part?",
+    "Which trade-off of {subject} matters most for {aspect} at {count} replicas?",
+    "What happens to {aspect} if {subject} runs across {count} data centers?",
+    "Why is {subject} chosen to improve {aspect} in a {count} node cluster?",
+]
+REWORDINGS = [("How does", "In what way does"), ("matters most", "is most important"),
+              ("What happens to", "What is the effect on"), ("Why is", "For what reason is")]
+
+
+def make_questions(count, rng):
+    return [rng.choice(TEMPLATES).format(subject=rng.choice(SUBJECTS), aspect=rng.choice(ASPECTS),
+                                         count=rng.randrange(3, 10_000))
+            for _ in range(count)]
+
+
+def reword(question, rng):
+    for old, new in REWORDINGS:
+        question = question.replace(old, new)
+    return question.rstrip('?') + rng.choice(['?', ' in practice?', ', typically?'])
+
+
+def time_queries(name, nearest, queries):
+    """Run nearest(text) for every query; returns (queries/s, hits)"""
+    started = time.perf_counter()
+    hits = sum(bool(nearest(text)) for text in queries)
+    seconds = time.perf_counter() - started
+    print(f"  {name:<32} {len(queries) / seconds:>10.0f} queries/s  {hits}/{len(queries)} matched")
+    return len(queries) / seconds, hits
+
+
+def linear_scan(questions, threshold):
+    """The previous check: word-set Jaccard against every accepted question"""
+    from quiz.dedup import normalize_question_text
+
+    seen = [set(normalize_question_text(question).split()) for question in questions]
+
+    def nearest(text):
+        words = set(normalize_question_text(text).split())
+        return any(len(words & other) / len(words | other) >= threshold for other in seen)
+    return nearest
+
+
+def store_questions(questions, per_quiz=10):
+    """Insert the questions as QuizQuestion rows of quizzes on TOPIC"""
+    from django.db import transaction
+    from quiz.models import Quiz, QuizQuestion
+
+    with transaction.atomic():
+        for start in range(0, len(questions), per_quiz * 1000):
+            quizzes = [Quiz(session_id=str(uuid.uuid4()), topic=TOPIC, difficulty='medium',
+                            total_questions=per_quiz)
+                       for _ in range(0, min(per_quiz * 1000, len(questions) - start), per_quiz)]
+            Quiz.objects.bulk_create(quizzes)
+            quizzes = list(Quiz.objects.order_by('-id')[:len(quizzes)])
+            rows = [QuizQuestion(quiz=quizzes[offset // per_quiz], question=question, option_a='A',
+                                 option_b='B', option_c='C', option_d='D', correct_answer=0,
+                                 explanation='Because.', difficulty='medium', order=offset % per_quiz)
+                    for offset, question in enumerate(questions[start:start + per_quiz * len(quizzes)])]
+            QuizQuestion.objects.bulk_create(rows, batch_size=2000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=100_000, help="Stored questions to index")
+    parser.add_argument('--queries', type=int, default=2000, help="Lookups timed (half reworded, half new)")
+    parser.add_argument('--scan-questions', type=int, default=10_000,
+                        help="Stored questions the linear-scan baseline compares with (it is O(n) per lookup)")
+    parser.add_argument('--threshold', type=float, default=0.6)
+    parser.add_argument('--repeat', type=int, default=3, help="Index builds timed (median reported)")
+    parser.add_argument('--no-db', action='store_true', help="Skip storing the questions and the database build")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Results file (default benchmarks/results/dedup-<commit>.json)")
+    parser.add_argument('--no-save', action='store_true', help="Print results only")
+    args = parser.parse_args()
+
+    setup_django()
+    from quiz import dedup
+
+    rng = random.Random(args.seed)
+    questions = make_questions(args.questions, rng)
+    reworded = [reword(rng.choice(questions), rng) for _ in range(args.queries // 2)]
+    fresh = [f"Which property of {rng.choice(SUBJECTS)} explains its {rng.choice(ASPECTS)} "
+             f"under {rng.choice(['heavy load', 'node churn', 'slow disks'])}?" for _ in range(args.queries // 2)]
+    print(f"NumPy: {'yes' if dedup.np is not None else 'no (pure Python signatures)'}")
+
+    samples = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        index = dedup.SimilarityIndex(dedup.topic_words(TOPIC))
+        index.add_many(enumerate(questions))
+        samples.append(time.perf_counter() - started)
+    build_seconds = statistics.median(samples)
+    print(f"Indexed {len(index)} questions in {build_seconds:.2f}s ({len(index) / build_seconds:.0f} questions/s)\n")
+
+    def nearest(text):
+        # QuestionDeduplicator's check
+        return index.similar(text, args.threshold) is not None
+
+    scan_size = min(args.scan_questions, len(questions))
+    scan = linear_scan(questions[:scan_size], args.threshold)
+    scan_reworded = [reword(rng.choice(questions[:scan_size]), rng) for _ in range(len(reworded))]
+    results = {'numpy': dedup.np is not None, 'questions': len(questions), 'build_seconds': build_seconds,
+               'build_questions_per_second': len(questions) / build_seconds}
+
+    print(f"Index over {len(questions)} questions:")
+    results['reworded_qps'], results['reworded_found'] = time_queries('reworded (should match)', nearest, reworded)
+    results['fresh_qps'], results['fresh_matched'] = time_queries('new (should not match)', nearest, fresh)
+    print(f"Linear scan over {scan_size} questions:")
+    results['scan_reworded_qps'], results['scan_reworded_found'] = time_queries(
+        'reworded (should match)', scan, scan_reworded[:max(1, len(scan_reworded) // 10)])
+    results['scan_fresh_qps'], _ = time_queries('new (should not match)', scan, fresh[:max(1, len(fresh) // 10)])
+
+    if not args.no_db:
+        with test_database():
+            store_questions(questions)
+            started = time.perf_counter()
+            stored = dedup.stored_indexes.build(TOPIC)
+            results['db_build_seconds'] = time.perf_counter() - started
+            print(f"\nBuilt the stored index for {len(stored)} QuizQuestion rows in {results['db_build_seconds']:.2f}s "
+                  f"(QUIZ_DEDUP_TOPIC_LIMIT caps it)")
+
+    if not args.no_save:
+        path = save_results('dedup', results, config=vars(args), path=args.output)
+        print(f"\nSaved {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Startup import cost measured with ``python -X importtime``: Django setup plus the quiz URLconf
+(what every manage.py command, test run and worker boot imports), with the AI SDK loaded lazily
+versus eagerly at import as before
+
+    python -m benchmarks.bench_import --runs 5
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from benchmarks.utils import ROOT, save_results, setup_django
+
+IMPORT_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$', re.MULTILINE)
+
+SETUP = "import django; django.setup(); import quiz.urls"
+SCENARIOS = [
+    ('lazy (startup)', SETUP),
+    ('eager SDK import', SETUP + "; import google.generativeai"),
+    ('lazy + warm_up()', SETUP + "; from quiz.ai_service import warm_up; warm_up()"),
+]
+
+
+def import_profile(code):
+    """(total import seconds, {top-level package: seconds}) of one fresh interpreter running code"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='quizbot.settings', PYTHONPATH=str(ROOT))
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stderr
+
+    packages = {}
+    total = 0
+    for _, cumulative, indent, module in IMPORT_LINE_RE.findall(stderr):
+        if indent:
+            continue
+        seconds = int(cumulative) / 1e6
+        total += seconds
+        package = module.split('.')[0]
+        packages[package] = packages.get(package, 0) + seconds
+    return total, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per scenario (median reported)")
+    parser.add_argument('--output', help="Results file (default benchmarks/results/import-<commit>.json)")
+    parser.add_argument('--no-save', action='store_true', help="Print results only")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'scenario':<20} {'imports ms':>10} {'google ms':>10}  slowest packages")
+    for name, code in SCENARIOS:
+        profiles = [import_profile(code) for _ in range(args.runs)]
+        total = statistics.median(total for total, _ in profiles)
+        packages = {package: statistics.median(p.get(package, 0) for _, p in profiles)
+                    for package in profiles[0][1]}
+        slowest = sorted(packages.items(), key=lambda item: -item[1])[:4]
+        results[name] = {
+            'import_ms': total * 1000,
+            'google_ms': packages.get('google', 0) * 1000,
+            'packages_ms': {package: seconds * 1000 for package, seconds in slowest},
+        }
+        print(f"{name:<20} {total * 1000:>10.0f} {packages.get('google', 0) * 1000:>10.0f}  "
+              + ', '.join(f"{package} {seconds * 1000:.0f}" for package, seconds in slowest))
+
+    saved = results['eager SDK import']['import_ms'] - results['lazy (startup)']['import_ms']
+    print(f"\nLazy SDK import saves {saved:.0f} ms per process that never generates a quiz")
+
+    if not args.no_save:
+        setup_django()
+        path = save_results('import', results, config=vars(args), path=args.output)
+        print(f"Saved {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""
+Query plans and timings of the hot lookups without and with the access-pattern indexes (migration 0006)
+
+    python -m benchmarks.bench_indexes                    # 1M answers, SQLite
+    python -m benchmarks.bench_indexes --answers 100000
+    DATABASE_URL=postgres://... python -m benchmarks.bench_indexes
+
+Seeds a throwaway database with quizzes, questions, sessions and --answers answers spread over
+six months, drops the indexes added in 0006 to time the lookups the way they ran before, then
+recreates them (reporting how long that took) and times the lookups again. Each lookup's
+EXPLAIN output is printed and saved for both runs.
+"""
+
+import argparse
+import random
+import statistics
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from benchmarks.utils import setup_django, test_database, save_results
+
+
+@contextmanager
+def explicit_timestamps(models):
+    """Let bulk_create store the seeded timestamps instead of auto_now/auto_now_add"""
+    fields = [field for model in models for field in model._meta.fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def seed(args):
+    """Insert quizzes until --answers answers exist; returns (quizzes, answers) counts"""
+    from django.db import transaction
+    from django.utils import timezone
+    from quiz.models import Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics
+
+    rng = random.Random(args.seed)
+    now = timezone.now()
+    topics = [f"Topic {i}" for i in range(args.topics)]
+    difficulties = ['easy', 'medium', 'hard']
+    quizzes = answers = 0
+
+    with explicit_timestamps([Quiz, QuizSession, QuizAnswer]):
+        while answers < args.answers:
+            with transaction.atomic():
+                batch = []
+                for _ in range(args.seed_batch):
+                    created = now - timedelta(seconds=rng.randrange(180 * 24 * 3600))
+                    batch.append(Quiz(session_id=str(uuid.uuid4()), topic=rng.choice(topics),
+                                      difficulty=rng.choice(difficulties), total_questions=args.questions,
+                                      created_at=created, updated_at=created))
+                Quiz.objects.bulk_create(batch, batch_size=1000)
+                # Primary keys are not returned by every backend's bulk_create
+                batch = list(Quiz.objects.order_by('-id')[:len(batch)])
+
+                questions = [
+                    QuizQuestion(quiz=quiz, question=f"Question {order + 1} on {quiz.topic}?", option_a='A',
+                                 option_b='B', option_c='C', option_d='D', correct_answer=order % 4,
+                                 explanation='Because.', difficulty=quiz.difficulty, order=order)
+                    for quiz in batch for order in range(args.questions)
+                ]
+                QuizQuestion.objects.bulk_create(questions, batch_size=2000)
+
+                sessions = []
+                for quiz in batch:
+                    completed = rng.random() < args.completed_ratio
+                    answered = args.questions if completed else rng.randrange(args.questions)
+                    idle = timedelta(minutes=rng.randrange(1, 60 * 24))
+                    sessions.append(QuizSession(quiz=quiz, current_question_index=answered,
+                                                is_completed=completed, started_at=quiz.created_at,
+                                                last_activity=quiz.created_at + idle))
+                QuizSession.objects.bulk_create(sessions, batch_size=1000)
+                sessions = {session.quiz_id: session for session in
+                            QuizSession.objects.filter(quiz__in=batch)}
+                QuizStatistics.objects.bulk_create(
+                    [QuizStatistics(session=session) for session in sessions.values()], batch_size=1000)
+
+                question_ids = {}
+                for quiz_id, order, question_id in QuizQuestion.objects.filter(
+                        quiz__in=batch).values_list('quiz_id', 'order', 'id'):
+                    question_ids[quiz_id, order] = question_id
+                rows = []
+                for quiz in batch:
+                    session = sessions[quiz.pk]
+                    for order in range(session.current_question_index):
+                        selected = rng.randrange(4)
+                        rows.append(QuizAnswer(session=session, question_id=question_ids[quiz.pk, order],
+                                               selected_option=selected, is_correct=selected == order % 4,
+                                               score_change=int(selected == order % 4),
+                                               answered_at=session.started_at + timedelta(seconds=30 * order)))
+                QuizAnswer.objects.bulk_create(rows, batch_size=2000)
+
+            quizzes += len(batch)
+            answers += len(rows)
+            print(f"\r  seeded {quizzes} quizzes, {answers} answers", end='', flush=True)
+    print()
+    return quizzes, answers
+
+
+def lookups(args):
+    """(name, callable running the query, queryset to EXPLAIN) for the hot lookups in views, admin and retention"""
+    from django.utils import timezone
+    from quiz.models import Quiz, QuizQuestion, QuizSession, QuizAnswer
+    from quiz.retention import QuizPurger
+
+    rng = random.Random(args.seed)
+    now = timezone.now()
+    max_quiz = Quiz.objects.order_by('-id').values_list('id', flat=True).first()
+    purger = QuizPurger(incomplete_days=7, completed_days=90)
+    week_ago = now - timedelta(days=7)
+
+    def current_question():
+        # quiz_detail / submit_answer: the question at the session's current index
+        return QuizQuestion.objects.filter(quiz_id=rng.randrange(1, max_quiz + 1),
+                                           order=rng.randrange(args.questions)).first()
+
+    return [
+        ('current_question', current_question,
+         QuizQuestion.objects.filter(quiz_id=max_quiz // 2, order=3)),
+        ('retention_batch', lambda: purger.next_batch(500),
+         purger.expired_sessions().values_list('quiz_id', 'quiz__session_id', 'id')[:500]),
+        ('abandoned_sessions_count', lambda: QuizSession.objects.filter(
+            is_completed=False, last_activity__lt=week_ago).count(),
+         QuizSession.objects.filter(is_completed=False, last_activity__lt=week_ago)),
+        ('admin_sessions_completed_this_week', lambda: list(QuizSession.objects.filter(
+            is_completed=True, started_at__gte=week_ago).order_by('-id')[:100]),
+         QuizSession.objects.filter(is_completed=True, started_at__gte=week_ago).order_by('-id')[:100]),
+        ('admin_answers_today', lambda: QuizAnswer.objects.filter(
+            answered_at__gte=now - timedelta(days=1)).count(),
+         QuizAnswer.objects.filter(answered_at__gte=now - timedelta(days=1))),
+        ('admin_quizzes_this_week', lambda: Quiz.objects.filter(created_at__gte=week_ago).count(),
+         Quiz.objects.filter(created_at__gte=week_ago)),
+        ('topic_lookup', lambda: Quiz.objects.filter(
+            topic=f"Topic {rng.randrange(args.topics)}", difficulty='medium').order_by('-id').first(),
+         Quiz.objects.filter(topic='Topic 1', difficulty='medium').order_by('-id')[:1]),
+    ]
+
+
+_NEW_INDEXES = None
+
+
+def new_indexes():
+    """(model, index or constraint) for everything migration 0006 adds"""
+    global _NEW_INDEXES
+    if _NEW_INDEXES is not None:
+        return _NEW_INDEXES
+    from quiz.models import Quiz, QuizQuestion, QuizSession, QuizAnswer
+
+    names = {'quiz_topic_difficulty_idx', 'quiz_created_idx', 'quiz_session_activity_idx',
+             'quiz_session_started_idx', 'quiz_answer_answered_idx', 'quiz_question_order_uniq'}
+    found = []
+    for model in (Quiz, QuizQuestion, QuizSession, QuizAnswer):
+        found += [(model, index) for index in model._meta.indexes if index.name in names]
+        found += [(model, constraint) for constraint in model._meta.constraints if constraint.name in names]
+    _NEW_INDEXES = found
+    return found
+
+
+def set_indexes(enabled):
+    """Create or drop the 0006 indexes; returns the seconds it took"""
+    from django.db import connection, models
+
+    started = time.perf_counter()
+    with connection.schema_editor() as editor:
+        for model, index in new_indexes():
+            if isinstance(index, models.Index):
+                (editor.add_index if enabled else editor.remove_index)(model, index)
+            elif enabled:
+                model._meta.constraints = model._meta.constraints + [index]
+                editor.add_constraint(model, index)
+            else:
+                # SQLite drops a unique constraint by rebuilding the table from the model, so
+                # the model must not declare it while it is dropped
+                model._meta.constraints = [c for c in model._meta.constraints if c is not index]
+                editor.remove_constraint(model, index)
+    return time.perf_counter() - started
+
+
+def analyze():
+    """Refresh the planner statistics"""
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def run_lookups(args):
+    """{name: {'median_ms', 'plan'}} for every lookup"""
+    results = {}
+    for name, fn, queryset in lookups(args):
+        fn()
+        samples = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+        results[name] = {'median_ms': statistics.median(samples) * 1000, 'plan': queryset.explain()}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--answers', type=int, default=1_000_000, help="Answers to seed")
+    parser.add_argument('--questions', type=int, default=10, help="Questions per seeded quiz")
+    parser.add_argument('--topics', type=int, default=500, help="Distinct topics")
+    parser.add_argument('--completed-ratio', type=float, default=0.6, help="Share of completed sessions")
+    parser.add_argument('--seed-batch', type=int, default=2000, help="Quizzes inserted per transaction")
+    parser.add_argument('--repeat', type=int, default=20, help="Timed runs per lookup (median reported)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Results file (default benchmarks/results/indexes-<commit>.json)")
+    parser.add_argument('--no-save', action='store_true', help="Print results only")
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database(threaded=True) as connection:
+        print(f"Backend: {connection.vendor}")
+        set_indexes(False)
+        started = time.perf_counter()
+        quizzes, answers = seed(args)
+        print(f"  in {time.perf_counter() - started:.1f}s\n")
+
+        analyze()
+        before = run_lookups(args)
+        build_seconds = set_indexes(True)
+        analyze()
+        after = run_lookups(args)
+
+        print(f"{'lookup':<36} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+        for name in before:
+            speedup = before[name]['median_ms'] / after[name]['median_ms'] if after[name]['median_ms'] else 0
+            print(f"{name:<36} {before[name]['median_ms']:>10.3f} {after[name]['median_ms']:>10.3f} {speedup:>7.1f}x")
+        print(f"\nCreating the indexes took {build_seconds:.1f}s on {quizzes} quizzes / {answers} answers\n")
+        for name in before:
+            print(f"-- {name}\n   before: {before[name]['plan']}\n   after:  {after[name]['plan']}")
+
+        if not args.no_save:
+            results = {
+                'quizzes': quizzes,
+                'answers': answers,
+                'index_build_seconds': build_seconds,
+                'lookups': {name: {'before_ms': before[name]['median_ms'], 'after_ms': after[name]['median_ms'],
+                                   'plan_before': before[name]['plan'], 'plan_after': after[name]['plan']}
+                            for name in before},
+            }
+            path = save_results('indexes', results, config=vars(args), path=args.output)
+            print(f"\nSaved {path}")
+
+
+if __name__ == '__main__':
+    main()
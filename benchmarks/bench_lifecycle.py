@@ -0,0 +1,277 @@
+"""
+Load test of the full quiz lifecycle: generate -> wait for questions -> N x (view, submit) -> results -> restart
+
+Each simulated user plays one quiz; --concurrency users run at once. By default requests go
+through the WSGI application in this process (django.test.Client) against a throwaway database
+and a fake model; with --url they go over HTTP to a running server, e.g. one started with
+QUIZ_FAKE_LLM=True so it answers from the fake model too (and QUIZ_METRICS_ENDPOINT=True with a
+single worker, for query counts).
+
+    python -m benchmarks.bench_lifecycle --users 50 --concurrency 8 --latency 0.2
+    python -m benchmarks.bench_lifecycle --url http://localhost:8000 --users 200 --concurrency 32
+
+Reports throughput, p50/p95/p99 latency per step and database queries per request (from the
+server's /metrics endpoint), and saves the run as JSON for comparison across commits.
+"""
+
+import argparse
+import http.cookiejar
+import json
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from benchmarks.utils import setup_django, test_database, use_model, summarize, save_results
+
+SESSION_RE = re.compile(r'/quiz/([^/]+)/')
+QUERIES_RE = re.compile(r'^quiz_view_queries_(sum|count)\{view="([^"]+)"\} (\S+)$', re.MULTILINE)
+STEPS = ['index', 'generate', 'generation', 'detail', 'submit', 'results', 'restart']
+
+
+class InProcessClient:
+    """Drives the WSGI application in this process"""
+
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get('Location'), response.content
+
+    def post(self, path, data):
+        response = self.client.post(path, data)
+        return response.status_code, response.get('Location'), response.content
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class LiveClient:
+    """Talks HTTP to a running server, keeping cookies (session and CSRF) like a browser"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def _open(self, request):
+        try:
+            response = self.opener.open(request, timeout=120)
+        except urllib.error.HTTPError as e:
+            response = e
+        with response:
+            return response.getcode(), response.headers.get('Location'), response.read()
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, data):
+        token = next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+        url = self.base_url + path
+        return self._open(urllib.request.Request(url, data=urllib.parse.urlencode(data).encode(),
+                                                 headers={'X-CSRFToken': token, 'Referer': url}))
+
+
+class Recorder:
+    """Thread-safe latency samples and error counts per lifecycle step"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, step, method, *args):
+        started = time.perf_counter()
+        status, location, body = method(*args)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.samples[step].append(elapsed)
+            if status >= 400:
+                self.errors[step] += 1
+        return status, location, body
+
+    def error(self, step):
+        with self._lock:
+            self.errors[step] += 1
+
+
+def play(client, recorder, user, args):
+    """One user: generate a quiz, answer every question, view the results and restart"""
+    rng = random.Random(args.seed + user)
+    recorder.call('index', client.get, '/')
+    _, location, _ = recorder.call('generate', client.post, '/generate/', {
+        'topic': f"Load test topic {user % args.topics}",
+        'difficulty': args.difficulty,
+        'num_questions': args.questions,
+    })
+    match = SESSION_RE.search(location or '')
+    if not match:
+        recorder.error('generate')
+        return
+    session_id = match.group(1)
+
+    # Long-poll until every question is stored
+    generated = -1
+    deadline = time.monotonic() + args.timeout
+    while True:
+        polled = time.monotonic()
+        status, _, body = recorder.call('generation', client.get,
+                                        f'/api/quiz/{session_id}/generation/?wait=5&after={generated}')
+        state = json.loads(body) if status == 200 else {}
+        if state.get('is_ready') or state.get('status') == 'failed' or time.monotonic() > deadline:
+            break
+        generated = state.get('questions_generated', generated)
+        # Sync views answer at once instead of long-polling; poll them like the generating page
+        time.sleep(max(0.0, args.poll_interval - (time.monotonic() - polled)))
+    if not state.get('is_ready'):
+        recorder.error('generation')
+        return
+
+    for _ in range(state['total_questions']):
+        recorder.call('detail', client.get, f'/quiz/{session_id}/')
+        recorder.call('submit', client.post, f'/quiz/{session_id}/submit/', {'selected_option': rng.randrange(4)})
+
+    recorder.call('results', client.get, f'/quiz/{session_id}/results/')
+    recorder.call('restart', client.get, f'/quiz/{session_id}/restart/')
+
+
+def query_totals(metrics_text):
+    """{view: [queries, requests]} from the quiz_view_queries histogram of a /metrics page"""
+    totals = defaultdict(lambda: [0.0, 0.0])
+    for kind, view, value in QUERIES_RE.findall(metrics_text):
+        totals[view][0 if kind == 'sum' else 1] += float(value)
+    return totals
+
+
+def scrape(client):
+    status, _, body = client.get('/metrics')
+    return query_totals(body.decode()) if status == 200 else {}
+
+
+def run(make_client, args):
+    recorder = Recorder()
+    before = scrape(make_client())
+
+    local = threading.local()
+
+    def user_flow(user):
+        if not hasattr(local, 'client'):
+            local.client = make_client()
+        play(local.client, recorder, user, args)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(user_flow, range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    after = scrape(make_client())
+    queries = {}
+    for view, (total, requests) in after.items():
+        total -= before.get(view, [0, 0])[0]
+        requests -= before.get(view, [0, 0])[1]
+        if requests and view != 'quiz:metrics':
+            queries[view] = {'requests': int(requests), 'queries_per_request': total / requests}
+
+    request_count = sum(len(samples) for samples in recorder.samples.values())
+    scored = list(queries.values())
+    return {
+        'wall_seconds': elapsed,
+        'requests': request_count,
+        'errors': sum(recorder.errors.values()),
+        'throughput_rps': request_count / elapsed,
+        'quizzes_per_second': args.users / elapsed,
+        'steps': {step: dict(summarize(recorder.samples[step]), errors=recorder.errors[step])
+                  for step in STEPS if recorder.samples[step]},
+        'queries': queries,
+        'queries_per_request': (sum(v['queries_per_request'] * v['requests'] for v in scored) /
+                                sum(v['requests'] for v in scored)) if scored else None,
+    }
+
+
+def report(results):
+    print(f"  {'step':<12} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for step, stats in results['steps'].items():
+        print(f"  {step:<12} {stats['count']:>7} {stats['median_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+              f"{stats['p99_ms']:>9.1f} {stats['errors']:>7}")
+
+    if results['queries']:
+        print(f"\n  {'view':<32} {'requests':>8} {'queries/request':>16}")
+        for view, stats in sorted(results['queries'].items()):
+            print(f"  {view:<32} {stats['requests']:>8} {stats['queries_per_request']:>16.2f}")
+    else:
+        print("\n  (no query counts: /metrics unavailable or QUIZ_METRICS_ENDPOINT is off)")
+
+    print(f"\n  {results['requests']} requests in {results['wall_seconds']:.2f}s: "
+          f"{results['throughput_rps']:.1f} req/s, {results['quizzes_per_second']:.2f} quizzes/s, "
+          f"{results['errors']} errors")
+    if results['queries_per_request'] is not None:
+        print(f"  {results['queries_per_request']:.2f} queries per request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="Base URL of a running server (default: drive the WSGI app in-process)")
+    parser.add_argument('--users', type=int, default=40, help="Quizzes played in total")
+    parser.add_argument('--concurrency', type=int, default=8, help="Users playing at the same time")
+    parser.add_argument('--questions', type=int, default=5, help="Questions per quiz")
+    parser.add_argument('--difficulty', default='medium')
+    parser.add_argument('--topics', type=int, default=None,
+                        help="Distinct topics across users (fewer topics means more generation cache hits)")
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds per fake model call (in-process)")
+    parser.add_argument('--explanation-chars', type=int, default=0, help="Pad fake model output (in-process)")
+    parser.add_argument('--timeout', type=float, default=120, help="Give up waiting for a generation after this")
+    parser.add_argument('--poll-interval', type=float, default=0.5,
+                        help="Least seconds between generation status requests (sync views do not long-poll)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the answers users pick")
+    parser.add_argument('--output', help="Results file (default benchmarks/results/lifecycle-<commit>.json)")
+    parser.add_argument('--no-save', action='store_true', help="Print results only")
+    args = parser.parse_args()
+    args.topics = args.topics or args.users
+
+    setup_django()
+    target = args.url or f"in-process WSGI, fake model {args.latency}s"
+    print(f"{args.users} users x {args.questions} questions, concurrency {args.concurrency} ({target})\n")
+
+    with ExitStack() as stack:
+        if args.url:
+            results = run(lambda: LiveClient(args.url), args)
+        else:
+            from django.test.utils import override_settings
+            from quiz import metrics
+            from quiz.fake_llm import FakeGenerativeModel
+            from quiz.generation_cache import reset_generation_cache
+
+            stack.enter_context(test_database(threaded=True))
+            # Every simulated user shares one address, so the per-client rate limit is off
+            stack.enter_context(override_settings(QUIZ_BANK_ENABLED=False, QUIZ_METRICS_ENABLED=True,
+                                                  QUIZ_METRICS_ENDPOINT=True,
+                                                  QUIZ_RATE_LIMIT_CAPACITY=0, ALLOWED_HOSTS=['*']))
+            model = FakeGenerativeModel(latency=args.latency, explanation_chars=args.explanation_chars)
+            stack.enter_context(use_model(model))
+            reset_generation_cache()
+            metrics.registry.reset()
+            results = run(InProcessClient, args)
+            reset_generation_cache()
+
+    report(results)
+    if not args.no_save:
+        path = save_results('lifecycle', results, config=vars(args), path=args.output)
+        print(f"\nSaved {path}")
+    if results['errors']:
+        # Failed requests skew the timings; do not let a broken run pass for a measurement
+        sys.exit(f"\n{results['errors']} requests failed")
+
+
+if __name__ == '__main__':
+    main()
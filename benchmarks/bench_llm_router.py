@@ -0,0 +1,93 @@
+"""
+Tail latency of model calls through a single backend vs LLMRouter, with and without hedging
+
+    python -m benchmarks.bench_llm_router --calls 400 --slow-rate 0.05
+
+Each simulated backend answers in --latency seconds (plus up to 50% jitter) but, with probability
+--slow-rate, stalls for --slow-latency seconds instead: the heavy tail of a busy model endpoint.
+Calls run --concurrency at a time on one event loop; p50/p95/p99 are reported per setup. The
+router measures its backends over the first calls, so the hedge deadline settles at their p95.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.utils import setup_django, summarize, save_results
+
+
+def heavy_tailed_model(latency, slow_latency, slow_rate, rng):
+    from quiz.fake_llm import FakeGenerativeModel
+
+    class HeavyTailedModel(FakeGenerativeModel):
+        async def generate_content_async(self, prompt, stream=False, **kwargs):
+            if rng.random() < slow_rate:
+                self.latency = slow_latency
+            else:
+                self.latency = latency * (1 + rng.random() / 2)
+            return await super().generate_content_async(prompt, stream=stream, **kwargs)
+
+    return HeavyTailedModel()
+
+
+async def run(model, prompt, calls, concurrency):
+    """Durations of calls model calls, concurrency at a time"""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def call():
+        async with slots:
+            started = time.perf_counter()
+            await model.generate_content_async(prompt)
+            return time.perf_counter() - started
+
+    return await asyncio.gather(*(call() for _ in range(calls)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help="Typical seconds per call")
+    parser.add_argument('--slow-latency', type=float, default=1.0, help="Seconds per call in the tail")
+    parser.add_argument('--slow-rate', type=float, default=0.05, help="Share of calls in the tail")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Results file (default benchmarks/results/llm_router-<commit>.json)")
+    parser.add_argument('--no-save', action='store_true', help="Print results only")
+    args = parser.parse_args()
+
+    setup_django()
+    from quiz.ai_service import ai_quiz_service
+    from quiz.llm_backends import LLMRouter
+
+    rng = random.Random(args.seed)
+    prompt = ai_quiz_service.generate_quiz_prompt('Benchmarking', 'medium', 5)
+
+    def backend():
+        return heavy_tailed_model(args.latency, args.slow_latency, args.slow_rate, rng)
+
+    setups = {
+        'single backend': backend(),
+        'router, no hedging': LLMRouter({'a': backend(), 'b': backend()}, hedge=False),
+        'router, hedged at p95': LLMRouter({'a': backend(), 'b': backend()}, hedge_delay=args.latency * 2),
+    }
+
+    print(f"Backends: {args.latency}s typical, {args.slow_latency}s for {args.slow_rate:.0%} of calls; "
+          f"{args.calls} calls, concurrency {args.concurrency}\n")
+    print(f"{'setup':<24} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'model calls':>12}")
+    results = {}
+    for name, model in setups.items():
+        summary = summarize(asyncio.run(run(model, prompt, args.calls, args.concurrency)))
+        backends = model.backends.values() if isinstance(model, LLMRouter) else [model]
+        summary['model_calls'] = sum(backend.calls for backend in backends)
+        results[name] = summary
+        print(f"{name:<24} {summary['median_ms']:>8.0f} {summary['p95_ms']:>8.0f} {summary['p99_ms']:>8.0f} "
+              f"{summary['model_calls']:>12}")
+
+    if not args.no_save:
+        path = save_results('llm_router', results, config=vars(args), path=args.output)
+        print(f"\nSaved {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Micro-benchmarks of hot helpers: prompt building, response parsing and statistics recomputation
+
+    python -m benchmarks.bench_micro --rounds 30
+
+Each benchmark runs --rounds rounds of a fixed number of calls; the per-call time of every
+round is one sample, so p50/p95/p99 describe round-to-round variation.
+"""
+
+import argparse
+import time
+
+from benchmarks.utils import setup_django, test_database, sample_quiz, summarize, save_results
+
+
+def measure(fn, number, rounds):
+    """Per-call seconds of each round of `number` calls (after one warm-up round)"""
+    for _ in range(number):
+        fn()
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return samples
+
+
+def benchmarks(args):
+    """(name, callable, calls per round) for each micro-benchmark"""
+    from quiz.ai_service import ai_quiz_service
+    from quiz.fake_llm import FakeGenerativeModel
+    from quiz.parser import IncrementalQuestionParser, parse_quiz_response
+    from quiz.repository import quiz_repository
+
+    model = FakeGenerativeModel(chunk_size=64)
+    prompt = ai_quiz_service.generate_quiz_prompt('Python', 'medium', args.questions)
+    response = model.build_response(prompt)
+    chunks = model._chunks(response)
+
+    def parse_streamed():
+        parser = IncrementalQuestionParser('medium')
+        for chunk in chunks:
+            parser.feed(chunk)
+
+    # A quiz with every question answered, to recount from its stored answers
+    quiz = quiz_repository.create_from_pydantic(sample_quiz(args.questions))
+    session = quiz.session
+    quiz_repository.record_answers(session, [(question, 0) for question in quiz.questions.all()], completes=True)
+    stats = session.statistics
+
+    return [
+        ('generate_quiz_prompt', lambda: ai_quiz_service.generate_quiz_prompt('Python', 'medium', args.questions),
+         1000),
+        ('parse_quiz_response', lambda: parse_quiz_response(response, 'Python', 'medium'), 100),
+        ('incremental_parse', parse_streamed, 100),
+        ('statistics_recompute', stats.recompute, 50),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--questions', type=int, default=10, help="Questions in the prompt/response/quiz")
+    parser.add_argument('--output', help="Results file (default benchmarks/results/micro-<commit>.json)")
+    parser.add_argument('--no-save', action='store_true', help="Print results only")
+    args = parser.parse_args()
+
+    setup_django()
+    results = {}
+    print(f"{'benchmark':<22} {'ops/s':>10} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9}")
+
+    with test_database():
+        for name, fn, number in benchmarks(args):
+            stats = summarize(measure(fn, number, args.rounds))
+            stats['ops_per_second'] = 1000 / stats['mean_ms']
+            results[name] = stats
+            print(f"{name:<22} {stats['ops_per_second']:>10.0f} {stats['median_ms'] * 1000:>9.1f} "
+                  f"{stats['p95_ms'] * 1000:>9.1f} {stats['p99_ms'] * 1000:>9.1f}")
+
+        if not args.no_save:
+            path = save_results('micro', results, config=vars(args), path=args.output)
+            print(f"\nSaved {path}")
+
+
+if __name__ == '__main__':
+    main()
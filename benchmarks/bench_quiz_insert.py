@@ -0,0 +1,80 @@
+"""
+Insert cost per quiz: per-row QuizQuestion.objects.create vs QuizRepository.create_from_pydantic
+
+    python -m benchmarks.bench_quiz_insert                       # SQLite
+    DATABASE_URL=postgres://... python -m benchmarks.bench_quiz_insert   # PostgreSQL
+"""
+
+import argparse
+import time
+import uuid
+
+from benchmarks.utils import setup_django, test_database, sample_quiz, summarize
+
+
+def insert_per_row(quiz_data):
+    """The original generate_quiz insert path (N + 3 INSERTs)"""
+    from django.db import transaction
+    from quiz.models import Quiz, QuizQuestion, QuizSession, QuizStatistics
+
+    with transaction.atomic():
+        quiz = Quiz.objects.create(
+            session_id=str(uuid.uuid4()),
+            topic=quiz_data.topic,
+            difficulty=quiz_data.difficulty,
+            total_questions=len(quiz_data.questions)
+        )
+        for idx, question_data in enumerate(quiz_data.questions):
+            QuizQuestion.objects.create(quiz=quiz, order=idx, **question_data.model_dump())
+        quiz_session = QuizSession.objects.create(quiz=quiz)
+        QuizStatistics.objects.create(session=quiz_session)
+
+
+def measure(fn, quiz_data, iterations):
+    """(queries of one call, timing summary of iterations calls)
+
+    Queries are counted with an execute wrapper: CaptureQueriesContext diffs connection.queries,
+    which stops growing at 9000 entries once DEBUG has logged that many, and then counts 0.
+    """
+    from django.db import connection, reset_queries
+
+    query_count = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal query_count
+        query_count += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        fn(quiz_data)
+    samples = []
+    for _ in range(iterations):
+        # Keep DEBUG's query log from growing through the timed calls
+        reset_queries()
+        started = time.perf_counter()
+        fn(quiz_data)
+        samples.append(time.perf_counter() - started)
+    return query_count, summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 10, 20])
+    args = parser.parse_args()
+
+    setup_django()
+    from quiz.repository import quiz_repository
+
+    with test_database() as connection:
+        print(f"Backend: {connection.vendor}, {args.iterations} quizzes per case\n")
+        print(f"{'questions':>9}  {'path':<12} {'queries':>7}  {'mean ms':>8}  {'p95 ms':>8}")
+        for size in args.sizes:
+            quiz_data = sample_quiz(size)
+            for label, fn in (('per-row', insert_per_row), ('repository', quiz_repository.create_from_pydantic)):
+                query_count, result = measure(fn, quiz_data, args.iterations)
+                print(f"{size:>9}  {label:<12} {query_count:>7}  {result['mean_ms']:>8.3f}  {result['p95_ms']:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
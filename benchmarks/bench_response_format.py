@@ -0,0 +1,110 @@
+"""
+End-to-end generation latency, size and parse success of the verbose vs compact response formats
+
+    python -m benchmarks.bench_response_format --per-char 0.0002 --truncate-rate 0.2
+
+The fake model takes --latency seconds plus --per-char seconds per response character, so a
+shorter response answers sooner, as a model decoding tokens does. With --truncate-rate, that
+share of responses is cut off at a random point (a model stopping at its output limit) and the
+parser salvages what it can. For each format, --runs quizzes are generated one after another,
+both in one piece and streamed (time to first question), and the questions parsed out of the
+responses are counted against those requested.
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.utils import setup_django, summarize, save_results, use_model
+
+
+def truncating_model(rng, truncate_rate, **kwargs):
+    from quiz.fake_llm import FakeGenerativeModel
+
+    class TruncatingModel(FakeGenerativeModel):
+        def build_response(self, prompt):
+            text = super().build_response(prompt)
+            if rng.random() < truncate_rate:
+                text = text[:rng.randrange(len(text) // 4, len(text))]
+            return text
+
+    return TruncatingModel(**kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20, help="Quizzes generated per format and mode")
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.05, help="Fixed seconds per model call")
+    parser.add_argument('--per-char', type=float, default=0.0001, help="Extra seconds per response character")
+    parser.add_argument('--explanation-chars', type=int, default=0, help="Pad each explanation to this length")
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help="Share of responses cut off early")
+    parser.add_argument('--chunk-size', type=int, default=0, help="QUIZ_GENERATION_CHUNK_SIZE (0: one call per quiz)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Results file (default benchmarks/results/response_format-<commit>.json)")
+    parser.add_argument('--no-save', action='store_true', help="Print results only")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test.utils import override_settings
+    from quiz import metrics
+    from quiz.ai_service import ai_quiz_service
+
+    print(f"Fake model: {args.latency}s + {args.per_char * 1000:.2f}ms/char, {args.truncate_rate:.0%} truncated; "
+          f"{args.runs} quizzes of {args.questions} questions per format\n")
+    print(f"{'format':<8} {'prompt tok':>10} {'resp tok':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'first q ms':>10} {'parsed':>7}")
+
+    results = {}
+    for response_format in ('verbose', 'compact'):
+        rng = random.Random(args.seed)
+        model = truncating_model(rng, args.truncate_rate, latency=args.latency, latency_per_char=args.per_char,
+                                 explanation_chars=args.explanation_chars)
+        durations, first_question, parsed = [], [], 0
+        # Top-ups would refill truncated quizzes and hide the parse losses being measured
+        with override_settings(QUIZ_RESPONSE_FORMAT=response_format, QUIZ_GENERATION_CHUNK_SIZE=args.chunk_size,
+                               QUIZ_DEDUP_REGENERATE_ATTEMPTS=0), \
+                use_model(model):
+            with metrics.generation_usage() as usage:
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    quiz_data = ai_quiz_service.generate_quiz('Benchmarking', 'medium', args.questions)
+                    durations.append(time.perf_counter() - started)
+                    parsed += 0 if quiz_data.is_fallback else len(quiz_data.questions)
+
+            for _ in range(args.runs):
+                started, first = time.perf_counter(), []
+
+                def on_question(question):
+                    if not first:
+                        first.append(time.perf_counter() - started)
+
+                ai_quiz_service.generate_quiz_streaming('Benchmarking', 'medium', args.questions, on_question)
+                if first:
+                    first_question.append(first[0])
+
+        summary = summarize(durations)
+        summary.update(
+            prompt_tokens=usage.prompt_tokens / args.runs,
+            response_tokens=usage.response_tokens / args.runs,
+            response_chars=usage.response_chars / args.runs,
+            first_question_ms=summarize(first_question)['median_ms'] if first_question else None,
+            parse_success=parsed / (args.runs * args.questions),
+        )
+        results[response_format] = summary
+        first_ms = f"{summary['first_question_ms']:.0f}" if first_question else '-'
+        print(f"{response_format:<8} {summary['prompt_tokens']:>10.0f} {summary['response_tokens']:>8.0f} "
+              f"{summary['median_ms']:>8.0f} {summary['p95_ms']:>8.0f} {first_ms:>10} "
+              f"{summary['parse_success']:>7.0%}")
+
+    speedup = results['verbose']['median_ms'] / results['compact']['median_ms']
+    print(f"\nCompact format: {speedup:.2f}x faster end to end (median)")
+    results['median_speedup'] = speedup
+
+    if not args.no_save:
+        path = save_results('response_format', results, config=vars(args), path=args.output)
+        print(f"\nSaved {path}")
+
+
+if __name__ == '__main__':
+    main()
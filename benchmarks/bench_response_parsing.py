@@ -0,0 +1,71 @@
+"""
+Parse throughput and salvage rate: legacy greedy regex + json.loads vs quiz.parser
+
+    python -m benchmarks.bench_response_parsing --questions 20 --iterations 200
+"""
+
+import argparse
+import json
+import re
+import time
+
+from benchmarks.utils import setup_django
+
+
+def legacy_parse(text):
+    """The original AIQuizService.generate_quiz extraction (all-or-nothing)"""
+    from quiz.ai_service import QuizPydantic
+
+    try:
+        match = re.search(r'\{.*\}', text, re.DOTALL)
+        if not match:
+            return []
+        return QuizPydantic(**json.loads(match.group())).questions
+    except Exception:
+        return []
+
+
+def run(parse, corpus, iterations):
+    recovered = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for _, text, _ in corpus:
+            recovered += len(parse(text))
+    elapsed = time.perf_counter() - started
+    size = sum(len(text) for _, text, _ in corpus) * iterations
+    return size / elapsed / 1e6, recovered / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, nargs='+', default=[10, 20])
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from quiz.fake_llm import build_response_corpus
+    from quiz.parser import parse_quiz_response, loads
+
+    print(f"JSON backend: {'json' if loads is json.loads else 'orjson'}\n")
+    for size in args.questions:
+        corpus = build_response_corpus(size)
+        expected = sum(count for _, _, count in corpus)
+        print(f"{size} questions per response, {len(corpus)} responses, {expected} recoverable questions")
+        print(f"  {'parser':<8} {'MB/s':>8}  {'salvaged':>9}  {'rate':>6}")
+        for label, parse in (('legacy', legacy_parse),
+                             ('new', lambda text: parse_quiz_response(text, 'Python', 'medium').questions)):
+            throughput, recovered = run(parse, corpus, args.iterations)
+            print(f"  {label:<8} {throughput:>8.2f}  {recovered:>9.0f}  {recovered / expected:>6.1%}")
+
+        print("  per response (new parser):")
+        for name, text, count in corpus:
+            started = time.perf_counter()
+            for _ in range(args.iterations):
+                result = parse_quiz_response(text, 'Python', 'medium')
+            per_call = (time.perf_counter() - started) / args.iterations * 1e6
+            print(f"    {name:<24} {len(result.questions):>3}/{count:<3} {per_call:>9.1f} us")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Compare two saved benchmark runs (see benchmarks.utils.save_results)
+
+    python -m benchmarks.compare benchmarks/results/lifecycle-abc1234.json benchmarks/results/lifecycle-def5678.json
+
+Prints every numeric result side by side with the relative change.
+"""
+
+import argparse
+import json
+
+
+def flatten(value, prefix=''):
+    """{'a.b': number} for every numeric leaf of nested dicts"""
+    if isinstance(value, dict):
+        items = {}
+        for key, child in value.items():
+            items.update(flatten(child, f"{prefix}.{key}" if prefix else str(key)))
+        return items
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    if baseline.get('benchmark') != candidate.get('benchmark'):
+        parser.error(f"different benchmarks: {baseline.get('benchmark')} vs {candidate.get('benchmark')}")
+
+    old, new = flatten(baseline['results']), flatten(candidate['results'])
+    print(f"{baseline['benchmark']}: {baseline.get('commit')} -> {candidate.get('commit')}\n")
+    print(f"{'metric':<48} {'baseline':>12} {'candidate':>12} {'change':>8}")
+    for key in sorted(old.keys() | new.keys()):
+        before, after = old.get(key), new.get(key)
+        change = f"{(after - before) / before * 100:+.1f}%" if before and after is not None else ''
+        print(f"{key:<48} {'' if before is None else f'{before:.3f}':>12} "
+              f"{'' if after is None else f'{after:.3f}':>12} {change:>8}")
+
+
+if __name__ == '__main__':
+    main()
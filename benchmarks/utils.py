@@ -0,0 +1,157 @@
+"""
+Shared helpers for benchmarks: Django bootstrap, a throwaway database and sample data
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / 'benchmarks' / 'results'
+
+
+def setup_django():
+    """Configure Django for a standalone benchmark script"""
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quizbot.settings')
+
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database(threaded: bool = False):
+    """Create a fresh test database (SQLite or whatever DATABASE_URL points at) for the run
+
+    With threaded, SQLite uses a temporary file instead of the shared in-memory database,
+    whose table-level locks fail concurrent writers instead of making them wait. The file is
+    journaled in WAL mode and writers wait up to 30 seconds for the lock, so "database is
+    locked" errors do not end up among the measured ones.
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    threaded_sqlite = threaded and connection.vendor == 'sqlite'
+    if threaded_sqlite:
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(
+            tempfile.mkdtemp(prefix='quiz-bench-'), 'bench.sqlite3')
+        connection.settings_dict.setdefault('OPTIONS', {})['timeout'] = 30
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    if threaded_sqlite:
+        # Stored in the file, so every thread's connection uses it
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def use_model(model):
+    """Make ai_quiz_service call model for the duration
+
+    Set in the instance __dict__: reading ai_quiz_service.model first (as mock.patch.object
+    does to save it) would set up the real client, warnings about missing API keys included.
+    """
+    from quiz.ai_service import ai_quiz_service
+
+    missing = object()
+    previous = ai_quiz_service.__dict__.get('model', missing)
+    ai_quiz_service.__dict__['model'] = model
+    try:
+        yield model
+    finally:
+        if previous is missing:
+            ai_quiz_service.__dict__.pop('model', None)
+        else:
+            ai_quiz_service.__dict__['model'] = previous
+
+
+def sample_quiz(num_questions: int, topic: str = 'Benchmarking', difficulty: str = 'medium'):
+    """Build a validated QuizPydantic with realistic field sizes"""
+    from quiz.ai_service import QuizPydantic, QuizQuestionPydantic
+
+    return QuizPydantic(
+        topic=topic,
+        difficulty=difficulty,
+        questions=[
+            QuizQuestionPydantic(
+                question=f"Question {i + 1}: which statement about {topic.lower()} is correct in this scenario?",
+                option_a=f"The first plausible answer for question {i + 1}",
+                option_b=f"The second plausible answer for question {i + 1}",
+                option_c=f"The third plausible answer for question {i + 1}",
+                option_d=f"The fourth plausible answer for question {i + 1}",
+                correct_answer=i % 4,
+                explanation=f"Option {'ABCD'[i % 4]} is correct because it matches the definition used in question {i + 1}.",
+                difficulty=difficulty,
+            )
+            for i in range(num_questions)
+        ],
+    )
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(samples):
+    """Mean/median/p95/p99 (milliseconds) of a list of durations in seconds"""
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.mean(ordered) * 1000,
+        'median_ms': statistics.median(ordered) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+    }
+
+
+def git_revision():
+    """Short commit hash of the working tree (with a -dirty suffix), or None outside git"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def save_results(name, results, config=None, path=None):
+    """Write a benchmark run as JSON (default benchmarks/results/<name>-<commit>.json); returns the path
+
+    Files from different commits can be compared with ``python -m benchmarks.compare``.
+    """
+    from django.db import connection
+
+    revision = git_revision()
+    if path is None:
+        path = RESULTS_DIR / f"{name}-{revision or time.strftime('%Y%m%d%H%M%S')}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    payload = {
+        'benchmark': name,
+        'commit': revision,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'database': connection.vendor,
+        'config': config or {},
+        'results': results,
+    }
+    path.write_text(json.dumps(payload, indent=2, sort_keys=True) + '\n')
+    return path
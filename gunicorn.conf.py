@@ -0,0 +1,14 @@
+"""
+Gunicorn settings, picked up automatically from the working directory (see Procfile)
+"""
+
+
+def post_worker_init(worker):
+    """Set up the AI client in each worker once the app is loaded, before it accepts requests
+
+    This runs after the fork, so no gRPC channel is shared between processes (with preload_app
+    too), and the first quiz generation does not pay the SDK import.
+    """
+    from quiz.ai_service import warm_up
+
+    warm_up()
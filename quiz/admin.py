@@ -1,9 +1,97 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connection
+from django.db.models import Case, CharField, Value, When
+from django.db.models.functions import Concat, Length, Substr
+from django.db.models.lookups import GreaterThan
+from django.utils.functional import cached_property
+
+from .models import Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics, BankQuestion
+
+
+def estimated_row_count(model):
+    """The planner's row estimate for a model's table, or None when the backend keeps none"""
+    table = model._meta.db_table
+    queries = {
+        'postgresql': ("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table]),
+        'mysql': ("SELECT table_rows FROM information_schema.tables "
+                  "WHERE table_schema = DATABASE() AND table_name = %s", [table]),
+        # Filled in by ANALYZE; the first number of a table's stat is its row count
+        'sqlite': ("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]),
+    }
+    if connection.vendor not in queries:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(*queries[connection.vendor])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if not row or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that takes the planner's row estimate instead of COUNT(*) for big unfiltered lists
+
+    Filtered lists (search, list_filter) still get an exact count, which runs on an index.
+    Tables under QUIZ_ADMIN_COUNT_ESTIMATE_THRESHOLD rows are counted exactly too.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_row_count(self.object_list.model)
+            threshold = getattr(settings, 'QUIZ_ADMIN_COUNT_ESTIMATE_THRESHOLD', 100_000)
+            if estimate is not None and estimate >= threshold:
+                return estimate
+        return super().count
+
+
+def truncated(field, length):
+    """DB-side preview of a text field: its first `length` characters, plus '...' if it was longer"""
+    return Case(
+        When(GreaterThan(Length(field), length), then=Concat(Substr(field, 1, length), Value('...'))),
+        default=field,
+        output_field=CharField(),
+    )
+
+
+class ListPerformanceAdmin(admin.ModelAdmin):
+    """Changelists over tables that grow with every quiz
+
+    Subclasses list the relations their columns render in list_select_related and name
+    DB-side previews in `previews` ({annotation: (field, length)}), so a page of any size
+    costs a constant number of queries.
+    """
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) the changelist runs for filtered views
+    show_full_result_count = False
+    previews = {}
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.previews:
+            queryset = queryset.annotate(**{name: truncated(field, length)
+                                            for name, (field, length) in self.previews.items()})
+        return queryset
+
+
+def preview_column(name, field, description):
+    """list_display column showing an annotation from ListPerformanceAdmin.previews"""
+    def column(self, obj):
+        return getattr(obj, name)
+    column.short_description = description
+    column.admin_order_field = field
+    return column
 
 
 @admin.register(Quiz)
-class QuizAdmin(admin.ModelAdmin):
+class QuizAdmin(ListPerformanceAdmin):
     list_display = ['topic', 'difficulty', 'total_questions', 'created_at']
     list_filter = ['difficulty', 'created_at']
     search_fields = ['topic', 'session_id']
@@ -18,34 +106,51 @@ class QuizQuestionInline(admin.TabularInline):
 
 
 @admin.register(QuizQuestion)
-class QuizQuestionAdmin(admin.ModelAdmin):
+class QuizQuestionAdmin(ListPerformanceAdmin):
     list_display = ['quiz', 'question_preview', 'correct_answer', 'difficulty', 'order']
     list_filter = ['difficulty', 'quiz__difficulty']
+    list_select_related = ['quiz']
+    raw_id_fields = ['quiz']
     search_fields = ['question', 'quiz__topic']
-    
-    def question_preview(self, obj):
-        return obj.question[:50] + "..." if len(obj.question) > 50 else obj.question
-    question_preview.short_description = "Question"
+    previews = {'question_preview_text': ('question', 50)}
+
+    question_preview = preview_column('question_preview_text', 'question', "Question")
 
 
 @admin.register(QuizSession)
-class QuizSessionAdmin(admin.ModelAdmin):
+class QuizSessionAdmin(ListPerformanceAdmin):
     list_display = ['quiz', 'current_score', 'current_question_index', 'is_completed', 'started_at']
     list_filter = ['is_completed', 'started_at']
+    list_select_related = ['quiz']
+    raw_id_fields = ['quiz']
     readonly_fields = ['started_at', 'last_activity']
 
 
 @admin.register(QuizAnswer)
-class QuizAnswerAdmin(admin.ModelAdmin):
+class QuizAnswerAdmin(ListPerformanceAdmin):
     list_display = ['session', 'question_preview', 'selected_option', 'is_correct', 'answered_at']
     list_filter = ['is_correct', 'answered_at']
-    
-    def question_preview(self, obj):
-        return obj.question.question[:30] + "..." if len(obj.question.question) > 30 else obj.question.question
-    question_preview.short_description = "Question"
+    # The session column renders its quiz's topic
+    list_select_related = ['session__quiz']
+    previews = {'question_preview_text': ('question__question', 30)}
+    raw_id_fields = ['session', 'question']
+
+    question_preview = preview_column('question_preview_text', 'question__question', "Question")
 
 
 @admin.register(QuizStatistics)
-class QuizStatisticsAdmin(admin.ModelAdmin):
+class QuizStatisticsAdmin(ListPerformanceAdmin):
     list_display = ['session', 'total_questions_answered', 'correct_answers', 'percentage']
+    list_select_related = ['session__quiz']
+    raw_id_fields = ['session']
     readonly_fields = ['total_questions_answered', 'correct_answers', 'incorrect_answers', 'percentage']
+
+
+@admin.register(BankQuestion)
+class BankQuestionAdmin(ListPerformanceAdmin):
+    list_display = ['topic', 'difficulty', 'question_preview', 'created_at']
+    list_filter = ['difficulty']
+    search_fields = ['topic', 'question']
+    previews = {'question_preview_text': ('question', 50)}
+
+    question_preview = preview_column('question_preview_text', 'question', "Question")
@@ -0,0 +1,207 @@
+"""
+Admission control for quiz generation
+Each client has a rate budget, kept in a shared Django cache (QUIZ_RATE_LIMIT_CACHE_ALIAS) or
+else in the database, that a generation request is charged its number of questions from, and
+quizzes awaiting or undergoing generation are capped globally. Requests over either limit are
+refused with a Retry-After, before any quiz row is written or model call is queued, so
+answering and reading quizzes keep their workers during generation bursts.
+"""
+
+import math
+import time
+from datetime import timedelta
+from typing import Optional, Union
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Least
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from . import metrics
+from .models import Quiz, GenerationStatus, RateLimitBucket
+from .shared_cache import is_shared
+
+
+class Throttled(Exception):
+    """A generation request refused by the rate limiter ('rate') or the in-flight cap ('busy')"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After in whole seconds (at least 1)"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Token buckets in the database (RateLimitBucket rows), one per client key
+
+    A bucket holds up to capacity tokens and refills at rate tokens per second. A charge is one
+    conditional UPDATE that refills and spends in the same statement, so concurrent requests of
+    one client (in any worker process) cannot spend the same tokens twice.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+
+    def take(self, key: str, cost: float, now: Optional[float] = None) -> float:
+        """Spend cost tokens from key's bucket; returns 0 if they were there, else seconds until they will be"""
+        now = time.time() if now is None else now
+        cost = min(cost, self.capacity)
+        refilled = Least(Value(float(self.capacity)), F('tokens') + (Value(now) - F('updated')) * Value(self.rate),
+                         output_field=FloatField())
+
+        for _ in range(3):
+            buckets = RateLimitBucket.objects.filter(key=key)
+            if buckets.filter(GreaterThanOrEqual(refilled, cost)).update(tokens=refilled - cost, updated=now):
+                return 0.0
+
+            bucket = buckets.first()
+            if bucket is None:
+                try:
+                    with transaction.atomic():
+                        RateLimitBucket.objects.create(key=key, tokens=self.capacity - cost, updated=now)
+                except IntegrityError:
+                    continue  # Another request created it first: charge that bucket
+                self.prune(now)
+                return 0.0
+
+            tokens = min(self.capacity, bucket.tokens + max(0.0, now - bucket.updated) * self.rate)
+            if tokens < cost:
+                return (cost - tokens) / self.rate
+            # Refilled between the UPDATE and the read: try again
+        # Still contended after that: refuse rather than admit uncharged
+        return cost / self.rate
+
+    def prune(self, now: float):
+        """Delete buckets that have refilled completely, which are the same as no bucket"""
+        RateLimitBucket.objects.filter(updated__lt=now - self.capacity / self.rate).delete()
+
+
+class SlidingWindowLimiter:
+    """Rate limit kept in a shared Django cache (QUIZ_RATE_LIMIT_CACHE_ALIAS) with atomic counters
+
+    Tokens spent are counted per client in windows of capacity / rate seconds with cache.add
+    and cache.incr. The previous window's count, weighted by how much of it still overlaps
+    the sliding window ending now, is added to the current one; a charge that takes the sum
+    over capacity is handed back with cache.decr. Over time this admits rate tokens per
+    second with bursts of up to capacity, as the token bucket does.
+    """
+
+    prefix = 'quiz-rate-limit:'
+
+    def __init__(self, capacity: float, rate: float, alias: str):
+        self.capacity = capacity
+        self.rate = rate
+        self.alias = alias
+        self.window = capacity / rate
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def take(self, key: str, cost: float, now: Optional[float] = None) -> float:
+        """Spend cost tokens of key's window; returns 0 if they were there, else roughly seconds until they will be"""
+        now = time.time() if now is None else now
+        cost = math.ceil(min(cost, self.capacity))
+        index = int(now // self.window)
+        current = f"{self.prefix}{key}:{index}"
+        timeout = math.ceil(2 * self.window) + 1
+
+        self.cache.add(current, 0, timeout=timeout)
+        try:
+            spent = self.cache.incr(current, cost)
+        except ValueError:
+            # Evicted between add and incr
+            self.cache.add(current, cost, timeout=timeout)
+            spent = cost
+        previous = self.cache.get(f"{self.prefix}{key}:{index - 1}", 0)
+        used = previous * (1 - (now % self.window) / self.window) + spent
+        if used <= self.capacity:
+            return 0.0
+
+        try:
+            self.cache.decr(current, cost)
+        except ValueError:
+            pass
+        return (used - self.capacity) / self.rate
+
+
+def get_rate_limiter() -> Optional[Union[TokenBucket, SlidingWindowLimiter]]:
+    """The limiter configured by QUIZ_RATE_LIMIT_* (None when QUIZ_RATE_LIMIT_CAPACITY is 0, the default)
+
+    Counters live in QUIZ_RATE_LIMIT_CACHE_ALIAS when that cache is shared by all worker
+    processes, and in the database otherwise: a local-memory cache would give every worker
+    a budget of its own.
+    """
+    capacity = getattr(settings, 'QUIZ_RATE_LIMIT_CAPACITY', 0)
+    per_minute = getattr(settings, 'QUIZ_RATE_LIMIT_PER_MINUTE', 20)
+    if not capacity or not per_minute:
+        return None
+    alias = getattr(settings, 'QUIZ_RATE_LIMIT_CACHE_ALIAS', 'default')
+    if is_shared(alias):
+        return SlidingWindowLimiter(capacity, per_minute / 60, alias)
+    return TokenBucket(capacity, per_minute / 60)
+
+
+def client_key(request) -> str:
+    """Rate-limit key of a request: the signed-in user, else the client address
+
+    Sessions are not used: a script drops its cookie and starts a new one for free. Behind
+    QUIZ_RATE_LIMIT_TRUSTED_PROXIES reverse proxies the address is read from X-Forwarded-For,
+    that many hops from the right.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+
+    address = request.META.get('REMOTE_ADDR', '')
+    proxies = getattr(settings, 'QUIZ_RATE_LIMIT_TRUSTED_PROXIES', 0)
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if hops:
+            address = hops[-min(proxies, len(hops))]
+    return f"ip:{address}"
+
+
+def check_rate(request, num_questions: int):
+    """Charge a generation request num_questions tokens; raises Throttled when the client is out"""
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return
+    wait = limiter.take(client_key(request), num_questions)
+    if wait:
+        metrics.GENERATION_REJECTIONS.inc(reason='rate')
+        raise Throttled('rate', wait)
+
+
+def generations_in_flight() -> int:
+    """Quizzes pending or generating, across all workers
+
+    Quizzes older than QUIZ_ADMISSION_STALE_SECONDS are left out, so rows of a job lost with
+    its worker stop counting.
+    """
+    stale = getattr(settings, 'QUIZ_ADMISSION_STALE_SECONDS', 600)
+    return Quiz.objects.filter(
+        status__in=[GenerationStatus.PENDING, GenerationStatus.GENERATING],
+        created_at__gte=timezone.now() - timedelta(seconds=stale),
+    ).count()
+
+
+def admit_generation():
+    """Raise Throttled when QUIZ_ADMISSION_MAX_IN_FLIGHT quizzes already await or undergo generation
+
+    Up to the cap, new quizzes queue for the background executor (whose workers and
+    QUIZ_LLM_MAX_CONCURRENCY bound the model calls actually running); beyond it they are shed.
+    """
+    limit = getattr(settings, 'QUIZ_ADMISSION_MAX_IN_FLIGHT', 50)
+    if limit and generations_in_flight() >= limit:
+        metrics.GENERATION_REJECTIONS.inc(reason='busy')
+        raise Throttled('busy', getattr(settings, 'QUIZ_ADMISSION_RETRY_AFTER', 15))
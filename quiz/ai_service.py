@@ -3,13 +3,24 @@ AI Quiz Generation Service for Django
 Integrates LangChain with Google Generative AI for quiz creation
 """
 
+import logging
 import os
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Optional
+from asgiref.sync import sync_to_async
 from django.conf import settings
-import google.generativeai as genai
-from pydantic import BaseModel, Field
-import json
-import re
+from pydantic import BaseModel, Field, PrivateAttr
+import asyncio
+import contextvars
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics
+from .dedup import QuestionDeduplicator
+from .resilience import LLMGuard, LLMUnavailable
+
+logger = logging.getLogger(__name__)
 
 
 class QuizQuestionPydantic(BaseModel):
@@ -24,11 +35,55 @@ class QuizQuestionPydantic(BaseModel):
     difficulty: str = Field(description="Question difficulty level")
 
 
+# Short keys of a question in the compact response format; "o" holds the four options in order
+COMPACT_KEYS = {'q': 'question', 'a': 'correct_answer', 'e': 'explanation', 'd': 'difficulty'}
+COMPACT_OPTIONS_KEY = 'o'
+
+
 class QuizPydantic(BaseModel):
     """Pydantic model for complete quiz validation"""
     topic: str = Field(description="Quiz topic")
     difficulty: str = Field(description="Overall difficulty level")
     questions: List[QuizQuestionPydantic] = Field(description="List of quiz questions")
+    _is_fallback: bool = PrivateAttr(default=False)
+    
+    @property
+    def is_fallback(self) -> bool:
+        """Whether this quiz is placeholder content rather than AI output"""
+        return self._is_fallback
+
+
+class QuestionMerger:
+    """Collects questions from one or several batches, skipping near-duplicates, up to a limit"""
+    
+    def __init__(self, limit: int, topic: str = '', deduplicator: Optional[QuestionDeduplicator] = None):
+        self.limit = limit
+        self.deduplicator = deduplicator or QuestionDeduplicator(topic)
+        self.questions = []
+        self.duplicates = 0
+    
+    @property
+    def missing(self) -> int:
+        return self.limit - len(self.questions)
+    
+    def add(self, question: QuizQuestionPydantic) -> bool:
+        """Accept a question unless the quiz is full or it repeats an accepted (or stored) one"""
+        if len(self.questions) >= self.limit:
+            return False
+        
+        scope = self.deduplicator.duplicate_of(question.question)
+        if scope:
+            self.duplicates += 1
+            metrics.DUPLICATE_QUESTIONS.inc(scope=scope)
+            return False
+        
+        self.deduplicator.add(question.question)
+        self.questions.append(question)
+        return True
+    
+    def needs_top_up(self) -> bool:
+        """Whether dropped duplicates left the quiz short"""
+        return self.duplicates > 0 and self.missing > 0
 
 
 class AIQuizService:
@@ -36,10 +91,72 @@ class AIQuizService:
     
     def __init__(self):
         self.llm = None
-        self.setup_ai()
+        # Deadlines, retries, concurrency cap and circuit breaker shared by every model call
+        self.guard = LLMGuard.from_settings()
+        # The SDK is imported and the client configured on first use of self.model (or by warm_up),
+        # so management commands, migrations and tests that never generate skip that cost
+        self._setup_lock = threading.Lock()
+    
+    def __getattr__(self, name):
+        # Only reached while the model has not been set up yet
+        if name != 'model':
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        return self.warm_up()
+    
+    def warm_up(self):
+        """Set up the model client now instead of on the first generation; returns it"""
+        with self._setup_lock:
+            if 'model' not in self.__dict__:
+                self.setup_ai()
+        return self.__dict__['model']
     
     def setup_ai(self):
-        """Initialize Google Generative AI"""
+        """Initialize the model client (a router when several backends are configured)"""
+        self.model = self.create_model()
+    
+    def create_model(self):
+        """The configured model client, or None to use fallback quizzes
+        
+        QUIZ_LLM_BACKENDS lists the backends to use; with more than one, calls go through an
+        LLMRouter that picks the fastest healthy backend and hedges slow calls.
+        """
+        if getattr(settings, 'QUIZ_FAKE_LLM', False):
+            # Load tests and benchmarks against a running server: no network, deterministic output
+            return self.create_backend('offline')
+        
+        backends = {}
+        for name in getattr(settings, 'QUIZ_LLM_BACKENDS', ['gemini']):
+            backend = self.create_backend(name)
+            if backend is not None:
+                backends[name] = backend
+        
+        if len(backends) <= 1:
+            return next(iter(backends.values()), None)
+        from .llm_backends import LLMRouter
+        # Hedges take call slots from the guard's limiter, beside the one the call itself holds
+        return LLMRouter.from_settings(backends, limiter=self.guard.limiter)
+    
+    def create_backend(self, name: str):
+        """One backend client by name ('gemini', 'openai' or 'offline'), or None if it is not configured"""
+        if name == 'gemini':
+            return self.create_gemini_model()
+        if name == 'offline':
+            from .fake_llm import FakeGenerativeModel
+            return FakeGenerativeModel(latency=getattr(settings, 'QUIZ_FAKE_LLM_LATENCY', 0.5))
+        if name == 'openai':
+            base_url = getattr(settings, 'QUIZ_OPENAI_BASE_URL', '')
+            if not base_url:
+                logger.warning("QUIZ_OPENAI_BASE_URL is not set; skipping the openai backend")
+                return None
+            from .llm_backends import OpenAICompatibleModel
+            return OpenAICompatibleModel(base_url, getattr(settings, 'QUIZ_OPENAI_MODEL', 'gpt-4o-mini'),
+                                         api_key=getattr(settings, 'QUIZ_OPENAI_API_KEY', ''),
+                                         timeout=self.guard.timeout)
+        logger.warning("Unknown LLM backend %r", name)
+        return None
+    
+    def create_gemini_model(self):
+        """Gemini client, or None without an API key"""
         try:
             # Configure the API key
             api_key = getattr(settings, 'GOOGLE_GENERATIVE_AI_API_KEY', None)
@@ -48,21 +165,30 @@ class AIQuizService:
                 api_key = os.getenv('GOOGLE_GENERATIVE_AI_API_KEY')
             
             if not api_key or api_key == 'your-api-key-here':
-                print("Warning: Google Generative AI API key not found. Using fallback mode.")
-                self.llm = None
-                return
+                logger.warning("Google Generative AI API key not found. Using fallback mode.")
+                return None
+            
+            # Imported here: the SDK (and gRPC underneath) is the slowest import in the project
+            import google.generativeai as genai
             
             genai.configure(api_key=api_key)
             
             # Use direct Google Generative AI instead of LangChain to avoid compatibility issues
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
+            return genai.GenerativeModel(getattr(settings, 'QUIZ_GEMINI_MODEL', 'gemini-1.5-flash'))
             
         except Exception as e:
-            print(f"Error setting up AI service: {e}")
-            self.llm = None
+            logger.error("Error setting up AI service: %s", e)
+            return None
     
-    def generate_quiz_prompt(self, topic: str, difficulty: str, num_questions: int) -> str:
-        """Generate the prompt for quiz creation"""
+    def generate_quiz_prompt(self, topic: str, difficulty: str, num_questions: int,
+                             part: Optional[int] = None, parts: Optional[int] = None,
+                             avoid: Optional[List[str]] = None) -> str:
+        """Generate the prompt for quiz creation
+        
+        part/parts describe one batch of a chunked quiz; avoid lists questions already in the
+        quiz that a regenerated batch must not repeat. QUIZ_RESPONSE_FORMAT picks the response
+        format asked for: 'verbose' (the full QuizPydantic JSON) or 'compact' (COMPACT_KEYS).
+        """
         
         difficulty_instructions = {
             "easy": "Make questions straightforward with basic concepts and clear answers.",
@@ -70,6 +196,29 @@ class AIQuizService:
             "hard": "Create challenging questions that require deep understanding and critical thinking."
         }
         
+        extra_instructions = []
+        if part and parts and parts > 1:
+            extra_instructions.append(
+                f"This is batch {part} of {parts} of a larger quiz: cover different aspects of the "
+                f"topic than the other batches and avoid generic overview questions\n"
+            )
+        if avoid:
+            listed = ''.join(f"   - {question}\n" for question in avoid)
+            extra_instructions.append(
+                f"Do not repeat or rephrase any of these questions, which the quiz already has:\n{listed}"
+            )
+        
+        if getattr(settings, 'QUIZ_RESPONSE_FORMAT', 'verbose') == 'compact':
+            return f"""Create a quiz about "{topic}" with {num_questions} multiple choice questions.
+Difficulty Level: {difficulty}
+{difficulty_instructions.get(difficulty, "Use medium difficulty level.")}
+Each question has 4 options with exactly one correct, and a clear explanation of the answer. Keep questions relevant to the topic, varied within the level and unambiguous.
+{''.join(extra_instructions)}Reply with only a minified JSON array, one object per question:
+[{{"q":"question","o":["option A","option B","option C","option D"],"a":0,"e":"explanation"}}]
+where a is the index (0-3) of the correct option in o."""
+        
+        batch_instructions = ''.join(f"{number}. {instruction}"
+                                     for number, instruction in enumerate(extra_instructions, start=7))
         prompt = f"""Create a quiz about "{topic}" with {num_questions} multiple choice questions.
 
 Difficulty Level: {difficulty}
@@ -82,7 +231,7 @@ Requirements:
 4. Make sure questions are relevant to the topic
 5. Vary the difficulty within the specified level
 6. Use clear, unambiguous language
-
+{batch_instructions}
 Please respond with a JSON object in this exact format:
 {{
   "topic": "{topic}",
@@ -105,8 +254,12 @@ Generate the quiz now:"""
         
         return prompt
     
+    @metrics.counts_generation
     def generate_quiz(self, topic: str, difficulty: str = "medium", num_questions: int = 10) -> QuizPydantic:
         """Generate a complete quiz using AI"""
+        if self.should_chunk(num_questions):
+            return self.generate_quiz_chunked(topic, difficulty, num_questions)
+        
         try:
             if not hasattr(self, 'model') or self.model is None:
                 return self.create_fallback_quiz(topic, difficulty, num_questions)
@@ -115,31 +268,404 @@ Generate the quiz now:"""
             prompt = self.generate_quiz_prompt(topic, difficulty, num_questions)
             
             # Generate response using Google AI directly
-            response = self.model.generate_content(prompt)
+            text = self._generate_text(prompt)
             
-            if not response or not response.text:
+            if not text:
                 return self.create_fallback_quiz(topic, difficulty, num_questions)
             
             # Parse the response content
-            content = response.text
-            
-            # Try to extract JSON from the response
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                quiz_data = json.loads(json_str)
-                
-                # Validate and create QuizPydantic object
-                return QuizPydantic(**quiz_data)
-            else:
+            quiz = self.parse_quiz_response(text, topic, difficulty)
+            if quiz is None:
                 # If no JSON found, return fallback
                 return self.create_fallback_quiz(topic, difficulty, num_questions)
             
+            merger = QuestionMerger(num_questions, topic)
+            merger.deduplicator.prepare()
+            for question in quiz.questions:
+                merger.add(question)
+            self._top_up(topic, difficulty, merger)
+            if merger.questions:
+                quiz.questions = merger.questions
+            return quiz
+            
         except Exception as e:
-            print(f"Error generating quiz: {e}")
+            logger.warning("Error generating quiz: %s", e)
             # Return a fallback quiz structure
             return self.create_fallback_quiz(topic, difficulty, num_questions)
     
+    def parse_quiz_response(self, content: str, topic: Optional[str] = None,
+                            difficulty: Optional[str] = None) -> Optional[QuizPydantic]:
+        """Extract and validate the quiz JSON from a model response (None if nothing usable)"""
+        from .parser import parse_quiz_response
+        
+        with metrics.timer(metrics.PARSE_SECONDS, mode='full'):
+            result = parse_quiz_response(content, topic, difficulty)
+        if result.invalid or result.salvaged:
+            logger.info("Parsed quiz response with %d valid and %d invalid questions%s",
+                        len(result.questions), result.invalid, ' (salvaged)' if result.salvaged else '')
+        return result.quiz
+    
+    def should_chunk(self, num_questions: int) -> bool:
+        """Whether a request is large enough to be split into concurrent sub-requests
+
+        Only quizzes of more than QUIZ_GENERATION_CHUNK_THRESHOLD questions are: each batch is a
+        model call of its own, so chunking the common sizes would multiply the calls (and quota).
+        """
+        chunk_size = getattr(settings, 'QUIZ_GENERATION_CHUNK_SIZE', 5)
+        threshold = getattr(settings, 'QUIZ_GENERATION_CHUNK_THRESHOLD', 10)
+        has_model = getattr(self, 'model', None) is not None
+        return has_model and bool(chunk_size) and num_questions > max(chunk_size, threshold)
+    
+    def chunk_sizes(self, num_questions: int) -> List[int]:
+        """Split a question count into as few batches of at most QUIZ_GENERATION_CHUNK_SIZE as
+        possible, balanced so they finish together (12 in batches of 5: [4, 4, 4])"""
+        chunk_size = getattr(settings, 'QUIZ_GENERATION_CHUNK_SIZE', 5)
+        batches = -(-num_questions // chunk_size)
+        base, extra = divmod(num_questions, batches)
+        return [base + 1] * extra + [base] * (batches - extra)
+    
+    def generate_quiz_chunked(self, topic: str, difficulty: str, num_questions: int,
+                              on_question: Optional[Callable[[QuizQuestionPydantic], None]] = None,
+                              stream: bool = False) -> QuizPydantic:
+        """Generate a large quiz as concurrent batches and merge them, dropping near-duplicates"""
+        concurrency = getattr(settings, 'QUIZ_GENERATION_CHUNK_CONCURRENCY', 4)
+        sizes = self.chunk_sizes(num_questions)
+        
+        # Batches report through a queue so on_question (which may touch the DB) runs on this thread
+        results = queue.Queue()
+        done = object()
+        merger = QuestionMerger(num_questions, topic)
+        merger.deduplicator.prepare()
+        
+        def run_chunk(part, size):
+            try:
+                self._generate_chunk(topic, difficulty, size, part, len(sizes), stream, results.put)
+            finally:
+                results.put(done)
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(sizes)))) as executor:
+            for part, size in enumerate(sizes, start=1):
+                # In a copy of this context, so the batch's model calls count towards this generation
+                executor.submit(contextvars.copy_context().run, run_chunk, part, size)
+            
+            pending = len(sizes)
+            while pending:
+                item = results.get()
+                if item is done:
+                    pending -= 1
+                elif merger.add(item) and on_question:
+                    on_question(item)
+        
+        self._top_up(topic, difficulty, merger, stream, on_question)
+        if not merger.questions:
+            # Every batch failed
+            return self.create_fallback_quiz(topic, difficulty, num_questions)
+        
+        return QuizPydantic(
+            topic=topic,
+            difficulty=difficulty,
+            questions=merger.questions
+        )
+    
+    def _top_up(self, topic: str, difficulty: str, merger: QuestionMerger, stream: bool = False,
+                on_question: Optional[Callable[[QuizQuestionPydantic], None]] = None):
+        """Regenerate the questions dropped as duplicates, listing the accepted ones to avoid"""
+        def emit(question):
+            if merger.add(question) and on_question:
+                on_question(question)
+        
+        for _ in range(getattr(settings, 'QUIZ_DEDUP_REGENERATE_ATTEMPTS', 1)):
+            if not merger.needs_top_up():
+                return
+            self._generate_chunk(topic, difficulty, merger.missing, None, None, stream, emit,
+                                 avoid=[question.question for question in merger.questions])
+    
+    def _generate_chunk(self, topic: str, difficulty: str, size: int, part: Optional[int], parts: Optional[int],
+                        stream: bool, emit: Callable[[QuizQuestionPydantic], None],
+                        avoid: Optional[List[str]] = None):
+        """Generate one batch, retrying it on its own when it produces nothing usable"""
+        from .parser import IncrementalQuestionParser
+        
+        retries = getattr(settings, 'QUIZ_GENERATION_CHUNK_RETRIES', 1)
+        prompt = self.generate_quiz_prompt(topic, difficulty, size, part=part, parts=parts, avoid=avoid)
+        batch = f"batch {part}/{parts}" if part else "top-up batch"
+        
+        for attempt in range(retries + 1):
+            emitted = 0
+            try:
+                if stream:
+                    parser = IncrementalQuestionParser(difficulty)
+                    for chunk in self._stream_content(prompt):
+                        for question in self._feed(parser, chunk.text):
+                            emit(question)
+                            emitted += 1
+                else:
+                    text = self._generate_text(prompt)
+                    quiz = self.parse_quiz_response(text, topic, difficulty) if text else None
+                    for question in (quiz.questions if quiz else []):
+                        emit(question)
+                        emitted += 1
+            except LLMUnavailable as e:
+                # Circuit open or no call slot: retrying the batch would only fail again
+                logger.warning("Skipping %s: %s", batch, e)
+                return
+            except Exception as e:
+                logger.warning("Error generating %s (attempt %d): %s", batch, attempt + 1, e)
+            
+            if emitted:
+                return
+    
+    @metrics.counts_generation
+    def generate_quiz_streaming(self, topic: str, difficulty: str = "medium", num_questions: int = 10,
+                                on_question: Optional[Callable[[QuizQuestionPydantic], None]] = None) -> QuizPydantic:
+        """Generate a quiz with the streaming API, calling on_question as each question is parsed"""
+        from .parser import IncrementalQuestionParser
+        
+        if self.should_chunk(num_questions):
+            return self.generate_quiz_chunked(topic, difficulty, num_questions, on_question, stream=True)
+        
+        merger = QuestionMerger(num_questions, topic)
+        try:
+            if not hasattr(self, 'model') or self.model is None:
+                return self.create_fallback_quiz(topic, difficulty, num_questions)
+            
+            merger.deduplicator.prepare()
+            prompt = self.generate_quiz_prompt(topic, difficulty, num_questions)
+            parser = IncrementalQuestionParser(difficulty)
+            
+            for chunk in self._stream_content(prompt):
+                for question in self._feed(parser, chunk.text):
+                    if merger.add(question) and on_question:
+                        on_question(question)
+            
+        except Exception as e:
+            # Keep whatever was streamed before the failure
+            logger.warning("Error streaming quiz: %s", e)
+        
+        if merger.questions:
+            self._top_up(topic, difficulty, merger, stream=True, on_question=on_question)
+        questions = merger.questions
+        if not questions:
+            return self.create_fallback_quiz(topic, difficulty, num_questions)
+        
+        return QuizPydantic(
+            topic=topic,
+            difficulty=difficulty,
+            questions=questions
+        )
+    
+    @metrics.counts_generation
+    async def generate_quiz_async(self, topic: str, difficulty: str = "medium", num_questions: int = 10,
+                                  on_question: Optional[Callable[[QuizQuestionPydantic], Awaitable[None]]] = None
+                                  ) -> QuizPydantic:
+        """Generate a quiz with the model's async API (generate_content_async)
+        
+        The event loop is free while the model responds, so one ASGI worker can keep many
+        generations in flight. With on_question (a coroutine function) the response is streamed
+        and each question is reported as it is parsed.
+        """
+        if self.should_chunk(num_questions):
+            return await self.generate_quiz_chunked_async(topic, difficulty, num_questions, on_question)
+        
+        merger = QuestionMerger(num_questions, topic)
+        try:
+            if not hasattr(self, 'model') or self.model is None:
+                return self.create_fallback_quiz(topic, difficulty, num_questions)
+            
+            await self._prepare_async(merger)
+            prompt = self.generate_quiz_prompt(topic, difficulty, num_questions)
+            async for question in self._questions_async(prompt, topic, difficulty, stream=on_question is not None):
+                if merger.add(question) and on_question:
+                    await on_question(question)
+            
+        except Exception as e:
+            # Keep whatever was streamed before the failure
+            logger.warning("Error generating quiz: %s", e)
+        
+        if merger.questions:
+            await self._top_up_async(topic, difficulty, merger, on_question)
+        questions = merger.questions
+        if not questions:
+            return self.create_fallback_quiz(topic, difficulty, num_questions)
+        
+        return QuizPydantic(
+            topic=topic,
+            difficulty=difficulty,
+            questions=questions
+        )
+    
+    async def generate_quiz_chunked_async(self, topic: str, difficulty: str, num_questions: int,
+                                          on_question: Optional[Callable[[QuizQuestionPydantic], Awaitable[None]]] = None
+                                          ) -> QuizPydantic:
+        """Async counterpart of generate_quiz_chunked: batches run as concurrent coroutines"""
+        semaphore = asyncio.Semaphore(max(1, getattr(settings, 'QUIZ_GENERATION_CHUNK_CONCURRENCY', 4)))
+        sizes = self.chunk_sizes(num_questions)
+        merger = QuestionMerger(num_questions, topic)
+        await self._prepare_async(merger)
+        
+        async def emit(question):
+            if merger.add(question) and on_question:
+                await on_question(question)
+        
+        async def run_chunk(part, size):
+            async with semaphore:
+                await self._generate_chunk_async(topic, difficulty, size, part, len(sizes),
+                                                 on_question is not None, emit)
+        
+        await asyncio.gather(*(run_chunk(part, size) for part, size in enumerate(sizes, start=1)))
+        await self._top_up_async(topic, difficulty, merger, on_question)
+        
+        if not merger.questions:
+            # Every batch failed
+            return self.create_fallback_quiz(topic, difficulty, num_questions)
+        
+        return QuizPydantic(
+            topic=topic,
+            difficulty=difficulty,
+            questions=merger.questions
+        )
+    
+    async def _prepare_async(self, merger: QuestionMerger):
+        """Load the merger's stored-question index (a database read) off the event loop"""
+        if merger.deduplicator.use_stored:
+            await sync_to_async(merger.deduplicator.prepare)()
+    
+    async def _top_up_async(self, topic: str, difficulty: str, merger: QuestionMerger,
+                            on_question: Optional[Callable[[QuizQuestionPydantic], Awaitable[None]]] = None):
+        """Async counterpart of _top_up"""
+        async def emit(question):
+            if merger.add(question) and on_question:
+                await on_question(question)
+        
+        for _ in range(getattr(settings, 'QUIZ_DEDUP_REGENERATE_ATTEMPTS', 1)):
+            if not merger.needs_top_up():
+                return
+            await self._generate_chunk_async(topic, difficulty, merger.missing, None, None, on_question is not None,
+                                             emit, avoid=[question.question for question in merger.questions])
+    
+    async def _generate_chunk_async(self, topic: str, difficulty: str, size: int, part: Optional[int],
+                                    parts: Optional[int], stream: bool,
+                                    emit: Callable[[QuizQuestionPydantic], Awaitable[None]],
+                                    avoid: Optional[List[str]] = None):
+        """Async counterpart of _generate_chunk"""
+        retries = getattr(settings, 'QUIZ_GENERATION_CHUNK_RETRIES', 1)
+        prompt = self.generate_quiz_prompt(topic, difficulty, size, part=part, parts=parts, avoid=avoid)
+        batch = f"batch {part}/{parts}" if part else "top-up batch"
+        
+        for attempt in range(retries + 1):
+            emitted = 0
+            try:
+                async for question in self._questions_async(prompt, topic, difficulty, stream=stream):
+                    emitted += 1
+                    await emit(question)
+            except LLMUnavailable as e:
+                logger.warning("Skipping %s: %s", batch, e)
+                return
+            except Exception as e:
+                logger.warning("Error generating %s (attempt %d): %s", batch, attempt + 1, e)
+            
+            if emitted:
+                return
+    
+    async def _questions_async(self, prompt: str, topic: str, difficulty: str,
+                               stream: bool = False) -> AsyncIterator[QuizQuestionPydantic]:
+        """Yield the valid questions of one async model call, as they stream in when stream is set"""
+        from .parser import IncrementalQuestionParser
+        
+        if stream:
+            parser = IncrementalQuestionParser(difficulty)
+            async for chunk in self._astream_content(prompt):
+                for question in self._feed(parser, chunk.text):
+                    yield question
+            return
+        
+        text = await self._agenerate_text(prompt)
+        quiz = self.parse_quiz_response(text, topic, difficulty) if text else None
+        for question in (quiz.questions if quiz else []):
+            yield question
+    
+    def _generate_text(self, prompt: str) -> Optional[str]:
+        """One guarded, instrumented model call; returns the response text"""
+        started = time.perf_counter()
+        outcome, text = 'error', None
+        try:
+            response = self.guard.call(
+                lambda: self.model.generate_content(prompt, request_options=self.guard.request_options)
+            )
+            text = response.text if response else None
+            outcome = 'ok'
+            return text
+        except LLMUnavailable:
+            outcome = 'rejected'
+            raise
+        finally:
+            metrics.record_llm_call('sync', outcome, time.perf_counter() - started, prompt, len(text or ''))
+    
+    async def _agenerate_text(self, prompt: str) -> Optional[str]:
+        """Async counterpart of _generate_text"""
+        started = time.perf_counter()
+        outcome, text = 'error', None
+        try:
+            response = await self.guard.acall(
+                lambda: self.model.generate_content_async(prompt, request_options=self.guard.request_options)
+            )
+            text = response.text if response else None
+            outcome = 'ok'
+            return text
+        except LLMUnavailable:
+            outcome = 'rejected'
+            raise
+        finally:
+            metrics.record_llm_call('async', outcome, time.perf_counter() - started, prompt, len(text or ''))
+    
+    def _stream_content(self, prompt: str):
+        """Streamed model response, guarded (retried only until the first chunk arrives) and instrumented"""
+        started = time.perf_counter()
+        outcome, size = 'error', 0
+        try:
+            for chunk in self.guard.stream(
+                lambda: self.model.generate_content(prompt, stream=True, request_options=self.guard.request_options)
+            ):
+                size += len(chunk.text)
+                yield chunk
+            outcome = 'ok'
+        except GeneratorExit:
+            # The caller had all the questions it needed
+            outcome = 'ok'
+            raise
+        except LLMUnavailable:
+            outcome = 'rejected'
+            raise
+        finally:
+            metrics.record_llm_call('stream', outcome, time.perf_counter() - started, prompt, size)
+    
+    async def _astream_content(self, prompt: str):
+        """Async counterpart of _stream_content"""
+        started = time.perf_counter()
+        outcome, size = 'error', 0
+        try:
+            async for chunk in self.guard.astream(
+                lambda: self.model.generate_content_async(prompt, stream=True,
+                                                          request_options=self.guard.request_options)
+            ):
+                size += len(chunk.text)
+                yield chunk
+            outcome = 'ok'
+        except GeneratorExit:
+            outcome = 'ok'
+            raise
+        except LLMUnavailable:
+            outcome = 'rejected'
+            raise
+        finally:
+            metrics.record_llm_call('async_stream', outcome, time.perf_counter() - started, prompt, size)
+    
+    @staticmethod
+    def _feed(parser, text: str) -> List[QuizQuestionPydantic]:
+        """Feed a streamed chunk to the incremental parser, timing it"""
+        with metrics.timer(metrics.PARSE_SECONDS, mode='stream'):
+            return parser.feed(text)
+    
     def create_fallback_quiz(self, topic: str, difficulty: str, num_questions: int) -> QuizPydantic:
         """Create a basic fallback quiz if AI generation fails"""
         questions = []
@@ -157,20 +683,30 @@ Generate the quiz now:"""
             )
             questions.append(question)
         
-        return QuizPydantic(
+        quiz = QuizPydantic(
             topic=topic,
             difficulty=difficulty,
             questions=questions
         )
+        quiz._is_fallback = True
+        return quiz
     
     def validate_quiz_data(self, quiz_data: Dict[str, Any]) -> QuizPydantic:
         """Validate quiz data using Pydantic"""
         try:
             return QuizPydantic(**quiz_data)
         except Exception as e:
-            print(f"Validation error: {e}")
+            logger.warning("Validation error: %s", e)
             raise ValueError(f"Invalid quiz data: {e}")
 
 
-# Global instance
+# Global instance; creating it is cheap, the model client is set up on first use
 ai_quiz_service = AIQuizService()
+
+
+def warm_up():
+    """Worker boot hook (see gunicorn.conf.py): pay the SDK import and client setup before the first request"""
+    from .resilience import transient_errors
+    
+    ai_quiz_service.warm_up()
+    transient_errors()
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class QuizConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "quiz"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .metrics import install_query_counter
+
+        # Per-request query counts for the metrics middleware
+        connection_created.connect(install_query_counter, dispatch_uid='quiz.metrics.install_query_counter')
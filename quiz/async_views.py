@@ -0,0 +1,269 @@
+"""
+Async versions of the quiz views for ASGI deployments (enabled with QUIZ_ASYNC_VIEWS)
+They use the async ORM and the async Gemini client, so a request waiting on the database,
+a long-poll or the model does not hold a worker thread
+"""
+
+import asyncio
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from django.shortcuts import render, redirect
+
+from .models import Quiz, GenerationStatus
+from .admission import Throttled, check_rate
+from .jobs import schedule_generation_async, run_generation_job_async, generation_is_stale, expire_stale_generation
+from .repository import quiz_repository
+from .results_cache import invalidate_results
+from .views import (
+    read_generation_form, render_generating, start_quiz, throttled_response, status_response, stream_settings,
+    stream_snapshot, is_generating, stream_finished, sse_event, event_stream_response,
+)
+
+
+def require_http_methods_async(methods):
+    """require_http_methods for coroutine views (Django 4.2's decorator only wraps sync views)"""
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view(request, *args, **kwargs)
+        return inner
+    return decorator
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    """Async get_object_or_404 for a queryset"""
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+
+
+async def expire_if_stale(quiz):
+    """jobs.expire_stale_generation, leaving the event loop only for a stale quiz"""
+    if generation_is_stale(quiz):
+        await sync_to_async(expire_stale_generation)(quiz)
+
+
+async def get_current_question(quiz, index):
+    """The question at position index, or None once the (so far generated) questions run out"""
+    return await quiz.questions.filter(order=index).afirst()
+
+
+@require_http_methods_async(["POST"])
+async def generate_quiz(request):
+    """Generate a new quiz using AI"""
+    try:
+        topic, difficulty, num_questions = read_generation_form(request.POST)
+
+        if not topic:
+            messages.error(request, 'Topic is required')
+            return redirect('quiz:index')
+
+        # The rows are committed before generation starts on the event loop; the rate limit
+        # is charged only if the quiz needs the model
+        quiz, from_bank = await sync_to_async(start_quiz)(topic, difficulty, num_questions, enqueue=False,
+                                                          charge=lambda: check_rate(request, num_questions))
+
+        if not from_bank:
+            if getattr(settings, 'QUIZ_ASYNC_GENERATION', True):
+                schedule_generation_async(quiz.pk)
+            else:
+                # Legacy mode: generate inside the request, without holding a thread
+                await run_generation_job_async(quiz.pk)
+
+        # Store quiz session ID in Django session (session access is still sync in Django 4.2)
+        await sync_to_async(request.session.__setitem__)('quiz_session_id', quiz.session_id)
+
+        return redirect('quiz:quiz_detail', session_id=quiz.session_id)
+
+    except Throttled as e:
+        return await sync_to_async(throttled_response)(request, e)
+    except Exception as e:
+        messages.error(request, f'Error generating quiz: {str(e)}')
+        return redirect('quiz:index')
+
+
+async def quiz_detail(request, session_id):
+    """Display quiz questions"""
+    try:
+        quiz = await aget_object_or_404(Quiz.objects.select_related('session'), session_id=session_id)
+        await expire_if_stale(quiz)
+        quiz_session = quiz.session
+
+        current_index = quiz_session.current_question_index
+        current_question = await get_current_question(quiz, current_index)
+
+        if current_question is None:
+            if not quiz.is_ready:
+                # Questions are still being generated (or generation failed)
+                return render_generating(request, quiz, current_index)
+
+            if not quiz_session.is_completed:
+                # The last question was answered while generation was still finishing
+                quiz_session.is_completed = True
+                await quiz_session.asave(update_fields=['is_completed', 'last_activity'])
+
+            # Quiz completed, redirect to results
+            return redirect('quiz:quiz_results', session_id=session_id)
+
+        # Calculate progress (questions may still be streaming in, so use the quiz total)
+        progress_percentage = ((current_index) / quiz.total_questions) * 100
+
+        context = {
+            'quiz': quiz,
+            'quiz_session': quiz_session,
+            'current_question': current_question,
+            'question_number': current_index + 1,
+            'total_questions': quiz.total_questions,
+            'progress_percentage': progress_percentage,
+            'options': current_question.options,
+        }
+
+        return render(request, 'quiz/quiz_detail.html', context)
+
+    except Exception as e:
+        messages.error(request, f'Error loading quiz: {str(e)}')
+        return redirect('quiz:index')
+
+
+@require_http_methods_async(["POST"])
+async def submit_answer(request, session_id):
+    """Submit an answer for a quiz question"""
+    try:
+        quiz = await aget_object_or_404(Quiz.objects.select_related('session'), session_id=session_id)
+        quiz_session = quiz.session
+
+        # Get submitted answer
+        selected_option = request.POST.get('selected_option')
+        if selected_option is None:
+            messages.error(request, 'Please select an answer')
+            return redirect('quiz:quiz_detail', session_id=session_id)
+
+        selected_option = int(selected_option)
+
+        # Get current question
+        current_index = quiz_session.current_question_index
+        current_question = await get_current_question(quiz, current_index)
+
+        if current_question is None:
+            if not quiz.is_ready:
+                return redirect('quiz:quiz_detail', session_id=session_id)
+            return redirect('quiz:quiz_results', session_id=session_id)
+
+        # Save the answer; score and statistics are incremented in the same transaction.
+        # Once generation is done total_questions is the stored question count.
+        completes = quiz.is_ready and current_index + 1 >= quiz.total_questions
+        try:
+            await sync_to_async(quiz_repository.record_answer)(quiz_session, current_question, selected_option,
+                                                               completes=completes)
+            await sync_to_async(invalidate_results)(session_id)
+        except IntegrityError:
+            # Already answered, move to next question
+            await sync_to_async(quiz_repository.skip_question)(quiz_session)
+
+        return redirect('quiz:quiz_detail', session_id=session_id)
+
+    except Exception as e:
+        messages.error(request, f'Error submitting answer: {str(e)}')
+        return redirect('quiz:quiz_detail', session_id=session_id)
+
+
+@require_http_methods_async(["GET"])
+async def quiz_status(request, session_id):
+    """API endpoint to get quiz status (JSON response, conditional on If-None-Match)"""
+    try:
+        quiz = await aget_object_or_404(Quiz.objects.select_related('session__statistics'), session_id=session_id)
+        await expire_if_stale(quiz)
+        return status_response(request, quiz)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+async def status_events(session_id, last_event_id=None):
+    """Async version of views.status_events; an open stream costs no worker thread"""
+    interval, heartbeat, max_seconds = stream_settings()
+    deadline = time.monotonic() + max_seconds
+    last_sent = time.monotonic()
+    yield f"retry: {int(interval * 2000)}\n\n"
+
+    queryset = Quiz.objects.select_related('session__statistics')
+    while True:
+        quiz = await queryset.filter(session_id=session_id).afirst()
+        if quiz is None:
+            yield sse_event({'error': 'Quiz not found'}, event='end')
+            return
+        await expire_if_stale(quiz)
+
+        questions_generated = await quiz.questions.acount() if is_generating(quiz) else quiz.total_questions
+        event_id, data = stream_snapshot(quiz, questions_generated)
+        if event_id != last_event_id:
+            yield sse_event(data, event_id)
+            last_event_id, last_sent = event_id, time.monotonic()
+        elif time.monotonic() - last_sent >= heartbeat:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+
+        if stream_finished(data):
+            yield sse_event(data, event_id, event='end')
+            return
+        if time.monotonic() >= deadline:
+            return
+        await asyncio.sleep(interval)
+
+
+@require_http_methods_async(["GET"])
+async def quiz_events(request, session_id):
+    """Server-sent events stream of quiz status and generation progress"""
+    await aget_object_or_404(Quiz.objects.all(), session_id=session_id)
+    return event_stream_response(status_events(session_id, request.headers.get('Last-Event-ID')))
+
+
+@require_http_methods_async(["GET"])
+async def generation_status(request, session_id):
+    """Long-poll endpoint for generation progress (see views.generation_status)
+
+    Waiting happens with asyncio.sleep, so held long-polls cost no worker thread.
+    """
+    try:
+        quiz = await aget_object_or_404(Quiz.objects.all(), session_id=session_id)
+        await expire_if_stale(quiz)
+
+        try:
+            wait = float(request.GET.get('wait', 0))
+            after = int(request.GET.get('after', -1))
+        except ValueError:
+            wait, after = 0, -1
+        wait = max(0, min(wait, getattr(settings, 'QUIZ_GENERATION_MAX_WAIT', 25)))
+
+        # Long-poll: hold the request until generation progresses or the wait expires
+        deadline = time.monotonic() + wait
+        questions_generated = await quiz.questions.acount()
+        while (quiz.status in (GenerationStatus.PENDING, GenerationStatus.GENERATING)
+               and questions_generated <= after and time.monotonic() < deadline):
+            await asyncio.sleep(0.25)
+            await quiz.arefresh_from_db(fields=['status', 'total_questions', 'error_message'])
+            questions_generated = await quiz.questions.acount()
+
+        data = {
+            'quiz_id': session_id,
+            'status': quiz.status,
+            'is_ready': quiz.is_ready,
+            'total_questions': quiz.total_questions,
+            'questions_generated': questions_generated,
+            'time_to_first_question': quiz.time_to_first_question,
+            'error': quiz.error_message or None,
+        }
+
+        return JsonResponse(data)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
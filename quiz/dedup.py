@@ -0,0 +1,276 @@
+"""
+Near-duplicate question detection
+Questions are reduced to sets of hashed word shingles (content words and word pairs, so a
+rewording that keeps the substance still overlaps). MinHash signatures bucketed by LSH bands
+find candidates quickly; the exact Jaccard similarity of the shingle sets decides. Signatures
+are computed in batches with NumPy when it is installed and in plain Python otherwise.
+"""
+
+import random
+import re
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; signatures are then computed one question at a time
+    np = None
+
+PRIME = (1 << 31) - 1
+
+STOPWORDS = frozenset("""
+    a about above after all an and any are as at be been being below between both but by can could
+    did do does doing during each few for from had has have having how i if in into is it its itself
+    just more most no nor not of off on once only or other our out over own same should so some such
+    than that the their them then there these they this those through to too under until up very was
+    we were what when where which while who whom why will with would you your
+""".split())
+
+
+def normalize_question_text(text: str) -> str:
+    """Lowercase a question and strip punctuation/extra whitespace for duplicate checks"""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text.casefold()).split())
+
+
+def topic_words(topic: str) -> frozenset:
+    """Words of a topic, which every question on it may repeat without being a duplicate"""
+    return frozenset(normalize_question_text(topic or '').split())
+
+
+def shingles(text: str, ignore: frozenset = frozenset()) -> frozenset:
+    """32-bit hashes of a question's content words and adjacent content-word pairs
+
+    Stopwords and the ignore words (usually the topic's) are dropped first.
+    """
+    words = [word for word in normalize_question_text(text).split()
+             if word not in STOPWORDS and word not in ignore]
+    grams = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+    return frozenset(zlib.crc32(gram.encode('utf-8')) for gram in grams)
+
+
+def jaccard(first: frozenset, second: frozenset) -> float:
+    shared = len(first & second)
+    union = len(first) + len(second) - shared
+    return shared / union if union else 0.0
+
+
+class MinHasher:
+    """MinHash signatures of shingle sets, cut into LSH bands
+
+    With bands x rows = num_perm, two sets of Jaccard similarity s share at least one band
+    with probability 1 - (1 - s**rows)**bands: about 0.99 at s = 0.6 for the default 32 x 4.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self.a = [rng.randrange(1, PRIME) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, PRIME) for _ in range(num_perm)]
+        # Questions share most of their vocabulary, so each shingle's num_perm hash values are
+        # kept (up to cache_size shingles) and a signature is a column-wise min over its shingles
+        self.cache_size = 50_000
+        self._permutations = list(zip(self.a, self.b))
+        self._cache: Dict[int, array] = {}
+
+    def _permuted(self, shingle: int) -> array:
+        row = self._cache.get(shingle)
+        if row is None:
+            row = array('L', [(a * shingle + b) % PRIME for a, b in self._permutations])
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[shingle] = row
+        return row
+
+    def _bands(self, signature: Sequence[int]) -> List[Tuple[int, int]]:
+        # Hashes of int tuples are not salted, so keys are stable across processes
+        rows = self.rows
+        return [(band, hash(tuple(signature[band * rows:(band + 1) * rows]))) for band in range(self.bands)]
+
+    def band_keys(self, shingle_set: frozenset) -> List[Tuple[int, int]]:
+        """LSH bucket keys of one shingle set"""
+        if not shingle_set:
+            return []
+        return self._bands(list(map(min, zip(*map(self._permuted, shingle_set)))))
+
+    def band_keys_batch(self, shingle_sets: Sequence[frozenset]) -> List[List[Tuple[int, int]]]:
+        """band_keys for many sets at once, with the signatures vectorized by NumPy when available"""
+        if np is None:
+            return [self.band_keys(shingle_set) for shingle_set in shingle_sets]
+
+        lengths = np.array([len(s) for s in shingle_sets], dtype=np.int64)
+        keys = [[] for _ in shingle_sets]
+        present = np.flatnonzero(lengths)
+        if not len(present):
+            return keys
+
+        values = np.fromiter((x for i in present for x in shingle_sets[i]), dtype=np.uint64,
+                             count=int(lengths[present].sum()))
+        starts = np.concatenate(([0], np.cumsum(lengths[present])[:-1]))
+        a = np.array(self.a, dtype=np.uint64)[:, None]
+        b = np.array(self.b, dtype=np.uint64)[:, None]
+        prime = np.uint64(PRIME)
+
+        # Chunks of questions keep the (num_perm x their shingles) intermediate small
+        chunk = 4096
+        for first in range(0, len(present), chunk):
+            last = min(first + chunk, len(present))
+            lo = starts[first]
+            hi = starts[last] if last < len(present) else len(values)
+            hashed = (a * values[lo:hi][None, :] + b) % prime
+            signatures = np.minimum.reduceat(hashed, starts[first:last] - lo, axis=1).T
+            for index, signature in zip(present[first:last], signatures.tolist()):
+                keys[index] = self._bands(signature)
+        return keys
+
+
+class SimilarityIndex:
+    """Nearest-neighbour lookup of questions by shingle-set similarity
+
+    Keys are arbitrary hashables (question ids, positions in a quiz). Only shingle sets are
+    kept per question; signatures are reduced to their LSH bucket keys when added.
+    """
+
+    def __init__(self, ignore: frozenset = frozenset(), hasher: Optional[MinHasher] = None):
+        self.ignore = ignore
+        self.hasher = hasher or default_hasher()
+        self._buckets: Dict[Tuple[int, int], List[Hashable]] = defaultdict(list)
+        self._shingles: Dict[Hashable, frozenset] = {}
+
+    def __len__(self):
+        return len(self._shingles)
+
+    def add(self, key: Hashable, text: str):
+        self.add_many([(key, text)])
+
+    def add_many(self, items: Iterable[Tuple[Hashable, str]]):
+        """Index (key, question text) pairs in one batch"""
+        items = list(items)
+        shingle_sets = [shingles(text, self.ignore) for _, text in items]
+        for (key, _), shingle_set, keys in zip(items, shingle_sets, self.hasher.band_keys_batch(shingle_sets)):
+            self._shingles[key] = shingle_set
+            for band_key in keys:
+                self._buckets[band_key].append(key)
+
+    def _candidates(self, query: frozenset, threshold: float):
+        """Keys sharing an LSH band with the query, skipping sets too small or large to reach threshold"""
+        low, high = len(query) * threshold, len(query) / threshold if threshold else float('inf')
+        seen = set()
+        for band_key in self.hasher.band_keys(query):
+            for key in self._buckets.get(band_key, ()):
+                if key not in seen:
+                    seen.add(key)
+                    if low <= len(self._shingles[key]) <= high:
+                        yield key
+
+    def nearest(self, text: str, threshold: float = 0.0, limit: int = 5) -> List[Tuple[Hashable, float]]:
+        """Up to limit (key, similarity) pairs at or above threshold, most similar first"""
+        query = shingles(text, self.ignore)
+        scored = [(key, jaccard(query, self._shingles[key])) for key in self._candidates(query, threshold)]
+        scored = [(key, score) for key, score in scored if score >= threshold and score > 0]
+        scored.sort(key=lambda item: -item[1])
+        return scored[:limit]
+
+    def similar(self, text: str, threshold: float) -> Optional[Hashable]:
+        """Key of any question at or above threshold (not necessarily the nearest), or None"""
+        query = shingles(text, self.ignore)
+        for key in self._candidates(query, threshold):
+            if jaccard(query, self._shingles[key]) >= threshold:
+                return key
+        return None
+
+
+_default_hasher = None
+
+
+def default_hasher() -> MinHasher:
+    global _default_hasher
+    if _default_hasher is None:
+        _default_hasher = MinHasher()
+    return _default_hasher
+
+
+class StoredQuestionIndexes:
+    """Per-process LRU of SimilarityIndex objects over the stored questions of recently seen topics"""
+
+    def __init__(self, max_topics: int = 100):
+        self.max_topics = max_topics
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, topic: str) -> SimilarityIndex:
+        """The index for a topic, (re)built from the database when missing or older than the TTL"""
+        ttl = getattr(settings, 'QUIZ_DEDUP_INDEX_TTL', 600)
+        with self._lock:
+            entry = self._indexes.get(topic)
+            if entry and entry[0] > time.monotonic():
+                self._indexes.move_to_end(topic)
+                return entry[1]
+
+        index = self.build(topic)
+        with self._lock:
+            self._indexes[topic] = (time.monotonic() + ttl, index)
+            self._indexes.move_to_end(topic)
+            while len(self._indexes) > self.max_topics:
+                self._indexes.popitem(last=False)
+        return index
+
+    def build(self, topic: str) -> SimilarityIndex:
+        """Index the most recent QUIZ_DEDUP_TOPIC_LIMIT stored questions of a topic"""
+        from .models import QuizQuestion
+
+        limit = getattr(settings, 'QUIZ_DEDUP_TOPIC_LIMIT', 5000)
+        index = SimilarityIndex(topic_words(topic))
+        index.add_many(QuizQuestion.objects.filter(quiz__topic=topic).order_by('-id')
+                       .values_list('id', 'question')[:limit])
+        return index
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+stored_indexes = StoredQuestionIndexes()
+
+
+class QuestionDeduplicator:
+    """Rejects questions too similar to ones already accepted for a quiz (and, optionally, stored ones)
+
+    Questions are accepted in order: duplicate_of() checks a candidate, add() records an
+    accepted one. With stored=True (default QUIZ_DEDUP_STORED) candidates are also compared
+    with the topic's questions in earlier quizzes; call prepare() first, as it reads the database.
+    """
+
+    def __init__(self, topic: str = '', threshold: Optional[float] = None, stored: Optional[bool] = None):
+        self.topic = topic
+        self.threshold = threshold if threshold is not None else getattr(settings, 'QUIZ_DEDUP_THRESHOLD', 0.6)
+        self.use_stored = stored if stored is not None else getattr(settings, 'QUIZ_DEDUP_STORED', False)
+        self.accepted = SimilarityIndex(topic_words(topic))
+        self.stored: Optional[SimilarityIndex] = None
+
+    def prepare(self):
+        """Load the stored-question index for the topic, if one is used"""
+        if self.use_stored and self.topic and self.stored is None:
+            self.stored = stored_indexes.get(self.topic)
+
+    def duplicate_of(self, text: str) -> Optional[str]:
+        """'quiz' or 'stored' when the question repeats an accepted or a stored one, else None"""
+        if not self.threshold:
+            return None
+        if self.accepted.similar(text, self.threshold) is not None:
+            return 'quiz'
+        if self.stored is not None and self.stored.similar(text, self.threshold) is not None:
+            return 'stored'
+        return None
+
+    def add(self, text: str):
+        self.accepted.add(len(self.accepted), text)
@@ -0,0 +1,295 @@
+"""
+Deterministic stand-in for the Gemini GenerativeModel
+Used by tests and benchmarks to exercise generation without network access
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import AsyncIterator, Iterator, List, Optional
+
+
+class FakeResponse:
+    """Mimics a google.generativeai response (or a single streamed chunk)"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Fake model that answers quiz prompts with well-formed JSON
+
+    ``latency`` is a fixed delay per call, ``latency_per_question`` scales it with the questions
+    asked for and ``latency_per_char`` with the response length (like a model decoding tokens);
+    with ``stream=True`` the delay is spread across chunks of ``chunk_size`` characters.
+    ``explanation_chars`` pads each explanation to grow the response without changing its shape.
+    Prompts asking for the compact format are answered in it.
+    """
+
+    def __init__(self, latency: float = 0.0, latency_per_question: float = 0.0, chunk_size: int = 64,
+                 response_text: Optional[str] = None, explanation_chars: int = 0, latency_per_char: float = 0.0):
+        self.latency = latency
+        self.latency_per_question = latency_per_question
+        self.latency_per_char = latency_per_char
+        self.chunk_size = chunk_size
+        self.response_text = response_text
+        self.explanation_chars = explanation_chars
+        self.calls = 0
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        self.calls += 1
+        text = self.response_text if self.response_text is not None else self.build_response(prompt)
+        delay = self.delay(prompt, text)
+
+        if not stream:
+            if delay:
+                time.sleep(delay)
+            return FakeResponse(text)
+        return self._stream(text, delay)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        """Like generate_content, but sleeps with asyncio so concurrent calls overlap on one loop"""
+        self.calls += 1
+        text = self.response_text if self.response_text is not None else self.build_response(prompt)
+        delay = self.delay(prompt, text)
+
+        if not stream:
+            if delay:
+                await asyncio.sleep(delay)
+            return FakeResponse(text)
+        return self._astream(text, delay)
+
+    def delay(self, prompt: str, text: str) -> float:
+        return (self.latency + self.latency_per_question * self.count_questions(prompt)
+                + self.latency_per_char * len(text))
+
+    def _stream(self, text: str, delay: float) -> Iterator[FakeResponse]:
+        chunks = self._chunks(text)
+        for chunk in chunks:
+            if delay:
+                time.sleep(delay / len(chunks))
+            yield FakeResponse(chunk)
+
+    async def _astream(self, text: str, delay: float) -> AsyncIterator[FakeResponse]:
+        chunks = self._chunks(text)
+        for chunk in chunks:
+            if delay:
+                await asyncio.sleep(delay / len(chunks))
+            yield FakeResponse(chunk)
+
+    def _chunks(self, text: str) -> List[str]:
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or ['']
+
+    @staticmethod
+    def count_questions(prompt: str) -> int:
+        match = re.search(r'with (\d+) multiple choice questions', prompt)
+        return int(match.group(1)) if match else 10
+
+    @staticmethod
+    def parse_prompt(prompt: str):
+        topic = re.search(r'about "(.*?)"', prompt)
+        difficulty = re.search(r'Difficulty Level: (\w+)', prompt)
+        return (topic.group(1) if topic else 'General knowledge',
+                difficulty.group(1) if difficulty else 'medium')
+
+    def build_response(self, prompt: str) -> str:
+        topic, difficulty = self.parse_prompt(prompt)
+        count = self.count_questions(prompt)
+
+        # Batches of a chunked quiz, and batches regenerating dropped duplicates, get distinct questions
+        batch = re.search(r'batch (\d+) of (\d+)', prompt)
+        offset = (int(batch.group(1)) - 1) * 100 if batch else 0
+        if 'Do not repeat or rephrase' in prompt:
+            offset += 10_000
+
+        questions = self.build_questions(topic, difficulty, count, offset, self.explanation_chars)
+        if '"q":' in prompt:
+            return json.dumps([self.compact_question(question) for question in questions], separators=(',', ':'))
+        return '```json\n' + json.dumps(
+            {
+                'topic': topic,
+                'difficulty': difficulty,
+                'questions': questions,
+            },
+            indent=2,
+        ) + '\n```'
+
+    @staticmethod
+    def compact_question(question: dict) -> dict:
+        """A question in the compact response format"""
+        return {'q': question['question'],
+                'o': [question['option_a'], question['option_b'], question['option_c'], question['option_d']],
+                'a': question['correct_answer'], 'e': question['explanation']}
+
+    @staticmethod
+    def build_questions(topic: str, difficulty: str, count: int, offset: int = 0,
+                        explanation_chars: int = 0) -> List[dict]:
+        return [
+            {
+                'question': f"Which statement about {topic} is true for concepts {i + 1}a, {i + 1}b and {i + 1}c?",
+                'option_a': f"Statement A{i + 1}",
+                'option_b': f"Statement B{i + 1}",
+                'option_c': f"Statement C{i + 1}",
+                'option_d': f"Statement D{i + 1}",
+                'correct_answer': i % 4,
+                'explanation': f"Statement {'ABCD'[i % 4]}{i + 1} is the accurate one."
+                               + ' More detail.' * (explanation_chars // 13),
+                'difficulty': difficulty,
+            }
+            for i in range(offset, offset + count)
+        ]
+
+
+class FaultInjectingModel(FakeGenerativeModel):
+    """Fake model that fails according to a per-call schedule, for exercising the resilience layer
+
+    Each call takes the next entry of ``faults``: None answers normally, 'error' raises a transient
+    ConnectionError, 'hang' stalls past the request deadline and an exception instance is raised
+    as is. Calls beyond the schedule repeat ``default``.
+    """
+
+    def __init__(self, faults=(), default=None, hang_seconds: float = 60.0, **kwargs):
+        super().__init__(**kwargs)
+        self.faults = list(faults)
+        self.default = default
+        self.hang_seconds = hang_seconds
+        self.failures = 0
+
+    def next_fault(self):
+        return self.faults.pop(0) if self.faults else self.default
+
+    def _fail(self, fault, request_options: Optional[dict]):
+        self.failures += 1
+        if fault == 'hang':
+            # Like the real client: the RPC gives up once its deadline passes
+            timeout = (request_options or {}).get('timeout', self.hang_seconds)
+            time.sleep(min(timeout, self.hang_seconds))
+            raise TimeoutError(f"Fake model did not answer within {timeout}s")
+        if fault == 'error':
+            raise ConnectionError("Fake model connection reset")
+        raise fault
+
+    def generate_content(self, prompt: str, stream: bool = False, request_options: Optional[dict] = None,
+                         **kwargs):
+        fault = self.next_fault()
+        if fault is not None:
+            self.calls += 1
+            self._fail(fault, request_options)
+        return super().generate_content(prompt, stream=stream, **kwargs)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        fault = self.next_fault()
+        if fault is None:
+            return await super().generate_content_async(prompt, stream=stream, **kwargs)
+        self.calls += 1
+        self.failures += 1
+        if fault == 'hang':
+            # Never answers by itself: the caller's deadline has to cancel it
+            await asyncio.sleep(self.hang_seconds)
+        if fault in ('hang', 'error'):
+            raise ConnectionError("Fake model connection reset")
+        raise fault
+
+
+def serve_openai_compatible(model: Optional[FakeGenerativeModel] = None, host: str = '127.0.0.1',
+                            port: int = 0) -> ThreadingHTTPServer:
+    """Serve a fake model as an OpenAI-compatible /chat/completions endpoint on a background thread
+
+    Port 0 picks a free port (see server.server_address); call server.shutdown() when done.
+    Streaming requests are answered with server-sent events, one per model chunk.
+    """
+    model = model or FakeGenerativeModel()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+            prompt = '\n'.join(message.get('content') or '' for message in body.get('messages', []))
+            try:
+                response = model.generate_content(prompt, stream=bool(body.get('stream')))
+            except (TimeoutError, ConnectionError) as e:
+                self.send_error(503, str(e))
+                return
+
+            if not body.get('stream'):
+                self._send(200, 'application/json', json.dumps({
+                    'object': 'chat.completion',
+                    'model': body.get('model'),
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': response.text},
+                                 'finish_reason': 'stop'}],
+                }).encode('utf-8'))
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for chunk in response:
+                    event = {'object': 'chat.completion.chunk',
+                             'choices': [{'index': 0, 'delta': {'content': chunk.text}}]}
+                    self.wfile.write(b'data: ' + json.dumps(event).encode('utf-8') + b'\n\n')
+                    self.wfile.flush()
+                self.wfile.write(b'data: [DONE]\n\n')
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away, e.g. it lost a hedged race
+                pass
+
+        def _send(self, status: int, content_type: str, payload: bytes):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name='fake-openai').start()
+    return server
+
+
+def build_response_corpus(num_questions: int = 10, topic: str = 'Python', difficulty: str = 'medium'):
+    """Realistic and deliberately messy model outputs as (name, text, expected valid questions)"""
+    questions = FakeGenerativeModel.build_questions(topic, difficulty, num_questions)
+    quiz = {'topic': topic, 'difficulty': difficulty, 'questions': questions}
+    pretty = json.dumps(quiz, indent=2)
+
+    def with_questions(items):
+        return json.dumps(dict(quiz, questions=items), indent=2)
+
+    trailing_commas = re.sub(r'("difficulty": "\w+")\n', r'\1,\n', pretty).replace('}\n  ]', '},\n  ]')
+    truncate_after = max(1, num_questions // 2)
+    truncated = pretty[:pretty.index(questions[truncate_after]['question']) + 10]
+    invalid = [dict(q) for q in questions]
+    invalid[0]['correct_answer'] = 7
+    del invalid[-1]['option_d']
+    letters = [dict(q, correct_answer='ABCD'[q['correct_answer']]) for q in questions]
+    braces = [dict(q, question=q['question'] + ' Consider {"a": [1, 2]} here.') for q in questions]
+    newlines = pretty.replace('is the accurate one.', 'is the accurate\none.')
+
+    return [
+        ('clean', pretty, num_questions),
+        ('code fence', '```json\n' + pretty + '\n```', num_questions),
+        ('prose around', 'Sure! Here is your quiz [A-D options]:\n' + pretty + '\nLet me know if you need more.',
+         num_questions),
+        ('trailing commas', trailing_commas, num_questions),
+        ('raw newlines in strings', newlines, num_questions),
+        ('smart quotes', pretty.replace('"topic"', '“topic”'), num_questions),
+        ('letter answers', with_questions(letters), num_questions),
+        ('braces in strings', with_questions(braces), num_questions),
+        ('bare array', json.dumps(questions), num_questions),
+        ('invalid questions', with_questions(invalid), num_questions - 2),
+        ('truncated', truncated, truncate_after),
+        ('no json', "I'm sorry, I can't generate a quiz about that topic.", 0),
+    ]
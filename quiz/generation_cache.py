@@ -0,0 +1,245 @@
+"""
+Content-addressed cache of generated quizzes
+Keyed on (normalized topic, difficulty, num_questions) so identical requests skip the LLM
+"""
+
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Optional
+from django.conf import settings
+from django.utils import timezone
+
+from .ai_service import QuizPydantic
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_topic(topic: str) -> str:
+    """Normalize a topic for cache lookups (unicode form, case and whitespace)"""
+    topic = unicodedata.normalize('NFKC', topic or '')
+    return ' '.join(topic.casefold().split())
+
+
+def make_cache_key(topic: str, difficulty: str, num_questions: int) -> str:
+    """Hash the normalized request parameters into a stable cache key"""
+    raw = f"{normalize_topic(topic)}|{difficulty}|{int(num_questions)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LocMemLRUBackend:
+    """In-process LRU backend with TTL and a bounded number of entries"""
+
+    shared = False
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoCacheBackend:
+    """Backend on top of the Django cache framework (eviction is left to the cache's MAX_ENTRIES)"""
+
+    key_prefix = 'quiz-generation:'
+    shared = True
+
+    def __init__(self, ttl: int, alias: str = 'default'):
+        self.ttl = ttl
+        self.alias = alias
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.cache.get(self.key_prefix + key)
+
+    def set(self, key: str, value: Dict[str, Any]):
+        self.cache.set(self.key_prefix + key, value, timeout=self.ttl)
+
+    def clear(self):
+        # Clears the whole alias; point QUIZ_GENERATION_CACHE_ALIAS at a dedicated cache
+        self.cache.clear()
+
+
+class DatabaseBackend:
+    """Backend storing entries in the GeneratedQuizCache table, shared by every worker"""
+
+    shared = True
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        from .models import GeneratedQuizCache
+        entry = GeneratedQuizCache.objects.filter(key=key, expires_at__gt=timezone.now()).only('payload').first()
+        return entry.payload if entry else None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        from .models import GeneratedQuizCache
+        now = timezone.now()
+        GeneratedQuizCache.objects.update_or_create(
+            key=key,
+            defaults={'payload': value, 'expires_at': now + timedelta(seconds=self.ttl)}
+        )
+
+        # Evict expired entries, then the oldest ones beyond the size bound
+        GeneratedQuizCache.objects.filter(expires_at__lte=now).delete()
+        stale_ids = list(
+            GeneratedQuizCache.objects.order_by('-created_at').values_list('id', flat=True)[self.max_entries:]
+        )
+        if stale_ids:
+            GeneratedQuizCache.objects.filter(id__in=stale_ids).delete()
+
+    def clear(self):
+        from .models import GeneratedQuizCache
+        GeneratedQuizCache.objects.all().delete()
+
+
+class GenerationCache:
+    """Cache in front of AIQuizService.generate_quiz with hit/miss accounting"""
+
+    MODE_PAYLOAD = 'payload'
+    MODE_CLONE = 'clone'
+
+    def __init__(self, backend, mode: str = MODE_PAYLOAD):
+        self.backend = backend
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.generation_seconds = 0.0
+        self.generations = 0
+
+    def get(self, topic: str, difficulty: str, num_questions: int,
+            record_miss: bool = True) -> Optional[Dict[str, Any]]:
+        """Look up a cached quiz; returns {'quiz': <QuizPydantic dump>, 'source_quiz_id': <pk>} or None"""
+        try:
+            value = self.backend.get(make_cache_key(topic, difficulty, num_questions))
+        except Exception as e:
+            logger.warning("Error reading generation cache: %s", e)
+            value = None
+
+        with self._lock:
+            if value is None:
+                if record_miss:
+                    self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def contains(self, topic: str, difficulty: str, num_questions: int) -> bool:
+        """Whether a quiz is cached for these parameters, without counting a hit or miss"""
+        try:
+            return self.backend.get(make_cache_key(topic, difficulty, num_questions)) is not None
+        except Exception as e:
+            logger.warning("Error reading generation cache: %s", e)
+            return False
+
+    def set(self, topic: str, difficulty: str, num_questions: int, quiz_data: QuizPydantic,
+            source_quiz_id: Optional[int] = None, generation_seconds: float = 0.0):
+        """Store a freshly generated quiz; fallback and incomplete quizzes are never cached"""
+        if quiz_data.is_fallback or len(quiz_data.questions) < num_questions:
+            return
+
+        with self._lock:
+            self.generations += 1
+            self.generation_seconds += generation_seconds
+
+        value = {'quiz': quiz_data.model_dump(), 'source_quiz_id': source_quiz_id}
+        try:
+            self.backend.set(make_cache_key(topic, difficulty, num_questions), value)
+        except Exception as e:
+            logger.warning("Error writing generation cache: %s", e)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and an estimate of the LLM time saved by hits"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            average = self.generation_seconds / self.generations if self.generations else 0.0
+            return {
+                'backend': type(self.backend).__name__,
+                'mode': self.mode,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'average_generation_seconds': average,
+                'estimated_seconds_saved': self.hits * average,
+            }
+
+
+_UNSET = object()
+_generation_cache = _UNSET
+_generation_cache_lock = threading.Lock()
+
+
+def build_generation_cache() -> Optional[GenerationCache]:
+    """Build the cache configured by the QUIZ_GENERATION_CACHE_* settings (None when disabled)"""
+    backend_name = getattr(settings, 'QUIZ_GENERATION_CACHE_BACKEND', 'locmem')
+    ttl = getattr(settings, 'QUIZ_GENERATION_CACHE_TTL', 24 * 60 * 60)
+    max_entries = getattr(settings, 'QUIZ_GENERATION_CACHE_MAX_ENTRIES', 1000)
+    mode = getattr(settings, 'QUIZ_GENERATION_CACHE_MODE', GenerationCache.MODE_PAYLOAD)
+
+    if backend_name == 'locmem':
+        backend = LocMemLRUBackend(ttl, max_entries)
+    elif backend_name == 'django':
+        backend = DjangoCacheBackend(ttl, getattr(settings, 'QUIZ_GENERATION_CACHE_ALIAS', 'default'))
+    elif backend_name == 'db':
+        backend = DatabaseBackend(ttl, max_entries)
+    elif backend_name in ('', 'none', None):
+        return None
+    else:
+        raise ValueError(f"Unknown generation cache backend: {backend_name}")
+
+    return GenerationCache(backend, mode)
+
+
+def get_generation_cache() -> Optional[GenerationCache]:
+    """Return the process-wide generation cache"""
+    global _generation_cache
+    if _generation_cache is _UNSET:
+        with _generation_cache_lock:
+            if _generation_cache is _UNSET:
+                _generation_cache = build_generation_cache()
+    return _generation_cache
+
+
+def reset_generation_cache():
+    """Drop the process-wide cache so it is rebuilt from settings on next use"""
+    global _generation_cache
+    with _generation_cache_lock:
+        _generation_cache = _UNSET
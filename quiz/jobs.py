@@ -0,0 +1,290 @@
+"""
+Background quiz generation jobs
+Runs AI quiz generation off the request thread so web workers are freed immediately
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import timedelta
+from typing import Awaitable, Callable, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Quiz, GenerationStatus
+from .ai_service import ai_quiz_service, QuizPydantic, QuizQuestionPydantic
+from .repository import quiz_repository
+from .question_bank import question_bank
+from .generation_cache import GenerationCache, get_generation_cache, make_cache_key
+from .singleflight import generation_flight, async_generation_flight, file_lock
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the process-wide generation thread pool, creating it on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers = getattr(settings, 'QUIZ_GENERATION_WORKERS', 4)
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='quiz-generation')
+    return _executor
+
+
+def enqueue_generation(quiz: Quiz):
+    """Schedule generation for a pending quiz once the current transaction commits"""
+    quiz_id = quiz.pk
+    transaction.on_commit(lambda: get_executor().submit(_run_in_worker, quiz_id))
+
+
+def _run_in_worker(quiz_id: int):
+    """Executor entry point; worker threads manage their own DB connections"""
+    close_old_connections()
+    try:
+        run_generation_job(quiz_id)
+    finally:
+        close_old_connections()
+
+
+def generation_is_stale(quiz: Quiz) -> bool:
+    """Whether a quiz has awaited or undergone generation for over QUIZ_ADMISSION_STALE_SECONDS"""
+    if quiz.status not in (GenerationStatus.PENDING, GenerationStatus.GENERATING):
+        return False
+    stale = getattr(settings, 'QUIZ_ADMISSION_STALE_SECONDS', 600)
+    return quiz.created_at < timezone.now() - timedelta(seconds=stale)
+
+
+def expire_stale_generation(quiz: Quiz) -> bool:
+    """Mark a stale quiz (see generation_is_stale) FAILED
+
+    A job lost with its worker (a restart, a crash) would otherwise leave the quiz pending
+    forever and its generating page polling. Only touches the database for stale quizzes;
+    returns whether this quiz was one, with its fields refreshed.
+    """
+    if not generation_is_stale(quiz):
+        return False
+
+    # Conditional, so a job finishing at this moment keeps its result
+    Quiz.objects.filter(
+        pk=quiz.pk, status__in=[GenerationStatus.PENDING, GenerationStatus.GENERATING],
+    ).update(status=GenerationStatus.FAILED, error_message='Generation did not finish in time')
+    quiz.refresh_from_db(fields=['status', 'total_questions', 'error_message'])
+    return True
+
+
+def run_generation_job(quiz_id: int):
+    """Generate the questions for a pending quiz and mark it ready (or failed)"""
+    try:
+        updated = Quiz.objects.filter(pk=quiz_id, status=GenerationStatus.PENDING).update(
+            status=GenerationStatus.GENERATING
+        )
+        if not updated:
+            # Already picked up by another worker, or no longer exists
+            return
+
+        started = time.monotonic()
+        quiz = Quiz.objects.get(pk=quiz_id)
+        requested = quiz.total_questions
+        cache = get_generation_cache()
+        cached = cache.get(quiz.topic, quiz.difficulty, requested) if cache else None
+
+        if cached and cache.mode == GenerationCache.MODE_CLONE and clone_cached(cached, quiz, started):
+            return
+
+        streamed = []
+
+        def persist(question_data):
+            # Each question is playable as soon as it is committed
+            quiz_repository.add_question(quiz, question_data, order=len(streamed))
+            if not streamed:
+                quiz_repository.record_first_question(quiz_id, time.monotonic() - started)
+            streamed.append(question_data)
+
+        if cached:
+            quiz_data = QuizPydantic(**cached['quiz'])
+        else:
+            on_question = persist if getattr(settings, 'QUIZ_STREAMING_GENERATION', True) else None
+            quiz_data = generate_shared(quiz.topic, quiz.difficulty, requested, cache,
+                                        source_quiz_id=quiz_id, on_question=on_question)
+            if quiz_data.is_fallback:
+                quiz_data = degraded_quiz(quiz_data, quiz.topic, quiz.difficulty, requested)
+
+        finish_quiz(quiz, quiz_data, len(streamed), None if streamed else time.monotonic() - started)
+
+    except Exception as e:
+        logger.exception("Error running generation job for quiz %s", quiz_id)
+        Quiz.objects.filter(pk=quiz_id).update(
+            status=GenerationStatus.FAILED,
+            error_message=str(e),
+        )
+
+
+def degraded_quiz(fallback: QuizPydantic, topic: str, difficulty: str, num_questions: int) -> QuizPydantic:
+    """Replace placeholder questions with banked ones when the model failed or its circuit is open
+
+    The generation cache was already consulted before the model was called.
+    """
+    if getattr(settings, 'QUIZ_BANK_ENABLED', True):
+        banked = question_bank.draw(topic, difficulty, num_questions)
+        if banked:
+            return banked
+    return fallback
+
+
+def clone_cached(cached: dict, quiz: Quiz, started: float) -> bool:
+    """Copy the question rows of the quiz that populated a cache entry; False if it is gone"""
+    with transaction.atomic():
+        total = quiz_repository.clone_questions(cached.get('source_quiz_id'), quiz)
+        if total:
+            quiz_repository.mark_ready(quiz.pk, total, time.monotonic() - started)
+        return bool(total)
+
+
+def finish_quiz(quiz: Quiz, quiz_data: QuizPydantic, streamed: int, time_to_first_question: Optional[float]):
+    """Store the questions not already persisted while streaming and mark the quiz ready"""
+    with transaction.atomic():
+        quiz_repository.add_questions(quiz, quiz_data, start=streamed)
+        quiz_repository.mark_ready(quiz.pk, len(quiz_data.questions), time_to_first_question)
+
+
+# Generation tasks started on the ASGI event loop; referenced so they are not garbage collected
+_background_tasks = set()
+
+
+def schedule_generation_async(quiz_id: int) -> asyncio.Task:
+    """Run the generation for a pending quiz as a task on the running event loop
+
+    The async views use this instead of the thread pool: a task waiting on the model
+    costs no thread, so one ASGI worker can hold hundreds of generations in flight.
+    Call it only after the quiz row has been committed.
+    """
+    task = asyncio.get_running_loop().create_task(run_generation_job_async(quiz_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def run_generation_job_async(quiz_id: int):
+    """Async counterpart of run_generation_job; the model is awaited, DB writes run via sync_to_async"""
+    try:
+        updated = await Quiz.objects.filter(pk=quiz_id, status=GenerationStatus.PENDING).aupdate(
+            status=GenerationStatus.GENERATING
+        )
+        if not updated:
+            return
+
+        started = time.monotonic()
+        quiz = await Quiz.objects.aget(pk=quiz_id)
+        requested = quiz.total_questions
+        cache = get_generation_cache()
+        cached = await sync_to_async(cache.get)(quiz.topic, quiz.difficulty, requested) if cache else None
+
+        if cached and cache.mode == GenerationCache.MODE_CLONE and \
+                await sync_to_async(clone_cached)(cached, quiz, started):
+            return
+
+        streamed = []
+
+        async def persist(question_data):
+            # Claim the position before awaiting: batches of a chunked quiz report concurrently
+            order = len(streamed)
+            streamed.append(question_data)
+            await sync_to_async(quiz_repository.add_question)(quiz, question_data, order)
+            if order == 0:
+                await sync_to_async(quiz_repository.record_first_question)(quiz_id, time.monotonic() - started)
+
+        if cached:
+            quiz_data = QuizPydantic(**cached['quiz'])
+        else:
+            on_question = persist if getattr(settings, 'QUIZ_STREAMING_GENERATION', True) else None
+            quiz_data = await generate_shared_async(quiz.topic, quiz.difficulty, requested, cache,
+                                                    source_quiz_id=quiz_id, on_question=on_question)
+            if quiz_data.is_fallback:
+                quiz_data = await sync_to_async(degraded_quiz)(quiz_data, quiz.topic, quiz.difficulty, requested)
+
+        await sync_to_async(finish_quiz)(quiz, quiz_data, len(streamed),
+                                         None if streamed else time.monotonic() - started)
+
+    except Exception as e:
+        logger.exception("Error running generation job for quiz %s", quiz_id)
+        await Quiz.objects.filter(pk=quiz_id).aupdate(
+            status=GenerationStatus.FAILED,
+            error_message=str(e),
+        )
+
+
+def generate_shared(topic: str, difficulty: str, num_questions: int,
+                    cache: Optional[GenerationCache] = None, source_quiz_id: Optional[int] = None,
+                    on_question: Optional[Callable[[QuizQuestionPydantic], None]] = None) -> QuizPydantic:
+    """Generate a quiz, coalescing concurrent identical requests into a single LLM call
+
+    When on_question is given the caller that actually runs the generation streams it and
+    receives each question as it is parsed; callers that join an in-flight generation get
+    the complete quiz once it finishes.
+    """
+    key = make_cache_key(topic, difficulty, num_questions)
+    timeout = getattr(settings, 'QUIZ_SINGLEFLIGHT_TIMEOUT', 120)
+
+    def generate():
+        started = time.monotonic()
+        if on_question is not None:
+            quiz_data = ai_quiz_service.generate_quiz_streaming(topic, difficulty, num_questions, on_question)
+        else:
+            quiz_data = ai_quiz_service.generate_quiz(topic, difficulty, num_questions)
+        if cache is not None:
+            cache.set(topic, difficulty, num_questions, quiz_data,
+                      source_quiz_id=source_quiz_id, generation_seconds=time.monotonic() - started)
+        return quiz_data
+
+    def generate_once():
+        if cache is None or not cache.backend.shared:
+            return generate()
+
+        # Other worker processes only benefit from waiting when they can read our result back
+        with file_lock(key, getattr(settings, 'QUIZ_SINGLEFLIGHT_LOCK_DIR', None), timeout):
+            cached = cache.get(topic, difficulty, num_questions, record_miss=False)
+            if cached:
+                return QuizPydantic(**cached['quiz'])
+            return generate()
+
+    try:
+        return generation_flight.do(key, generate_once, timeout=timeout)
+    except FutureTimeoutError:
+        # The leader is taking too long; stop waiting and generate independently
+        return generate()
+
+
+async def generate_shared_async(topic: str, difficulty: str, num_questions: int,
+                                cache: Optional[GenerationCache] = None, source_quiz_id: Optional[int] = None,
+                                on_question: Optional[Callable[[QuizQuestionPydantic], Awaitable[None]]] = None
+                                ) -> QuizPydantic:
+    """Async counterpart of generate_shared, coalescing identical generations on this event loop
+
+    The cross-process file lock is not taken here (it would block the loop); ASGI workers
+    still share results through a shared cache backend once the first generation finishes.
+    """
+    key = make_cache_key(topic, difficulty, num_questions)
+
+    async def generate():
+        started = time.monotonic()
+        quiz_data = await ai_quiz_service.generate_quiz_async(topic, difficulty, num_questions, on_question)
+        if cache is not None:
+            await sync_to_async(cache.set)(topic, difficulty, num_questions, quiz_data,
+                                           source_quiz_id=source_quiz_id,
+                                           generation_seconds=time.monotonic() - started)
+        return quiz_data
+
+    try:
+        return await async_generation_flight.do(key, generate,
+                                                timeout=getattr(settings, 'QUIZ_SINGLEFLIGHT_TIMEOUT', 120))
+    except asyncio.TimeoutError:
+        # The leader is taking too long; stop waiting and generate independently
+        return await generate()
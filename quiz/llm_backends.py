@@ -0,0 +1,490 @@
+"""
+LLM backends and the router in front of them
+Every backend is shaped like google.generativeai's GenerativeModel: generate_content(prompt,
+stream=False, request_options=...) and generate_content_async(...), returning objects (or
+streamed chunks) with a .text. Besides Gemini and the offline fake model, OpenAICompatibleModel
+talks to any /chat/completions endpoint. LLMRouter sends each call to the fastest healthy
+backend and hedges calls that run past that backend's usual latency.
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TextChunk:
+    """A response, or one streamed chunk of it"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+async def iterate_in_thread(iterable: Iterable[Any]) -> AsyncIterator[Any]:
+    """Consume a blocking iterable on a worker thread, yielding its items on the event loop"""
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+    stop = threading.Event()
+
+    def pump():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                loop.call_soon_threadsafe(items.put_nowait, (True, item))
+            loop.call_soon_threadsafe(items.put_nowait, (False, None))
+        except Exception as e:
+            loop.call_soon_threadsafe(items.put_nowait, (False, e))
+
+    loop.run_in_executor(None, pump)
+    try:
+        while True:
+            is_item, value = await items.get()
+            if not is_item:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stop.set()
+
+
+class OpenAICompatibleModel:
+    """Client of an OpenAI-compatible chat completions endpoint (OpenAI, vLLM, llama.cpp, Ollama, ...)
+
+    Uses only the standard library. Rate limiting (429) and server errors are raised as
+    ConnectionError, so LLMGuard retries them like other transient failures.
+    """
+
+    def __init__(self, base_url: str, model: str, api_key: str = '', timeout: float = 30.0):
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def _open(self, prompt: str, stream: bool, request_options: Optional[dict]):
+        body = json.dumps({
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'stream': stream,
+        }).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        timeout = (request_options or {}).get('timeout', self.timeout)
+        try:
+            return urllib.request.urlopen(urllib.request.Request(self.url, body, headers), timeout=timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 429 or e.code >= 500:
+                raise ConnectionError(f"{self.url} answered {e.code}") from e
+            raise
+        except urllib.error.URLError as e:
+            if isinstance(e.reason, TimeoutError):
+                raise e.reason
+            raise ConnectionError(f"{self.url} unreachable: {e.reason}") from e
+
+    def generate_content(self, prompt: str, stream: bool = False, request_options: Optional[dict] = None, **kwargs):
+        response = self._open(prompt, stream, request_options)
+        if stream:
+            return self._chunks(response)
+        with response:
+            data = json.load(response)
+        return TextChunk(data['choices'][0]['message'].get('content') or '')
+
+    @staticmethod
+    def _chunks(response) -> Iterator[TextChunk]:
+        """Text deltas of a server-sent event stream"""
+        with response:
+            for line in response:
+                line = line.strip()
+                if not line.startswith(b'data:'):
+                    continue
+                payload = line[len(b'data:'):].strip()
+                if payload == b'[DONE]':
+                    return
+                choices = json.loads(payload).get('choices') or [{}]
+                text = (choices[0].get('delta') or {}).get('content')
+                if text:
+                    yield TextChunk(text)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False,
+                                     request_options: Optional[dict] = None, **kwargs):
+        """generate_content on a worker thread; streams are relayed chunk by chunk"""
+        if not stream:
+            return await asyncio.to_thread(self.generate_content, prompt, False, request_options)
+        response = await asyncio.to_thread(self._open, prompt, True, request_options)
+        return iterate_in_thread(self._chunks(response))
+
+
+class BackendStats:
+    """Rolling latency samples and error rate of one backend
+
+    Latency is time to the first streamed chunk for streaming calls ('stream') and time to the
+    whole response otherwise ('full'); the two are tracked apart.
+    """
+
+    def __init__(self, window: int = 100, min_samples: int = 5):
+        self.min_samples = min_samples
+        self.latencies = {'full': deque(maxlen=window), 'stream': deque(maxlen=window)}
+        self.errors = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, seconds: float):
+        with self._lock:
+            self.latencies[kind].append(seconds)
+            self.errors.append(False)
+
+    def record_error(self):
+        with self._lock:
+            self.errors.append(True)
+
+    def percentile(self, kind: str, percent: float) -> Optional[float]:
+        """The percent-th percentile latency, or None with fewer than min_samples samples"""
+        with self._lock:
+            samples = sorted(self.latencies[kind])
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return sum(self.errors) / len(self.errors) if len(self.errors) >= self.min_samples else 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            'p50_seconds': {kind: self.percentile(kind, 50) for kind in self.latencies},
+            'p95_seconds': {kind: self.percentile(kind, 95) for kind in self.latencies},
+            'error_rate': self.error_rate,
+            'samples': len(self.errors),
+        }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Process-wide pool that blocking routed calls run their backend attempts on
+
+    Sized by QUIZ_LLM_MAX_CONCURRENCY: with a limiter, every attempt still running (losers
+    included) holds one of that many call slots.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                from django.conf import settings
+
+                max_workers = getattr(settings, 'QUIZ_LLM_MAX_CONCURRENCY', 8)
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-attempt')
+    return _executor
+
+
+class _Race:
+    """Shared state of one (possibly hedged) routed call
+
+    The caller (LLMGuard) holds one limiter slot for the call, which covers one attempt until
+    the call returns. A hedge takes a slot of its own, and once the call has returned, each
+    attempt still running keeps one until it ends.
+    """
+
+    def __init__(self, limiter=None):
+        self.winner = None
+        self.closed = False
+        self.limiter = limiter
+        self.running = 0
+        self.held = 0
+        self._lock = threading.Lock()
+
+    def lost(self, name: str) -> bool:
+        return self.closed or self.winner not in (None, name)
+
+    def start(self, hedge: bool = False) -> bool:
+        """Count a new attempt; False (and nothing counted) for a hedge when no slot is free"""
+        with self._lock:
+            if hedge and self.limiter is not None:
+                if not self.limiter.try_acquire():
+                    return False
+                self.held += 1
+            self.running += 1
+            return True
+
+    def ended(self):
+        with self._lock:
+            self.running -= 1
+            self._release_spare()
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            self._release_spare()
+
+    def _release_spare(self):
+        # Until the call returns, slots are kept even for ended attempts: the one still
+        # running may be the attempt the caller's slot stops covering
+        while self.closed and self.held > self.running:
+            self.held -= 1
+            self.limiter.release()
+
+
+class LLMRouter:
+    """GenerativeModel-shaped front for several backends
+
+    Calls go to the healthy backend (error rate under max_error_rate) with the lowest p95
+    latency; backends without enough samples yet rank first, so each gets measured. With
+    hedging, a call that has not answered (or, streaming, sent its first chunk) within the
+    backend's hedge_percentile latency is also sent to the next backend, and whichever
+    answers first is used. A backend that fails before answering hands over to the next one.
+    """
+
+    def __init__(self, backends: Dict[str, Any], window: int = 100, min_samples: int = 5,
+                 max_error_rate: float = 0.5, hedge: bool = True, hedge_percentile: float = 95,
+                 hedge_delay: float = 2.0, limiter=None):
+        self.backends = backends
+        # ConcurrencyLimiter the caller's slot comes from; hedges are only sent with a slot free
+        self.limiter = limiter
+        self.stats = {name: BackendStats(window, min_samples) for name in backends}
+        self.max_error_rate = max_error_rate
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+
+    @classmethod
+    def from_settings(cls, backends: Dict[str, Any], limiter=None) -> 'LLMRouter':
+        from django.conf import settings
+
+        return cls(
+            backends,
+            window=getattr(settings, 'QUIZ_LLM_ROUTER_WINDOW', 100),
+            max_error_rate=getattr(settings, 'QUIZ_LLM_ROUTER_MAX_ERROR_RATE', 0.5),
+            hedge=getattr(settings, 'QUIZ_LLM_HEDGE', True),
+            hedge_percentile=getattr(settings, 'QUIZ_LLM_HEDGE_PERCENTILE', 95),
+            hedge_delay=getattr(settings, 'QUIZ_LLM_HEDGE_DELAY', 2.0),
+            limiter=limiter,
+        )
+
+    def ranked(self, kind: str) -> List[str]:
+        """Backend names in the order they would be tried: healthy by p95 latency, then the rest"""
+        def p95(name):
+            return self.stats[name].percentile(kind, 95) or 0.0
+
+        healthy = [name for name in self.backends if self.stats[name].error_rate < self.max_error_rate]
+        unhealthy = [name for name in self.backends if name not in healthy]
+        return (sorted(healthy, key=p95)
+                + sorted(unhealthy, key=lambda name: self.stats[name].error_rate))
+
+    def hedge_after(self, name: str, kind: str) -> float:
+        """Seconds to wait for a backend before hedging"""
+        latency = self.stats[name].percentile(kind, self.hedge_percentile)
+        return latency if latency is not None else self.hedge_delay
+
+    def snapshot(self) -> dict:
+        """Per-backend latency percentiles, error rate and current rank (for /api/llm/status/)"""
+        ranks = {kind: self.ranked(kind) for kind in ('full', 'stream')}
+        return {name: dict(self.stats[name].snapshot(),
+                           rank={kind: ranked.index(name) for kind, ranked in ranks.items()})
+                for name in self.backends}
+
+    def _finished(self, name: str, kind: str, started: float, error: Optional[BaseException] = None):
+        if error is None:
+            self.stats[name].record(kind, time.perf_counter() - started)
+        else:
+            self.stats[name].record_error()
+            logger.warning("LLM backend %s failed: %s", name, error)
+        metrics.LLM_BACKEND_CALLS.inc(backend=name, outcome='error' if error else 'ok')
+
+    # Blocking calls: each backend attempt runs on the shared executor and reports through a queue
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        def open_items(backend):
+            if stream:
+                return backend.generate_content(prompt, stream=True, **kwargs)
+            return [backend.generate_content(prompt, **kwargs)]
+
+        race = self._race('stream' if stream else 'full', open_items)
+        if stream:
+            return race
+        try:
+            return next(race)
+        finally:
+            race.close()
+
+    def _race(self, kind: str, open_items: Callable[[Any], Iterable[Any]]) -> Iterator[Any]:
+        pending = self.ranked(kind)
+        events = queue.Queue()
+        race = _Race(self.limiter)
+
+        def pump(name):
+            started, answered = time.perf_counter(), False
+            try:
+                for item in open_items(self.backends[name]):
+                    if not answered:
+                        answered = True
+                        self._finished(name, kind, started)
+                    if race.lost(name):
+                        return
+                    events.put((name, 'item', item))
+                if not answered:
+                    self._finished(name, kind, started)
+                events.put((name, 'done', None))
+            except Exception as e:
+                if not answered:
+                    self._finished(name, kind, started, e)
+                events.put((name, 'error', e))
+            finally:
+                race.ended()
+
+        def launch(hedge=False):
+            if not race.start(hedge):
+                metrics.LLM_HEDGES_SKIPPED.inc()
+                return None
+            name = pending.pop(0)
+            get_executor().submit(pump, name)
+            return name
+
+        primary, running, hedged = launch(), 1, False
+        hedge_at = time.monotonic() + self.hedge_after(primary, kind)
+        try:
+            while True:
+                timeout = None
+                if race.winner is None and self.hedge and not hedged and pending:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                try:
+                    name, event, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    # Sent only while a call slot is free; either way, one hedge per call
+                    if launch(hedge=True):
+                        running += 1
+                    hedged = True
+                    continue
+
+                if race.winner is None:
+                    if event == 'error':
+                        running -= 1
+                        if running:
+                            continue
+                        if not pending:
+                            raise value
+                        # Fail over to the next backend
+                        primary, running = launch(), 1
+                        hedge_at = time.monotonic() + self.hedge_after(primary, kind)
+                        continue
+                    race.winner = name
+                    if hedged:
+                        metrics.LLM_HEDGES.inc(winner='primary' if name == primary else 'hedge')
+
+                if name != race.winner:
+                    continue
+                if event == 'item':
+                    yield value
+                elif event == 'done':
+                    return
+                else:
+                    raise value
+        finally:
+            race.close()
+
+    # Coroutine calls: each backend runs as a task; the losers are cancelled
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        async def open_items(backend):
+            if stream:
+                async for chunk in await backend.generate_content_async(prompt, stream=True, **kwargs):
+                    yield chunk
+            else:
+                yield await backend.generate_content_async(prompt, **kwargs)
+
+        race = self._arace('stream' if stream else 'full', open_items)
+        if stream:
+            return race
+        try:
+            return await race.__anext__()
+        finally:
+            await race.aclose()
+
+    async def _arace(self, kind: str, open_items: Callable[[Any], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        pending = self.ranked(kind)
+        events = asyncio.Queue()
+        tasks = {}
+        race = _Race(self.limiter)
+
+        async def pump(name):
+            started, answered = time.perf_counter(), False
+            try:
+                async for item in open_items(self.backends[name]):
+                    if not answered:
+                        answered = True
+                        self._finished(name, kind, started)
+                    await events.put((name, 'item', item))
+                if not answered:
+                    self._finished(name, kind, started)
+                await events.put((name, 'done', None))
+            except Exception as e:
+                if not answered:
+                    self._finished(name, kind, started, e)
+                await events.put((name, 'error', e))
+
+        def launch(hedge=False):
+            if not race.start(hedge):
+                metrics.LLM_HEDGES_SKIPPED.inc()
+                return None
+            name = pending.pop(0)
+            tasks[name] = asyncio.ensure_future(pump(name))
+            # Also runs for a task cancelled before it started
+            tasks[name].add_done_callback(lambda task: race.ended())
+            return name
+
+        primary, winner, hedged = launch(), None, False
+        hedge_at = time.monotonic() + self.hedge_after(primary, kind)
+        try:
+            while True:
+                timeout = None
+                if winner is None and self.hedge and not hedged and pending:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                try:
+                    name, event, value = await asyncio.wait_for(events.get(), timeout)
+                except asyncio.TimeoutError:
+                    launch(hedge=True)
+                    hedged = True
+                    continue
+
+                if winner is None:
+                    if event == 'error':
+                        del tasks[name]
+                        if tasks:
+                            continue
+                        if not pending:
+                            raise value
+                        primary = launch()
+                        hedge_at = time.monotonic() + self.hedge_after(primary, kind)
+                        continue
+                    winner = name
+                    for loser in [task for other, task in tasks.items() if other != name]:
+                        loser.cancel()
+                    if hedged:
+                        metrics.LLM_HEDGES.inc(winner='primary' if name == primary else 'hedge')
+
+                if name != winner:
+                    continue
+                if event == 'item':
+                    yield value
+                elif event == 'done':
+                    return
+                else:
+                    raise value
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            race.close()
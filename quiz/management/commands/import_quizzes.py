@@ -0,0 +1,34 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.ai_service import ai_quiz_service
+from quiz.repository import quiz_repository
+
+
+class Command(BaseCommand):
+    help = "Import quizzes from JSON files (a quiz object or a list of them, in the AI response format)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="JSON files to import")
+
+    def handle(self, *args, **options):
+        imported = 0
+
+        for path in options['paths']:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    payload = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read {path}: {e}")
+
+            for quiz_dict in payload if isinstance(payload, list) else [payload]:
+                try:
+                    quiz_data = ai_quiz_service.validate_quiz_data(quiz_dict)
+                except ValueError as e:
+                    raise CommandError(f"{path}: {e}")
+
+                quiz = quiz_repository.create_from_pydantic(quiz_data)
+                imported += 1
+                self.stdout.write(f"Imported {quiz} as {quiz.session_id}")
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} quiz(zes)"))
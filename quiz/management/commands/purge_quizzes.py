@@ -0,0 +1,54 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quiz.retention import QuizPurger
+
+
+class Command(BaseCommand):
+    help = ("Delete quizzes abandoned for --incomplete-days or completed more than --completed-days ago, "
+            "optionally archiving them to gzipped JSONL first")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incomplete-days', type=float,
+                            default=getattr(settings, 'QUIZ_RETENTION_INCOMPLETE_DAYS', 7),
+                            help="Age (days since last activity) after which unfinished quizzes are purged; 0 keeps them")
+        parser.add_argument('--completed-days', type=float,
+                            default=getattr(settings, 'QUIZ_RETENTION_COMPLETED_DAYS', 90),
+                            help="Age (days since last activity) after which completed quizzes are purged; 0 keeps them")
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'QUIZ_PURGE_BATCH_SIZE', 500),
+                            help="Quizzes deleted per transaction")
+        parser.add_argument('--limit', type=int, help="Purge at most this many quizzes per run")
+        parser.add_argument('--pause', type=float, default=0,
+                            help="Seconds to sleep between batches, to leave room for other writers")
+        parser.add_argument('--archive', metavar='PATH',
+                            help="Append purged quizzes to this gzipped JSONL file before deleting them")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the quizzes that would be purged")
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Keep running as a background worker, purging every N seconds")
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        purger = QuizPurger(options['incomplete_days'], options['completed_days'],
+                            batch_size=options['batch_size'], archive_path=options['archive'])
+
+        if options['dry_run']:
+            self.stdout.write(f"{purger.count()} quiz(zes) would be purged")
+            return
+
+        while True:
+            report = purger.purge(limit=options['limit'], pause=options['pause'], on_batch=self.progress)
+            rows = ', '.join(f"{table} {count}" for table, count in report.rows.items())
+            self.stdout.write(self.style.SUCCESS(
+                f"Purged {report.quizzes} quiz(zes), {report.total_rows} rows in {report.seconds:.2f}s "
+                f"({report.rows_per_second:.0f} rows/s): {rows}"
+            ))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def progress(self, report):
+        if self.verbosity >= 2:
+            self.stdout.write(f"Batch {report.batches}: {report.quizzes} quiz(zes), {report.total_rows} rows, "
+                              f"{report.rows_per_second:.0f} rows/s")
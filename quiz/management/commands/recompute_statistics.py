@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from quiz.models import QuizStatistics
+from quiz.results_cache import invalidate_results
+
+
+class Command(BaseCommand):
+    help = "Recount quiz statistics from the stored answers, repairing any that drifted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session', type=int, dest='sessions', action='append',
+                            help="Only this quiz session id (repeatable)")
+
+    def handle(self, *args, **options):
+        statistics = QuizStatistics.objects.select_related('session__quiz')
+        if options['sessions']:
+            statistics = statistics.filter(session_id__in=options['sessions'])
+
+        checked = repaired = 0
+        for stats in statistics.iterator():
+            checked += 1
+            if stats.recompute():
+                repaired += 1
+                invalidate_results(stats.session.quiz.session_id)
+                self.stdout.write(f"Repaired {stats}")
+
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} session(s), repaired {repaired}"))
@@ -0,0 +1,41 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quiz.question_bank import question_bank
+
+
+class Command(BaseCommand):
+    help = "Top up the question bank for hot topics to the configured low-water mark"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topic', action='append', dest='topics',
+                            help="Topic to refill (repeatable); defaults to QUIZ_BANK_HOT_TOPICS")
+        parser.add_argument('--difficulty', action='append', dest='difficulties',
+                            choices=['easy', 'medium', 'hard'],
+                            help="Difficulty to refill (repeatable); defaults to all")
+        parser.add_argument('--low-water-mark', type=int,
+                            default=getattr(settings, 'QUIZ_BANK_LOW_WATER_MARK', 40))
+        parser.add_argument('--batch-size', type=int,
+                            default=getattr(settings, 'QUIZ_BANK_BATCH_SIZE', 10))
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Keep running as a background worker, refilling every N seconds")
+
+    def handle(self, *args, **options):
+        topics = options['topics'] or getattr(settings, 'QUIZ_BANK_HOT_TOPICS', [])
+        difficulties = options['difficulties'] or getattr(settings, 'QUIZ_BANK_DIFFICULTIES', ['easy', 'medium', 'hard'])
+
+        if not topics:
+            self.stdout.write(self.style.WARNING("No topics configured; set QUIZ_BANK_HOT_TOPICS or pass --topic"))
+            return
+
+        while True:
+            for topic in topics:
+                for difficulty in difficulties:
+                    added = question_bank.refill(topic, difficulty, options['low_water_mark'], options['batch_size'])
+                    supply = question_bank.available(topic, difficulty)
+                    self.stdout.write(f"{topic} ({difficulty}): +{added} questions, {supply} available")
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
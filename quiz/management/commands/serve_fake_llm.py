@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+
+from quiz.fake_llm import FakeGenerativeModel, serve_openai_compatible
+
+
+class Command(BaseCommand):
+    help = "Serve the offline fake model as an OpenAI-compatible endpoint (for QUIZ_LLM_BACKENDS=openai)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8088)
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+        parser.add_argument('--latency-per-question', type=float, default=0.0,
+                            help="Seconds added per question requested")
+
+    def handle(self, *args, **options):
+        model = FakeGenerativeModel(latency=options['latency'], latency_per_question=options['latency_per_question'])
+        server = serve_openai_compatible(model, options['host'], options['port'])
+        host, port = server.server_address[:2]
+        self.stdout.write(f"Serving the fake model at http://{host}:{port}/v1 (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -0,0 +1,385 @@
+"""
+Lightweight in-process metrics
+Counters and histograms for the hot paths (LLM calls, parsing, question inserts, views),
+rendered in the Prometheus text format by the /metrics endpoint and optionally logged as
+one JSON line per event. Everything is a no-op when QUIZ_METRICS_ENABLED is off.
+
+The registry lives in process memory, so under several workers each one counts only the
+requests it served and /metrics reports whichever worker answered the scrape. The endpoint
+is off unless QUIZ_METRICS_ENDPOINT is set.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger('quiz.metrics')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (256, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+def enabled() -> bool:
+    return getattr(settings, 'QUIZ_METRICS_ENABLED', True)
+
+
+def endpoint_enabled() -> bool:
+    return enabled() and getattr(settings, 'QUIZ_METRICS_ENDPOINT', False)
+
+
+class Metric:
+    """A named family of series keyed by label values"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Iterable[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value) -> List[str]:
+        raise NotImplementedError
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        if not enabled():
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def _render_series(self, key, value):
+        return [f'{self.name}{self._format_labels(key)} {value:g}']
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not enabled():
+            return
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[2] if series else 0
+
+    def _render_series(self, key, series):
+        counts, total, count = series
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{self._format_labels(key, [("le", f"{bound:g}")])} {cumulative}')
+        lines.append(f'{self.name}_bucket{self._format_labels(key, [("le", "+Inf")])} {count}')
+        lines.append(f'{self.name}_sum{self._format_labels(key)} {total:g}')
+        lines.append(f'{self.name}_count{self._format_labels(key)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self, extra_lines: Iterable[str] = ()) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        lines.extend(extra_lines)
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.reset()
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+LLM_REQUEST_SECONDS = histogram('quiz_llm_request_seconds', "Model call latency, including streaming",
+                                ['mode', 'outcome'])
+LLM_PROMPT_CHARS = histogram('quiz_llm_prompt_chars', "Prompt size in characters", ['mode'], SIZE_BUCKETS)
+LLM_RESPONSE_CHARS = histogram('quiz_llm_response_chars', "Response size in characters", ['mode'], SIZE_BUCKETS)
+LLM_BACKEND_CALLS = counter('quiz_llm_backend_calls_total', "Routed model calls per backend and outcome",
+                            ['backend', 'outcome'])
+LLM_HEDGES = counter('quiz_llm_hedges_total', "Hedged model calls, by which call answered first (primary or hedge)",
+                     ['winner'])
+LLM_HEDGES_SKIPPED = counter('quiz_llm_hedges_skipped_total', "Hedges not sent because every LLM call slot was busy")
+GENERATION_PROMPT_TOKENS = histogram('quiz_generation_prompt_tokens',
+                                     "Estimated prompt tokens sent for one generation, over all its model calls",
+                                     ['format'], TOKEN_BUCKETS)
+GENERATION_RESPONSE_TOKENS = histogram('quiz_generation_response_tokens',
+                                       "Estimated response tokens received for one generation, over all its model calls",
+                                       ['format'], TOKEN_BUCKETS)
+PARSE_SECONDS = histogram('quiz_response_parse_seconds', "Time spent parsing model responses", ['mode'])
+GENERATIONS = counter('quiz_generations_total', "Generated quizzes by result (ai or fallback)", ['result'])
+DUPLICATE_QUESTIONS = counter('quiz_duplicate_questions_total',
+                              "Generated questions dropped as near-duplicates, by what they repeated (quiz or stored)",
+                              ['scope'])
+QUESTION_INSERT_SECONDS = histogram('quiz_question_insert_seconds', "Time to insert question rows", ['operation'])
+GENERATION_REJECTIONS = counter('quiz_generation_rejections_total',
+                                "Generation requests refused with 429, by reason (rate or busy)", ['reason'])
+VIEW_SECONDS = histogram('quiz_view_seconds', "View latency", ['view', 'method', 'status'])
+VIEW_QUERIES = histogram('quiz_view_queries', "Database queries per request", ['view'], COUNT_BUCKETS)
+
+
+def log_event(event: str, **fields):
+    """Emit one structured (JSON) log line, if the quiz.metrics logger is enabled for INFO"""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({'event': event, **fields}, default=str))
+
+
+@contextmanager
+def timer(metric: Histogram, **labels):
+    """Observe the duration of the block (nothing is measured when metrics are disabled)"""
+    if not enabled():
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - started, **labels)
+
+
+def timed(metric: Histogram, **labels):
+    """Decorator form of timer()"""
+    def decorator(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            with timer(metric, **labels):
+                return fn(*args, **kwargs)
+        return inner
+    return decorator
+
+
+def estimate_tokens(chars: int) -> int:
+    """Token count of a text of chars characters, at QUIZ_CHARS_PER_TOKEN characters per token"""
+    return math.ceil(chars / getattr(settings, 'QUIZ_CHARS_PER_TOKEN', 4))
+
+
+class GenerationUsage:
+    """Model calls made for one generation and the characters they sent and received
+
+    Calls made in threads and tasks started by the generation count too, and so do calls
+    counted by an enclosing usage (see generation_usage).
+    """
+
+    def __init__(self, parent: Optional['GenerationUsage'] = None):
+        self.parent = parent
+        self.calls = 0
+        self.prompt_chars = 0
+        self.response_chars = 0
+        self._lock = threading.Lock()
+
+    def add(self, prompt_chars: int, response_chars: int):
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += prompt_chars
+            self.response_chars += response_chars
+        if self.parent is not None:
+            self.parent.add(prompt_chars, response_chars)
+
+    @property
+    def prompt_tokens(self) -> int:
+        return estimate_tokens(self.prompt_chars)
+
+    @property
+    def response_tokens(self) -> int:
+        return estimate_tokens(self.response_chars)
+
+    def as_dict(self) -> dict:
+        return {'model_calls': self.calls, 'prompt_chars': self.prompt_chars, 'response_chars': self.response_chars,
+                'prompt_tokens': self.prompt_tokens, 'response_tokens': self.response_tokens}
+
+
+_generation_usage: ContextVar[Optional[GenerationUsage]] = ContextVar('quiz_generation_usage', default=None)
+
+
+@contextmanager
+def generation_usage():
+    """Collect the model calls made in the block into a GenerationUsage"""
+    usage = GenerationUsage(_generation_usage.get())
+    token = _generation_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _generation_usage.reset(token)
+
+
+def record_llm_call(mode: str, outcome: str, seconds: float, prompt: str, response_chars: Optional[int]):
+    """Record one model call (one attempt sequence through the resilience guard)"""
+    usage = _generation_usage.get()
+    if usage is not None:
+        usage.add(len(prompt), response_chars or 0)
+    if not enabled():
+        return
+    LLM_REQUEST_SECONDS.observe(seconds, mode=mode, outcome=outcome)
+    LLM_PROMPT_CHARS.observe(len(prompt), mode=mode)
+    if response_chars is not None:
+        LLM_RESPONSE_CHARS.observe(response_chars, mode=mode)
+    log_event('llm_call', mode=mode, outcome=outcome, seconds=round(seconds, 4),
+              prompt_chars=len(prompt), response_chars=response_chars)
+
+
+def record_generation(quiz_data, seconds: float, usage: Optional[GenerationUsage] = None):
+    """Count a finished generation as AI output or fallback placeholders, with the model usage it took"""
+    if not enabled():
+        return
+    result = 'fallback' if quiz_data.is_fallback else 'ai'
+    GENERATIONS.inc(result=result)
+    fields = {}
+    if usage is not None and usage.calls:
+        response_format = getattr(settings, 'QUIZ_RESPONSE_FORMAT', 'verbose')
+        GENERATION_PROMPT_TOKENS.observe(usage.prompt_tokens, format=response_format)
+        GENERATION_RESPONSE_TOKENS.observe(usage.response_tokens, format=response_format)
+        fields = dict(usage.as_dict(), format=response_format)
+    log_event('generation', topic=quiz_data.topic, difficulty=quiz_data.difficulty, result=result,
+              questions=len(quiz_data.questions), seconds=round(seconds, 4), **fields)
+
+
+def counts_generation(method):
+    """Decorate a quiz-generating method (sync or async) so each result and its usage feed record_generation"""
+    if asyncio.iscoroutinefunction(method):
+        @wraps(method)
+        async def async_inner(*args, **kwargs):
+            started = time.perf_counter()
+            with generation_usage() as usage:
+                quiz_data = await method(*args, **kwargs)
+            record_generation(quiz_data, time.perf_counter() - started, usage)
+            return quiz_data
+        return async_inner
+
+    @wraps(method)
+    def inner(*args, **kwargs):
+        started = time.perf_counter()
+        with generation_usage() as usage:
+            quiz_data = method(*args, **kwargs)
+        record_generation(quiz_data, time.perf_counter() - started, usage)
+        return quiz_data
+    return inner
+
+
+# Queries executed on behalf of the current request; a list so sync_to_async threads share it
+_query_count: ContextVar[Optional[List[int]]] = ContextVar('quiz_query_count', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    """Database execute wrapper feeding the per-request query count"""
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created handler: wrap every new connection with count_queries"""
+    if enabled() and count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def start_request() -> Tuple[float, object]:
+    return time.perf_counter(), _query_count.set([0])
+
+
+def finish_request(request, response, started: float, token):
+    queries = _query_count.get()[0]
+    _query_count.reset(token)
+    seconds = time.perf_counter() - started
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'unmatched'
+    VIEW_SECONDS.observe(seconds, view=view, method=request.method, status=response.status_code)
+    VIEW_QUERIES.observe(queries, view=view)
+    log_event('request', view=view, method=request.method, status=response.status_code,
+              seconds=round(seconds, 4), queries=queries)
+
+
+def render_breaker_gauges(snapshot: dict) -> List[str]:
+    """Prometheus lines for the LLM resilience guard (see resilience.LLMGuard.snapshot)"""
+    circuit, concurrency = snapshot['circuit'], snapshot['concurrency']
+    states = ('closed', 'open', 'half_open')
+    lines = ['# HELP quiz_llm_circuit_state Circuit breaker state (1 for the current state)',
+             '# TYPE quiz_llm_circuit_state gauge']
+    lines += [f'quiz_llm_circuit_state{{state="{state}"}} {int(circuit["state"] == state)}' for state in states]
+    for name, value, kind, documentation in (
+        ('quiz_llm_circuit_trips_total', circuit['trips'], 'counter', "Times the circuit breaker opened"),
+        ('quiz_llm_circuit_rejected_total', circuit['rejected'], 'counter', "Calls rejected by the open circuit"),
+        ('quiz_llm_retries_total', snapshot['retries'], 'counter', "Retried model calls"),
+        ('quiz_llm_timeouts_total', snapshot['timeouts'], 'counter', "Model calls that hit their deadline"),
+        ('quiz_llm_calls_in_flight', concurrency['in_use'], 'gauge', "Model calls holding a concurrency slot"),
+        ('quiz_llm_slot_rejected_total', concurrency['rejected'], 'counter', "Calls that found no free slot"),
+    ):
+        lines += [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}', f'{name} {value}']
+    return lines
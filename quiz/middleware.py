@@ -0,0 +1,40 @@
+"""
+Request instrumentation
+Records per-view latency and query counts into quiz.metrics (skipped when metrics are disabled)
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """Time each request and count its database queries, labelled by resolved view name"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not metrics.enabled():
+            return self.get_response(request)
+
+        started, token = metrics.start_request()
+        response = self.get_response(request)
+        metrics.finish_request(request, response, started, token)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics.enabled():
+            return await self.get_response(request)
+
+        started, token = metrics.start_request()
+        response = await self.get_response(request)
+        metrics.finish_request(request, response, started, token)
+        return response
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0003_generated_quiz_cache"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BankQuestion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("topic", models.CharField(max_length=200)),
+                ("topic_key", models.CharField(max_length=200)),
+                (
+                    "difficulty",
+                    models.CharField(
+                        choices=[
+                            ("easy", "Easy"),
+                            ("medium", "Medium"),
+                            ("hard", "Hard"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("question", models.TextField()),
+                ("option_a", models.CharField(max_length=500)),
+                ("option_b", models.CharField(max_length=500)),
+                ("option_c", models.CharField(max_length=500)),
+                ("option_d", models.CharField(max_length=500)),
+                ("correct_answer", models.IntegerField()),
+                ("explanation", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["topic_key", "difficulty", "id"],
+                        name="quiz_bank_lookup_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0004_question_bank"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="quiz",
+            name="time_to_first_question",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
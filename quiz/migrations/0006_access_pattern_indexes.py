@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0005_quiz_time_to_first_question"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="quiz",
+            index=models.Index(
+                fields=["topic", "difficulty"], name="quiz_topic_difficulty_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="quiz",
+            index=models.Index(fields=["created_at"], name="quiz_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="quizanswer",
+            index=models.Index(fields=["answered_at"], name="quiz_answer_answered_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="quizsession",
+            index=models.Index(
+                fields=["is_completed", "last_activity"],
+                name="quiz_session_activity_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="quizsession",
+            index=models.Index(fields=["started_at"], name="quiz_session_started_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="quizquestion",
+            constraint=models.UniqueConstraint(
+                fields=("quiz", "order"), name="quiz_question_order_uniq"
+            ),
+        ),
+    ]
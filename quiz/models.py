@@ -10,15 +10,40 @@ class DifficultyChoice(models.TextChoices):
     HARD = 'hard', 'Hard'
 
 
+class GenerationStatus(models.TextChoices):
+    PENDING = 'pending', 'Pending'
+    GENERATING = 'generating', 'Generating'
+    READY = 'ready', 'Ready'
+    FAILED = 'failed', 'Failed'
+
+
 class Quiz(models.Model):
     """Django model for Quiz"""
     session_id = models.CharField(max_length=100, unique=True, default=uuid.uuid4)
     topic = models.CharField(max_length=200)
     difficulty = models.CharField(max_length=10, choices=DifficultyChoice.choices, default=DifficultyChoice.MEDIUM)
     total_questions = models.IntegerField(default=10)
+    status = models.CharField(max_length=10, choices=GenerationStatus.choices, default=GenerationStatus.READY)
+    error_message = models.TextField(blank=True, default='')
+    time_to_first_question = models.FloatField(null=True, blank=True)  # seconds from job start
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Reuse of earlier quizzes on the same topic
+            models.Index(fields=['topic', 'difficulty'], name='quiz_topic_difficulty_idx'),
+            # Admin date filter and the retention sweep of quizzes without a session
+            models.Index(fields=['created_at'], name='quiz_created_idx'),
+            # Admission control's count of quizzes awaiting generation
+            models.Index(fields=['status', 'created_at'], name='quiz_status_created_idx'),
+        ]
+    
+    @property
+    def is_ready(self):
+        """Whether the questions for this quiz have been generated"""
+        return self.status == GenerationStatus.READY
+    
     def __str__(self):
         return f"Quiz: {self.topic} ({self.total_questions} questions)"
 
@@ -38,6 +63,10 @@ class QuizQuestion(models.Model):
     
     class Meta:
         ordering = ['order']
+        constraints = [
+            # Current-question lookup (quiz, order) and the question list of a quiz, in order
+            models.UniqueConstraint(fields=['quiz', 'order'], name='quiz_question_order_uniq'),
+        ]
     
     @property
     def options(self):
@@ -57,6 +86,13 @@ class QuizSession(models.Model):
     last_activity = models.DateTimeField(auto_now=True)
     is_completed = models.BooleanField(default=False)
     
+    class Meta:
+        indexes = [
+            # Retention sweeps and the admin completion filter
+            models.Index(fields=['is_completed', 'last_activity'], name='quiz_session_activity_idx'),
+            models.Index(fields=['started_at'], name='quiz_session_started_idx'),
+        ]
+    
     def __str__(self):
         return f"Session for {self.quiz.topic} - Score: {self.current_score}"
 
@@ -72,6 +108,10 @@ class QuizAnswer(models.Model):
     
     class Meta:
         unique_together = ['session', 'question']
+        indexes = [
+            # Admin date filter
+            models.Index(fields=['answered_at'], name='quiz_answer_answered_idx'),
+        ]
     
     def __str__(self):
         return f"Answer to Q{self.question.order + 1} - {'Correct' if self.is_correct else 'Incorrect'}"
@@ -85,19 +125,86 @@ class QuizStatistics(models.Model):
     incorrect_answers = models.IntegerField(default=0)
     percentage = models.FloatField(default=0.0)
     
-    def update_statistics(self):
-        """Update statistics based on answers"""
-        answers = self.session.answers.all()
-        self.total_questions_answered = answers.count()
-        self.correct_answers = answers.filter(is_correct=True).count()
-        self.incorrect_answers = answers.filter(is_correct=False).count()
-        
-        if self.total_questions_answered > 0:
-            self.percentage = (self.correct_answers / self.total_questions_answered) * 100
-        else:
-            self.percentage = 0.0
+    def recompute(self):
+        """Rebuild the counters from the stored answers; returns True if they had drifted
+
+        Answer submission keeps these counters up to date incrementally (see answer_updates);
+        this full recount is for repairs and consistency checks.
+        """
+        counts = self.session.answers.aggregate(
+            total=models.Count('id'),
+            correct=models.Count('id', filter=models.Q(is_correct=True)),
+        )
+        values = {
+            'total_questions_answered': counts['total'],
+            'correct_answers': counts['correct'],
+            'incorrect_answers': counts['total'] - counts['correct'],
+            # Same operation order as answer_updates, so equal counts give an identical float
+            'percentage': counts['correct'] * 100.0 / counts['total'] if counts['total'] else 0.0,
+        }
         
+        changed = any(getattr(self, field) != value for field, value in values.items())
+        for field, value in values.items():
+            setattr(self, field, value)
         self.save()
+        return changed
+    
+    @staticmethod
+    def answer_updates(correct, answered=1):
+        """UPDATE expressions that count `answered` more answers (`correct` of them right) without recounting"""
+        return {
+            'total_questions_answered': models.F('total_questions_answered') + answered,
+            'correct_answers': models.F('correct_answers') + correct,
+            'incorrect_answers': models.F('incorrect_answers') + (answered - correct),
+            'percentage': models.ExpressionWrapper(
+                (models.F('correct_answers') + correct) * 100.0 / (models.F('total_questions_answered') + answered),
+                output_field=models.FloatField(),
+            ),
+        }
     
     def __str__(self):
         return f"Stats for {self.session.quiz.topic} - {self.percentage:.1f}%"
+
+
+class GeneratedQuizCache(models.Model):
+    """Database backend for the quiz generation cache"""
+    key = models.CharField(max_length=64, unique=True)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"Cached quiz {self.key[:12]}"
+
+
+class BankQuestion(models.Model):
+    """Pre-generated question kept in the question bank, independent of any quiz session"""
+    topic = models.CharField(max_length=200)
+    topic_key = models.CharField(max_length=200)  # normalized topic used for lookups
+    difficulty = models.CharField(max_length=10, choices=DifficultyChoice.choices)
+    question = models.TextField()
+    option_a = models.CharField(max_length=500)
+    option_b = models.CharField(max_length=500)
+    option_c = models.CharField(max_length=500)
+    option_d = models.CharField(max_length=500)
+    correct_answer = models.IntegerField()  # 0-3 for options A-D
+    explanation = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['topic_key', 'difficulty', 'id'], name='quiz_bank_lookup_idx'),
+        ]
+    
+    def __str__(self):
+        return f"[{self.topic} / {self.difficulty}] {self.question[:50]}"
+
+
+class RateLimitBucket(models.Model):
+    """Token bucket of one client for the generation rate limit (see admission.TokenBucket)"""
+    key = models.CharField(max_length=200, unique=True)
+    tokens = models.FloatField()
+    updated = models.FloatField(db_index=True)  # Unix time of the last charge
+
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.1f} tokens"
@@ -0,0 +1,304 @@
+"""
+Parsing of LLM quiz responses
+Single-pass extraction, repair and per-question salvage of the JSON the model returns,
+plus incremental extraction of question objects from a streamed response
+"""
+
+import json
+import re
+from functools import partial
+from typing import Any, List, Optional
+
+from pydantic import ValidationError
+
+from .ai_service import COMPACT_KEYS, COMPACT_OPTIONS_KEY, QuizPydantic, QuizQuestionPydantic
+
+try:
+    import orjson
+
+    def loads(text: str) -> Any:
+        return orjson.loads(text)
+except ImportError:  # orjson is optional; the stdlib parser is the fallback
+    loads = json.loads
+
+# Repaired text may still hold raw control characters (newlines) inside strings
+loads_repaired = partial(json.loads, strict=False)
+
+JSON_ERRORS = (ValueError, TypeError)
+CODE_FENCE_RE = re.compile(r'```[A-Za-z0-9_-]*[ \t]*\n?')
+ARRAY_OF_OBJECTS_RE = re.compile(r'\[\s*\{')
+STRUCTURAL_RE = re.compile(r'[{}\[\]"\\]')
+STRING_RE = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*")')
+TRAILING_COMMA_RE = re.compile(r',(?=\s*[}\]])')
+ANSWER_LETTERS = {'a': 0, 'b': 1, 'c': 2, 'd': 3}
+SMART_QUOTES = (('\u201c', '"'), ('\u201d', '"'), ('\u2018', "'"), ('\u2019', "'"))
+
+
+class ParseResult:
+    """Outcome of parsing one model response"""
+
+    def __init__(self, quiz: Optional[QuizPydantic], invalid: int = 0, repaired: bool = False,
+                 salvaged: bool = False):
+        self.quiz = quiz
+        self.invalid = invalid        # question objects that failed validation
+        self.repaired = repaired      # the JSON needed fixing before it would load
+        self.salvaged = salvaged      # questions were recovered one by one from broken JSON
+
+    @property
+    def questions(self) -> List[QuizQuestionPydantic]:
+        return self.quiz.questions if self.quiz else []
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove Markdown code fence markers (```json ... ```) around or inside a response"""
+    return CODE_FENCE_RE.sub('', text)
+
+
+def extract_json(text: str) -> Optional[str]:
+    """Return the first complete top-level JSON object/array, found with one brace-balanced scan
+
+    Only structural characters are visited (via STRUCTURAL_RE), so prose and long string
+    values are skipped at regex speed. A truncated response returns everything from the
+    opening brace so it can still be salvaged.
+    """
+    start = None
+    depth = 0
+    in_string = False
+    skip = -1  # index of a character escaped by a backslash
+
+    for match in STRUCTURAL_RE.finditer(text):
+        index = match.start()
+        char = match.group()
+        if index == skip:
+            continue
+
+        if in_string:
+            if char == '\\':
+                skip = index + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            if start is not None:
+                in_string = True
+        elif char in '{[':
+            if start is None:
+                if char == '[' and not ARRAY_OF_OBJECTS_RE.match(text, index):
+                    continue  # prose like "[A]" before the JSON
+                start = index
+            depth += 1
+        elif char in '}]' and start is not None:
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+
+    return text[start:] if start is not None else None
+
+
+def repair_json(text: str) -> str:
+    """Fix common LLM JSON defects: smart quotes and trailing commas (outside string values)
+
+    Raw newlines/tabs inside strings are tolerated by loading the result with ``loads_repaired``.
+    """
+    for smart, plain in SMART_QUOTES:
+        if smart in text:
+            text = text.replace(smart, plain)
+    if not TRAILING_COMMA_RE.search(text):
+        return text
+
+    fixed = TRAILING_COMMA_RE.sub('', text)
+    if STRING_RE.findall(fixed) == STRING_RE.findall(text):
+        return fixed
+    # A string value itself contained ", }": only touch the text between string literals
+    parts = STRING_RE.split(text)
+    parts[::2] = [TRAILING_COMMA_RE.sub('', part) for part in parts[::2]]
+    return ''.join(parts)
+
+
+def expand_compact(data: dict) -> dict:
+    """Map a question in the compact format ({"q", "o": [4 options], "a", "e"}) to QuizQuestionPydantic fields"""
+    expanded = {COMPACT_KEYS.get(key, key): value for key, value in data.items() if key != COMPACT_OPTIONS_KEY}
+    options = data.get(COMPACT_OPTIONS_KEY)
+    if isinstance(options, list) and len(options) == 4:
+        expanded.update(zip(('option_a', 'option_b', 'option_c', 'option_d'), options))
+    return expanded
+
+
+def build_question(data: Any, difficulty: Optional[str] = None) -> Optional[QuizQuestionPydantic]:
+    """Validate one question dict (verbose or compact), filling in a missing difficulty; None if it is unusable"""
+    if not isinstance(data, dict):
+        return None
+    try:
+        if 'question' not in data and 'q' in data:
+            data = expand_compact(data)
+        if difficulty and not data.get('difficulty'):
+            data = dict(data, difficulty=difficulty)
+        answer = data.get('correct_answer')
+        if isinstance(answer, str) and answer.strip().lower() in ANSWER_LETTERS:
+            # "B" instead of 1
+            data = dict(data, correct_answer=ANSWER_LETTERS[answer.strip().lower()])
+        return QuizQuestionPydantic(**data)
+    except (ValidationError, TypeError):
+        return None
+
+
+def parse_quiz_response(text: str, topic: Optional[str] = None, difficulty: Optional[str] = None) -> ParseResult:
+    """Parse a model response into a quiz, keeping every valid question even if others are broken"""
+    if not text:
+        return ParseResult(None)
+
+    text = strip_code_fences(text)
+    raw = _outermost_span(text)
+    if raw is None:
+        return ParseResult(None)
+
+    data, repaired = _load(raw)
+    if data is None:
+        # The outermost span may also cover unrelated braces: fall back to a balanced scan
+        balanced = extract_json(text)
+        if balanced != raw:
+            raw = balanced
+            data, repaired = _load(raw)
+
+    if data is None:
+        # Still not loadable (usually truncated): recover the complete question objects
+        parser = IncrementalQuestionParser(difficulty)
+        questions = parser.feed(raw)
+        quiz = _build_quiz(questions, topic, difficulty) if questions else None
+        return ParseResult(quiz, invalid=parser.invalid, repaired=True, salvaged=bool(questions))
+
+    if isinstance(data, list):
+        data = {'questions': data}
+    if not isinstance(data, dict):
+        return ParseResult(None)
+
+    questions = []
+    invalid = 0
+    quiz_difficulty = data.get('difficulty') or difficulty
+    for item in data.get('questions') or []:
+        question = build_question(item, quiz_difficulty)
+        if question is None:
+            invalid += 1
+        else:
+            questions.append(question)
+
+    quiz = None
+    if questions:
+        quiz = _build_quiz(questions, data.get('topic') or topic, quiz_difficulty)
+    return ParseResult(quiz, invalid=invalid, repaired=repaired)
+
+
+def _outermost_span(text: str) -> Optional[str]:
+    """Cheap guess at the JSON: from the first object (or array of objects) to its last closer"""
+    start = text.find('{')
+    closer = '}'
+    array = ARRAY_OF_OBJECTS_RE.search(text)
+    if array and (start == -1 or array.start() < start):
+        start, closer = array.start(), ']'
+    if start == -1:
+        return None
+
+    end = text.rfind(closer)
+    return text[start:end + 1] if end > start else text[start:]
+
+
+def _load(raw: str):
+    """Load JSON as is, then after repair; returns (data or None, repaired)"""
+    try:
+        return loads(raw), False
+    except JSON_ERRORS:
+        pass
+    try:
+        return loads_repaired(repair_json(raw)), True
+    except JSON_ERRORS:
+        return None, False
+
+
+def _build_quiz(questions: List[QuizQuestionPydantic], topic: Optional[str], difficulty: Optional[str]) -> QuizPydantic:
+    return QuizPydantic(
+        topic=str(topic or 'General knowledge'),
+        difficulty=str(difficulty or questions[0].difficulty),
+        questions=questions,
+    )
+
+
+class IncrementalQuestionParser:
+    """Emit each question object of a streamed quiz response as soon as its closing brace arrives
+
+    Accepts either the full ``{"topic": ..., "questions": [{...}, ...]}`` object or a bare
+    ``[{...}, ...]`` array, and ignores text outside the JSON (code fences, commentary).
+    """
+
+    def __init__(self, difficulty: Optional[str] = None):
+        self.difficulty = difficulty
+        self.invalid = 0
+        self._stack = []
+        self._in_string = False
+        self._escaped = False
+        self._buffer = []
+        self._capturing = False
+
+    def feed(self, text: str) -> List[QuizQuestionPydantic]:
+        """Consume the next chunk of response text; returns the questions completed by it"""
+        completed = []
+        capture_from = 0 if self._capturing else None
+        skip = 0 if self._escaped else -1
+        self._escaped = False
+
+        for match in STRUCTURAL_RE.finditer(text):
+            index = match.start()
+            char = match.group()
+            if index == skip:
+                continue
+
+            if self._in_string:
+                if char == '\\':
+                    skip = index + 1
+                    if skip == len(text):
+                        # The escaped character arrives with the next chunk
+                        self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+            elif char in '{[':
+                if char == '{' and self._is_question_start():
+                    self._capturing = True
+                    self._buffer = []
+                    capture_from = index
+                self._stack.append(char)
+            elif char in '}]':
+                if self._stack:
+                    self._stack.pop()
+                if char == '}' and self._capturing and self._is_question_start():
+                    self._capturing = False
+                    self._buffer.append(text[capture_from:index + 1])
+                    capture_from = None
+                    question = self._build(''.join(self._buffer))
+                    if question is not None:
+                        completed.append(question)
+
+        if self._capturing and capture_from is not None:
+            self._buffer.append(text[capture_from:])
+
+        return completed
+
+    def _is_question_start(self) -> bool:
+        # Question objects sit directly inside the outermost array
+        return self._stack in (['{', '['], ['['])
+
+    def _build(self, raw: str) -> Optional[QuizQuestionPydantic]:
+        try:
+            data = loads(raw)
+        except JSON_ERRORS:
+            try:
+                data = loads_repaired(repair_json(raw))
+            except JSON_ERRORS:
+                data = None
+
+        question = build_question(data, self.difficulty)
+        if question is None:
+            self.invalid += 1
+        return question
@@ -0,0 +1,77 @@
+"""
+Pre-generated question bank
+Keeps a supply of validated questions per (topic, difficulty) so popular quizzes start instantly
+"""
+
+from typing import List, Optional
+from django.db import connection, transaction
+
+from .ai_service import QuizPydantic, QuizQuestionPydantic, ai_quiz_service
+from .generation_cache import normalize_topic
+from .models import BankQuestion
+
+
+class QuestionBank:
+    """Stores and serves pre-generated questions indexed by topic and difficulty"""
+
+    question_fields = ['question', 'option_a', 'option_b', 'option_c', 'option_d',
+                       'correct_answer', 'explanation']
+
+    def available(self, topic: str, difficulty: str) -> int:
+        """Number of banked questions for a topic and difficulty"""
+        return BankQuestion.objects.filter(topic_key=normalize_topic(topic), difficulty=difficulty).count()
+
+    def add_questions(self, topic: str, difficulty: str, questions: List[QuizQuestionPydantic]) -> int:
+        """Bank a batch of validated questions; returns the number stored"""
+        topic_key = normalize_topic(topic)
+        BankQuestion.objects.bulk_create([
+            BankQuestion(
+                topic=topic,
+                topic_key=topic_key,
+                difficulty=difficulty,
+                **{field: getattr(question, field) for field in self.question_fields}
+            )
+            for question in questions
+        ])
+        return len(questions)
+
+    def draw(self, topic: str, difficulty: str, num_questions: int) -> Optional[QuizPydantic]:
+        """Take num_questions questions out of the bank, or None if there are not enough"""
+        queryset = BankQuestion.objects.filter(topic_key=normalize_topic(topic), difficulty=difficulty)
+
+        with transaction.atomic():
+            if connection.features.has_select_for_update_skip_locked:
+                # Concurrent draws take disjoint rows instead of queueing on each other
+                queryset = queryset.select_for_update(skip_locked=True)
+            rows = list(queryset.order_by('id').values('id', *self.question_fields)[:num_questions])
+
+            if len(rows) < num_questions:
+                return None
+
+            BankQuestion.objects.filter(id__in=[row.pop('id') for row in rows]).delete()
+
+        return QuizPydantic(
+            topic=topic,
+            difficulty=difficulty,
+            questions=[QuizQuestionPydantic(difficulty=difficulty, **row) for row in rows],
+        )
+
+    def refill(self, topic: str, difficulty: str, low_water_mark: int, batch_size: int) -> int:
+        """Generate batches until the supply reaches the low-water mark; returns questions added"""
+        supply = self.available(topic, difficulty)
+        added = 0
+
+        while supply < low_water_mark:
+            quiz_data = ai_quiz_service.generate_quiz(topic, difficulty, batch_size)
+            if quiz_data.is_fallback or not quiz_data.questions:
+                # Never bank placeholder questions; try again on the next refill
+                break
+            stored = self.add_questions(topic, difficulty, quiz_data.questions)
+            supply += stored
+            added += stored
+
+        return added
+
+
+# Global instance
+question_bank = QuestionBank()
@@ -0,0 +1,176 @@
+"""
+Quiz persistence helpers
+Creates quizzes and their related rows with a fixed, small number of queries
+"""
+
+import uuid
+from typing import List, Optional, Tuple
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics
+from .ai_service import QuizPydantic, QuizQuestionPydantic
+from .models import Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics, GenerationStatus
+
+
+class QuizRepository:
+    """Single place that writes Quiz/QuizQuestion/QuizSession/QuizStatistics rows"""
+
+    question_fields = ['question', 'option_a', 'option_b', 'option_c', 'option_d',
+                       'correct_answer', 'explanation', 'difficulty', 'order']
+
+    def create_from_pydantic(self, quiz_data: QuizPydantic, topic: Optional[str] = None) -> Quiz:
+        """Create a ready quiz with its questions, session and statistics (4 INSERTs)"""
+        with transaction.atomic():
+            quiz = self._create_quiz(
+                topic or quiz_data.topic,
+                quiz_data.difficulty,
+                len(quiz_data.questions),
+                GenerationStatus.READY,
+            )
+            self.add_questions(quiz, quiz_data)
+        return quiz
+
+    def create_pending(self, topic: str, difficulty: str, num_questions: int) -> Quiz:
+        """Create a quiz whose questions will be generated later (3 INSERTs)"""
+        with transaction.atomic():
+            return self._create_quiz(topic, difficulty, num_questions, GenerationStatus.PENDING)
+
+    @metrics.timed(metrics.QUESTION_INSERT_SECONDS, operation='bulk')
+    def add_questions(self, quiz: Quiz, quiz_data: QuizPydantic, start: int = 0):
+        """Bulk-insert the questions of a validated quiz (from position start) in a single query"""
+        QuizQuestion.objects.bulk_create([
+            self._build_question(quiz, question_data, idx)
+            for idx, question_data in enumerate(quiz_data.questions[start:], start=start)
+        ])
+
+    @metrics.timed(metrics.QUESTION_INSERT_SECONDS, operation='single')
+    def add_question(self, quiz: Quiz, question_data: QuizQuestionPydantic, order: int) -> QuizQuestion:
+        """Insert a single question, e.g. as it arrives from a streamed generation"""
+        question = self._build_question(quiz, question_data, order)
+        question.save(force_insert=True)
+        return question
+
+    @metrics.timed(metrics.QUESTION_INSERT_SECONDS, operation='clone')
+    def clone_questions(self, source_quiz_id: Optional[int], quiz: Quiz) -> int:
+        """Copy the questions of an existing quiz into another one; returns the number copied"""
+        if not source_quiz_id:
+            return 0
+
+        rows = list(QuizQuestion.objects.filter(quiz_id=source_quiz_id).values(*self.question_fields))
+        if not rows:
+            return 0
+
+        QuizQuestion.objects.bulk_create([QuizQuestion(quiz=quiz, **row) for row in rows])
+        return len(rows)
+
+    def mark_ready(self, quiz_id: int, total_questions: int, time_to_first_question: Optional[float] = None):
+        """Flag a generating quiz as complete once all its questions are stored
+
+        A quiz no longer generating (failed as stale by expire_stale_generation) stays as it is.
+        """
+        fields = {'total_questions': total_questions, 'status': GenerationStatus.READY}
+        if time_to_first_question is not None:
+            fields['time_to_first_question'] = time_to_first_question
+        Quiz.objects.filter(pk=quiz_id, status=GenerationStatus.GENERATING).update(**fields)
+
+    def record_first_question(self, quiz_id: int, seconds: float):
+        """Store how long the first question took to become playable"""
+        Quiz.objects.filter(pk=quiz_id).update(time_to_first_question=seconds)
+
+    def record_answer(self, quiz_session: QuizSession, question: QuizQuestion, selected_option: int,
+                      completes: bool = False) -> QuizAnswer:
+        """Store one answer and advance the session score and statistics (see record_answers)"""
+        return self.record_answers(quiz_session, [(question, selected_option)], completes=completes)[0]
+
+    def record_answers(self, quiz_session: QuizSession, graded: List[Tuple[QuizQuestion, int]],
+                       completes: bool = False) -> List[QuizAnswer]:
+        """Store a batch of (question, selected_option) answers in one transaction
+
+        Counters are bumped with F() expressions rather than recounted, so this is one bulk
+        INSERT and two UPDATEs however many answers are in the batch or already stored. The
+        in-memory session (and its statistics, if loaded) are updated to match. Raises
+        IntegrityError if a question was already answered in this session.
+        """
+        answers = [
+            QuizAnswer(
+                session=quiz_session,
+                question=question,
+                selected_option=selected_option,
+                is_correct=selected_option == question.correct_answer,
+                score_change=1 if selected_option == question.correct_answer else 0
+            )
+            for question, selected_option in graded
+        ]
+        if not answers:
+            return []
+        correct = sum(answer.score_change for answer in answers)
+
+        session_updates = {
+            'current_score': F('current_score') + correct,
+            'current_question_index': F('current_question_index') + len(answers),
+            'last_activity': timezone.now(),
+        }
+        if completes:
+            session_updates['is_completed'] = True
+
+        with transaction.atomic():
+            QuizAnswer.objects.bulk_create(answers)
+            QuizSession.objects.filter(pk=quiz_session.pk).update(**session_updates)
+            QuizStatistics.objects.filter(session_id=quiz_session.pk).update(
+                **QuizStatistics.answer_updates(correct, len(answers))
+            )
+
+        quiz_session.current_score += correct
+        quiz_session.current_question_index += len(answers)
+        quiz_session.is_completed = quiz_session.is_completed or completes
+        if QuizSession.statistics.is_cached(quiz_session):
+            stats = quiz_session.statistics
+            stats.total_questions_answered += len(answers)
+            stats.correct_answers += correct
+            stats.incorrect_answers += len(answers) - correct
+            stats.percentage = stats.correct_answers * 100.0 / stats.total_questions_answered
+        return answers
+
+    def skip_question(self, quiz_session: QuizSession):
+        """Move the session past its current question without recording an answer"""
+        QuizSession.objects.filter(pk=quiz_session.pk).update(
+            current_question_index=F('current_question_index') + 1,
+            last_activity=timezone.now(),
+        )
+        quiz_session.current_question_index += 1
+
+    def _build_question(self, quiz: Quiz, question_data: QuizQuestionPydantic, order: int) -> QuizQuestion:
+        return QuizQuestion(
+            quiz=quiz,
+            question=question_data.question,
+            option_a=question_data.option_a,
+            option_b=question_data.option_b,
+            option_c=question_data.option_c,
+            option_d=question_data.option_d,
+            correct_answer=question_data.correct_answer,
+            explanation=question_data.explanation,
+            difficulty=question_data.difficulty,
+            order=order
+        )
+
+    def _create_quiz(self, topic: str, difficulty: str, total_questions: int, status: str) -> Quiz:
+        quiz = Quiz.objects.create(
+            session_id=str(uuid.uuid4()),
+            topic=topic,
+            difficulty=difficulty,
+            total_questions=total_questions,
+            status=status
+        )
+        quiz_session = QuizSession.objects.create(quiz=quiz)
+        statistics = QuizStatistics.objects.create(session=quiz_session)
+
+        # Prime the reverse one-to-one caches so callers don't query them back
+        quiz.session = quiz_session
+        quiz_session.statistics = statistics
+        return quiz
+
+
+# Global instance
+quiz_repository = QuizRepository()
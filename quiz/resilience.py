@@ -0,0 +1,352 @@
+"""
+Resilience around LLM calls
+Per-call deadlines, jittered retries on transient errors, a process-wide concurrency cap and a
+circuit breaker, so a slow or failing upstream cannot tie up every worker
+"""
+
+import asyncio
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator
+
+# Errors worth retrying and counting against upstream health (see transient_errors)
+TRANSIENT_ERRORS = (TimeoutError, asyncio.TimeoutError, ConnectionError)
+_transient_errors = None
+
+
+def transient_errors() -> tuple:
+    """TRANSIENT_ERRORS plus google-api-core's retryable errors, imported on first need
+
+    google.api_core.exceptions pulls in gRPC, so it is not imported with this module.
+    """
+    global _transient_errors
+    if _transient_errors is None:
+        try:
+            from google.api_core import exceptions as google_exceptions
+
+            google_errors = (
+                google_exceptions.DeadlineExceeded,
+                google_exceptions.ServiceUnavailable,
+                google_exceptions.InternalServerError,
+                google_exceptions.ResourceExhausted,
+                google_exceptions.TooManyRequests,
+            )
+        except ImportError:  # google-api-core ships with google-generativeai; tolerate its absence
+            google_errors = ()
+        _transient_errors = TRANSIENT_ERRORS + google_errors
+    return _transient_errors
+
+
+class LLMUnavailable(Exception):
+    """Raised without calling the model: the circuit is open or no call slot became free"""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures, then let a single trial call through
+
+    closed -> open after failure_threshold consecutive failures; open -> half_open once
+    reset_timeout has passed; half_open -> closed on success, or back to open on failure.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.trips = 0
+        self.rejected = 0
+        self.failures = 0
+        self.successes = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now (counts a rejection if not)"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self._consecutive_failures = 0
+            self._state = self.CLOSED
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Give up a half-open trial that never reached the upstream"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or (state == self.CLOSED and
+                                           self._consecutive_failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                self.trips += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._consecutive_failures,
+                'trips': self.trips,
+                'rejected': self.rejected,
+                'failures': self.failures,
+                'successes': self.successes,
+            }
+
+
+class ConcurrencyLimiter:
+    """Process-wide cap on concurrent LLM calls, shared by threads and event loops"""
+
+    def __init__(self, max_concurrent: int = 8, acquire_timeout: float = 5.0):
+        self.max_concurrent = max_concurrent
+        self.acquire_timeout = acquire_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.peak = 0
+        self.rejected = 0
+
+    def _acquired(self):
+        with self._lock:
+            self.in_use += 1
+            self.peak = max(self.peak, self.in_use)
+
+    def _release(self):
+        with self._lock:
+            self.in_use -= 1
+        self._semaphore.release()
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        raise LLMUnavailable(f"All {self.max_concurrent} LLM call slots busy for {self.acquire_timeout}s")
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now; give it back with release()"""
+        if not self._semaphore.acquire(blocking=False):
+            return False
+        self._acquired()
+        return True
+
+    def release(self):
+        self._release()
+
+    @contextmanager
+    def slot(self):
+        if not self._semaphore.acquire(timeout=self.acquire_timeout):
+            self._reject()
+        self._acquired()
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        # Poll instead of blocking so the event loop keeps running while we wait
+        deadline = time.monotonic() + self.acquire_timeout
+        while not self._semaphore.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                self._reject()
+            await asyncio.sleep(0.01)
+        self._acquired()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'in_use': self.in_use,
+                'peak': self.peak,
+                'rejected': self.rejected,
+            }
+
+
+class LLMGuard:
+    """Runs model calls under the limiter and breaker with a deadline and jittered retries"""
+
+    def __init__(self, breaker: CircuitBreaker, limiter: ConcurrencyLimiter, timeout: float = 30.0,
+                 retries: int = 2, backoff: float = 0.5):
+        self.breaker = breaker
+        self.limiter = limiter
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.retried = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_settings(cls) -> 'LLMGuard':
+        from django.conf import settings
+
+        return cls(
+            CircuitBreaker(
+                failure_threshold=getattr(settings, 'QUIZ_LLM_BREAKER_THRESHOLD', 5),
+                reset_timeout=getattr(settings, 'QUIZ_LLM_BREAKER_RESET', 30),
+            ),
+            ConcurrencyLimiter(
+                max_concurrent=getattr(settings, 'QUIZ_LLM_MAX_CONCURRENCY', 8),
+                acquire_timeout=getattr(settings, 'QUIZ_LLM_ACQUIRE_TIMEOUT', 5),
+            ),
+            timeout=getattr(settings, 'QUIZ_LLM_TIMEOUT', 30),
+            retries=getattr(settings, 'QUIZ_LLM_RETRIES', 2),
+            backoff=getattr(settings, 'QUIZ_LLM_RETRY_BACKOFF', 0.5),
+        )
+
+    @property
+    def request_options(self) -> dict:
+        """Per-call options for google.generativeai (enforces the deadline on the RPC itself)"""
+        return {'timeout': self.timeout}
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            raise LLMUnavailable("LLM circuit breaker is open")
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # Full jitter: spreads retries from many workers instead of synchronising them
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def _failed(self, error: BaseException, attempt: int, produced: bool) -> bool:
+        """Record a failed attempt; True if it should be retried"""
+        if isinstance(error, LLMUnavailable):
+            # No call slot: the upstream was never asked
+            self.breaker.release_trial()
+            return False
+        if not isinstance(error, transient_errors()):
+            # The upstream answered (e.g. rejected the request), so it counts as healthy
+            self.breaker.record_success()
+            return False
+        if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+            self.timeouts += 1
+        self.breaker.record_failure()
+        if produced or attempt >= self.retries:
+            return False
+        self.retried += 1
+        return True
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """Run fn() (one model request) with retries"""
+        for attempt in range(self.retries + 1):
+            self._check_breaker()
+            try:
+                with self.limiter.slot():
+                    result = fn()
+            except Exception as e:
+                if not self._failed(e, attempt, produced=False):
+                    raise
+                time.sleep(self._backoff_delay(attempt))
+            else:
+                self.breaker.record_success()
+                return result
+
+    def stream(self, fn: Callable[[], Iterable[Any]]) -> Iterator[Any]:
+        """Iterate a streamed response; retried only while nothing has been yielded yet"""
+        for attempt in range(self.retries + 1):
+            self._check_breaker()
+            produced = False
+            try:
+                with self.limiter.slot():
+                    deadline = time.monotonic() + self.timeout
+                    for item in fn():
+                        produced = True
+                        yield item
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(f"LLM stream exceeded its {self.timeout}s deadline")
+            except GeneratorExit:
+                # The consumer stopped reading; the upstream was responding
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                if not self._failed(e, attempt, produced):
+                    raise
+                time.sleep(self._backoff_delay(attempt))
+            else:
+                self.breaker.record_success()
+                return
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async call: the deadline is also enforced locally with asyncio.wait_for"""
+        for attempt in range(self.retries + 1):
+            self._check_breaker()
+            try:
+                async with self.limiter.aslot():
+                    result = await asyncio.wait_for(fn(), self.timeout)
+            except Exception as e:
+                if not self._failed(e, attempt, produced=False):
+                    raise
+                await asyncio.sleep(self._backoff_delay(attempt))
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def astream(self, fn: Callable[[], Awaitable[AsyncIterator[Any]]]) -> AsyncIterator[Any]:
+        """Async streamed call with one overall deadline across all chunks"""
+        for attempt in range(self.retries + 1):
+            self._check_breaker()
+            produced = False
+            try:
+                async with self.limiter.aslot():
+                    deadline = time.monotonic() + self.timeout
+                    response = await asyncio.wait_for(fn(), self.timeout)
+                    iterator = response.__aiter__()
+                    while True:
+                        try:
+                            item = await asyncio.wait_for(iterator.__anext__(), max(0.0, deadline - time.monotonic()))
+                        except StopAsyncIteration:
+                            break
+                        produced = True
+                        yield item
+            except GeneratorExit:
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                if not self._failed(e, attempt, produced):
+                    raise
+                await asyncio.sleep(self._backoff_delay(attempt))
+            else:
+                self.breaker.record_success()
+                return
+
+    def snapshot(self) -> dict:
+        return {
+            'circuit': self.breaker.snapshot(),
+            'concurrency': self.limiter.snapshot(),
+            'timeout_seconds': self.timeout,
+            'retries': self.retried,
+            'timeouts': self.timeouts,
+        }
@@ -0,0 +1,85 @@
+"""
+Cache of rendered quiz results
+A completed quiz's results only change when it is answered again or restarted, so the rendered
+results are stored per (session_id, version) and every change bumps the session's version.
+A cached view needs no database queries and no template work beyond the page shell. The cache
+alias has to be shared by all worker processes (see shared_cache); a local-memory one is not used.
+"""
+
+import hashlib
+import time
+from typing import Any, Dict, Optional
+from django.conf import settings
+from django.db import transaction
+
+from .shared_cache import require_shared
+
+
+class ResultsCache:
+    """Versioned entries in a Django cache alias (QUIZ_RESULTS_CACHE_ALIAS)"""
+
+    version_prefix = 'quiz-results-version:'
+    entry_prefix = 'quiz-results:'
+
+    def __init__(self, ttl: int, alias: str = 'default'):
+        self.ttl = ttl
+        self.alias = alias
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def version(self, session_id: str) -> int:
+        """Current results version of a session (created on first use)"""
+        key = self.version_prefix + session_id
+        version = self.cache.get(key)
+        if version is None:
+            # Start from the clock, not 1: if the counter is evicted, entries cached under
+            # its old values must not become reachable again
+            self.cache.add(key, time.time_ns(), timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def bump(self, session_id: str):
+        """Invalidate a session's cached results"""
+        key = self.version_prefix + session_id
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, time.time_ns(), timeout=None)
+
+    def get(self, session_id: str, version: int) -> Optional[Dict[str, Any]]:
+        return self.cache.get(f"{self.entry_prefix}{session_id}:{version}")
+
+    def set(self, session_id: str, version: int, html: str, last_modified: float) -> Dict[str, Any]:
+        """Store rendered results; returns the entry with its ETag"""
+        etag = hashlib.sha256(f"{session_id}:{version}".encode()).hexdigest()[:32]
+        entry = {'html': html, 'etag': f'"{etag}"', 'last_modified': int(last_modified)}
+        self.cache.set(f"{self.entry_prefix}{session_id}:{version}", entry, timeout=self.ttl)
+        return entry
+
+
+def get_results_cache() -> Optional[ResultsCache]:
+    """The results cache configured by QUIZ_RESULTS_CACHE_*
+
+    None when QUIZ_RESULTS_CACHE_TTL is 0, or when the alias is local to this process: a
+    version bumped by the worker that took an answer would not reach the other workers,
+    which would keep serving (and 304-ing) the old results.
+    """
+    ttl = getattr(settings, 'QUIZ_RESULTS_CACHE_TTL', 60 * 60)
+    alias = getattr(settings, 'QUIZ_RESULTS_CACHE_ALIAS', 'default')
+    if not ttl or not require_shared(alias, 'results cache', "results pages are rendered on every view"):
+        return None
+    return ResultsCache(ttl, alias)
+
+
+def invalidate_results(session_id: str):
+    """Bump the session's results version once the current transaction commits
+
+    Bumping after the commit means a concurrent view cannot cache pre-commit results
+    under the new version.
+    """
+    results_cache = get_results_cache()
+    if results_cache is not None:
+        transaction.on_commit(lambda: results_cache.bump(session_id))
@@ -0,0 +1,189 @@
+"""
+Retention of old quizzes
+Deletes quizzes whose sessions were abandoned or completed long ago, optionally archiving them
+to gzipped JSONL first (see read_archive). Work is done in bounded batches of plain DELETE ... WHERE id IN (...)
+statements, so nothing is loaded into Python to drive ORM cascades and each transaction stays short.
+"""
+
+import gzip
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics
+from .results_cache import invalidate_results
+
+
+@dataclass
+class PurgeReport:
+    """Rows deleted (per table) by one purge run"""
+    quizzes: int = 0
+    rows: Dict[str, int] = field(default_factory=dict)
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.rows.values())
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.total_rows / self.seconds if self.seconds else 0.0
+
+
+class QuizPurger:
+    """Finds expired quizzes and deletes (or archives then deletes) them batch by batch"""
+
+    # Child tables first, so no foreign key is left dangling mid-batch
+    tables = [
+        (QuizAnswer, 'session_id', 'sessions'),
+        (QuizStatistics, 'session_id', 'sessions'),
+        (QuizSession, 'id', 'sessions'),
+        (QuizQuestion, 'quiz_id', 'quizzes'),
+        (Quiz, 'id', 'quizzes'),
+    ]
+
+    def __init__(self, incomplete_days: Optional[float], completed_days: Optional[float],
+                 batch_size: int = 500, archive_path: Optional[str] = None):
+        self.incomplete_days = incomplete_days
+        self.completed_days = completed_days
+        self.batch_size = batch_size
+        self.archive_path = archive_path
+
+    def expired_sessions(self):
+        """Sessions past retention: unfinished ones idle for incomplete_days, completed ones for completed_days
+
+        Either age may be None (or 0) to keep that kind of quiz forever. Each branch is a range
+        scan of the (is_completed, last_activity) index.
+        """
+        now = timezone.now()
+        condition = Q(pk__in=[])
+        if self.incomplete_days:
+            condition |= Q(is_completed=False, last_activity__lt=now - timedelta(days=self.incomplete_days))
+        if self.completed_days:
+            condition |= Q(is_completed=True, last_activity__lt=now - timedelta(days=self.completed_days))
+        return QuizSession.objects.filter(condition)
+
+    def orphans(self):
+        """Quizzes whose session was never created, older than incomplete_days"""
+        if not self.incomplete_days:
+            return Quiz.objects.none()
+        cutoff = timezone.now() - timedelta(days=self.incomplete_days)
+        return Quiz.objects.filter(session__isnull=True, created_at__lt=cutoff)
+
+    def count(self) -> int:
+        return self.expired_sessions().count() + self.orphans().count()
+
+    def next_batch(self, size: int) -> List[Tuple[int, str, Optional[int]]]:
+        """Up to size (quiz id, quiz session_id, session pk) rows of expired quizzes"""
+        batch = list(self.expired_sessions().values_list('quiz_id', 'quiz__session_id', 'id')[:size])
+        if len(batch) < size:
+            batch += [(quiz_id, session_id, None) for quiz_id, session_id in
+                      self.orphans().values_list('id', 'session_id')[:size - len(batch)]]
+        return batch
+
+    def purge(self, limit: Optional[int] = None, pause: float = 0.0, on_batch=None) -> PurgeReport:
+        """Delete expired quizzes in batches of batch_size (at most limit quizzes); returns the totals
+
+        on_batch(report) is called after every committed batch. pause sleeps between batches to
+        leave room for other writers.
+        """
+        report = PurgeReport(rows={model._meta.db_table: 0 for model, _, _ in self.tables})
+        started = time.perf_counter()
+
+        while limit is None or report.quizzes < limit:
+            size = self.batch_size if limit is None else min(self.batch_size, limit - report.quizzes)
+            batch = self.next_batch(size)
+            if not batch:
+                break
+
+            with transaction.atomic():
+                if self.archive_path:
+                    # On disk before anything is deleted: if the deletes then roll back, a rerun
+                    # archives the batch again, and read_archive keeps one copy per quiz
+                    self.write_archive(self.archive_lines(batch))
+                for table, deleted in self.delete(batch).items():
+                    report.rows[table] += deleted
+                for _, session_id, _ in batch:
+                    invalidate_results(session_id)
+
+            report.quizzes += len(batch)
+            report.batches += 1
+            report.seconds = time.perf_counter() - started
+            if on_batch:
+                on_batch(report)
+            if len(batch) < size:
+                break
+            if pause:
+                time.sleep(pause)
+
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def delete(self, batch: List[Tuple[int, str, Optional[int]]]) -> Dict[str, int]:
+        """DELETE one batch from every table; returns rows deleted per table"""
+        ids = {
+            'quizzes': [quiz_id for quiz_id, _, _ in batch],
+            'sessions': [session_pk for _, _, session_pk in batch if session_pk is not None],
+        }
+        deleted = {}
+        with connection.cursor() as cursor:
+            for model, column, key in self.tables:
+                table = model._meta.db_table
+                if not ids[key]:
+                    deleted[table] = 0
+                    continue
+                placeholders = ', '.join(['%s'] * len(ids[key]))
+                cursor.execute(
+                    f"DELETE FROM {connection.ops.quote_name(table)} "
+                    f"WHERE {connection.ops.quote_name(column)} IN ({placeholders})",
+                    ids[key],
+                )
+                deleted[table] = cursor.rowcount
+        return deleted
+
+    def archive_lines(self, batch: List[Tuple[int, str, Optional[int]]]) -> List[str]:
+        """One JSON line per quiz of a batch (with its session, statistics, questions and answers)"""
+        quiz_ids = [quiz_id for quiz_id, _, _ in batch]
+        session_pks = [session_pk for _, _, session_pk in batch if session_pk is not None]
+
+        quizzes = {row['id']: dict(row, session=None, questions=[])
+                   for row in Quiz.objects.filter(id__in=quiz_ids).values()}
+        sessions = {}
+        for row in QuizSession.objects.filter(id__in=session_pks).values():
+            sessions[row['id']] = quizzes[row['quiz_id']]['session'] = dict(row, statistics=None, answers=[])
+        for row in QuizStatistics.objects.filter(session_id__in=session_pks).values():
+            sessions[row['session_id']]['statistics'] = row
+        for row in QuizQuestion.objects.filter(quiz_id__in=quiz_ids).order_by('quiz_id', 'order').values():
+            quizzes[row['quiz_id']]['questions'].append(row)
+        for row in QuizAnswer.objects.filter(session_id__in=session_pks).order_by('id').values():
+            sessions[row['session_id']]['answers'].append(row)
+
+        return [json.dumps(quizzes[quiz_id], cls=DjangoJSONEncoder) + '\n' for quiz_id in quiz_ids]
+
+    def write_archive(self, lines: List[str]):
+        """Append lines to the archive and wait until they are on disk"""
+        # Each call appends a gzip member; concatenated members read back as one stream
+        with open(self.archive_path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                f.write(''.join(lines).encode('utf-8'))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def read_archive(path: str) -> Iterator[dict]:
+    """The quizzes of a purge archive, each once (by quiz id) even where a rerun archived it again"""
+    seen = set()
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            quiz = json.loads(line)
+            if quiz['id'] not in seen:
+                seen.add(quiz['id'])
+                yield quiz
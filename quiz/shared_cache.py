@@ -0,0 +1,35 @@
+"""
+Checks for Django cache aliases that hold state every worker process has to agree on
+Local-memory caches (Django's default when CACHES is not configured) are private to one process,
+so versions, counters and buckets kept there diverge across gunicorn/uvicorn workers.
+"""
+
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_warned = set()
+
+
+def is_shared(alias: str) -> bool:
+    """Whether a cache alias is configured and visible to every process (Redis, Memcached, database, files)"""
+    if not alias or alias not in settings.CACHES:
+        return False
+    return settings.CACHES[alias].get('BACKEND') not in PROCESS_LOCAL_BACKENDS
+
+
+def require_shared(alias: str, feature: str, otherwise: str) -> bool:
+    """is_shared(alias), logging once per feature what happens instead when it is not"""
+    if is_shared(alias):
+        return True
+    if (feature, alias) not in _warned:
+        _warned.add((feature, alias))
+        logger.warning("The %s needs a cache shared by all worker processes, and cache alias %r is not: %s",
+                       feature, alias, otherwise)
+    return False
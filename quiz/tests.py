@@ -1,3 +1,1694 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from .admin import EstimatedCountPaginator
+from .retention import QuizPurger, read_archive
+from .admission import SlidingWindowLimiter, TokenBucket, client_key, get_rate_limiter
+from .models import (Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics, BankQuestion, GenerationStatus,
+                     RateLimitBucket)
+from . import async_views, metrics
+from .jobs import run_generation_job, generate_shared, generate_shared_async
+from .singleflight import SingleFlight, file_lock
+from .question_bank import question_bank
+from .repository import quiz_repository
+from .parser import IncrementalQuestionParser, parse_quiz_response, extract_json, repair_json
+from .fake_llm import FakeGenerativeModel, FaultInjectingModel, build_response_corpus, serve_openai_compatible
+from .results_cache import ResultsCache, get_results_cache
+from .resilience import CircuitBreaker, ConcurrencyLimiter, LLMGuard, LLMUnavailable
+from .ai_service import AIQuizService, QuizPydantic, QuizQuestionPydantic, ai_quiz_service
+from .dedup import QuestionDeduplicator, SimilarityIndex, stored_indexes
+from .llm_backends import LLMRouter, OpenAICompatibleModel
+from .generation_cache import (
+    GenerationCache, LocMemLRUBackend, DatabaseBackend, get_generation_cache, make_cache_key, reset_generation_cache,
+)
+
+
+def make_quiz_data(topic='Python', difficulty='easy', num_questions=3):
+    return QuizPydantic(
+        topic=topic,
+        difficulty=difficulty,
+        questions=[
+            QuizQuestionPydantic(
+                question=f"Question {i + 1} about {topic}?",
+                option_a="A", option_b="B", option_c="C", option_d="D",
+                correct_answer=i % 4,
+                explanation=f"Explanation {i + 1}",
+                difficulty=difficulty,
+            )
+            for i in range(num_questions)
+        ],
+    )
+
+
+def create_pending_quiz(topic='Python', difficulty='easy', num_questions=3):
+    quiz = Quiz.objects.create(topic=topic, difficulty=difficulty, total_questions=num_questions,
+                               status=GenerationStatus.PENDING)
+    session = QuizSession.objects.create(quiz=quiz)
+    session.statistics = QuizStatistics.objects.create(session=session)
+    return quiz
+
+
+class GenerationJobTests(TestCase):
+    """Tests for the background quiz generation pipeline"""
+
+    def post_generate(self, **data):
+        payload = {'topic': 'Python', 'difficulty': 'easy', 'num_questions': 3}
+        payload.update(data)
+        return self.client.post(reverse('quiz:generate_quiz'), payload)
+
+    @override_settings(QUIZ_ASYNC_GENERATION=True)
+    def test_generate_returns_pending_quiz_and_enqueues_job(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.post_generate()
+
+        quiz = Quiz.objects.get()
+        self.assertRedirects(response, reverse('quiz:quiz_detail', args=[quiz.session_id]), fetch_redirect_response=False)
+        self.assertEqual(quiz.status, GenerationStatus.PENDING)
+        self.assertEqual(quiz.questions.count(), 0)
+        self.assertTrue(QuizSession.objects.filter(quiz=quiz).exists())
+        self.assertEqual(len(callbacks), 1)
+
+        response = self.client.get(reverse('quiz:quiz_detail', args=[quiz.session_id]))
+        self.assertTemplateUsed(response, 'quiz/generating.html')
+
+    @override_settings(QUIZ_ASYNC_GENERATION=True)
+    def test_job_populates_questions_and_status_endpoint_reports_ready(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.post_generate()
+        quiz = Quiz.objects.get()
+
+        run_generation_job(quiz.pk)
+
+        quiz.refresh_from_db()
+        self.assertEqual(quiz.status, GenerationStatus.READY)
+        self.assertEqual(quiz.questions.count(), quiz.total_questions)
+
+        response = self.client.get(reverse('quiz:generation_status', args=[quiz.session_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_ready'])
+
+    @override_settings(QUIZ_ASYNC_GENERATION=True)
+    def test_job_runs_only_once(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.post_generate()
+        quiz = Quiz.objects.get()
+
+        run_generation_job(quiz.pk)
+        run_generation_job(quiz.pk)
+
+        self.assertEqual(quiz.questions.count(), Quiz.objects.get().total_questions)
+
+    @override_settings(QUIZ_ASYNC_GENERATION=False)
+    def test_sync_mode_generates_within_request(self):
+        self.post_generate()
+        quiz = Quiz.objects.get()
+        self.assertEqual(quiz.status, GenerationStatus.READY)
+        self.assertGreater(quiz.questions.count(), 0)
+
+    @override_settings(QUIZ_ADMISSION_STALE_SECONDS=600)
+    def test_quiz_whose_job_was_lost_is_marked_failed(self):
+        fresh, lost = create_pending_quiz(), create_pending_quiz()
+        Quiz.objects.filter(pk=lost.pk).update(created_at=timezone.now() - timedelta(hours=1))
+
+        data = self.client.get(reverse('quiz:generation_status', args=[lost.session_id])).json()
+        self.assertEqual(data['status'], GenerationStatus.FAILED)
+        self.assertTrue(data['error'])
+        data = self.client.get(reverse('quiz:generation_status', args=[fresh.session_id])).json()
+        self.assertEqual(data['status'], GenerationStatus.PENDING)
+
+        # A job picking it up late leaves it failed
+        run_generation_job(lost.pk)
+        self.assertEqual(Quiz.objects.get(pk=lost.pk).status, GenerationStatus.FAILED)
+        self.assertEqual(lost.questions.count(), 0)
+
+    def test_job_outliving_expiry_does_not_revive_quiz(self):
+        quiz = create_pending_quiz()
+        Quiz.objects.filter(pk=quiz.pk).update(status=GenerationStatus.FAILED, error_message='stale')
+
+        quiz_repository.mark_ready(quiz.pk, 3)
+
+        self.assertEqual(Quiz.objects.get(pk=quiz.pk).status, GenerationStatus.FAILED)
+
+    def test_sync_status_endpoint_does_not_hold_the_worker(self):
+        quiz = create_pending_quiz()
+        started = time.monotonic()
+        data = self.client.get(reverse('quiz:generation_status', args=[quiz.session_id]), {'wait': 5}).json()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(data['status'], GenerationStatus.PENDING)
+
+        response = self.client.get(reverse('quiz:quiz_detail', args=[quiz.session_id]))
+        self.assertContains(response, 'const longPoll = false;')
+
+
+class AdmissionControlTests(TestCase):
+    """Tests for the per-client generation rate limit and the in-flight generation cap"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def post_generate(self, num_questions=3, **extra):
+        payload = {'topic': 'Python', 'difficulty': 'easy', 'num_questions': num_questions}
+        with self.captureOnCommitCallbacks(execute=False):
+            return self.client.post(reverse('quiz:generate_quiz'), payload, **extra)
+
+    @override_settings(QUIZ_RATE_LIMIT_CAPACITY=10, QUIZ_RATE_LIMIT_PER_MINUTE=6, QUIZ_BANK_ENABLED=False)
+    def test_requests_are_charged_per_question(self):
+        self.assertEqual(self.post_generate(6).status_code, 302)
+
+        response = self.post_generate(5)
+        self.assertEqual(response.status_code, 429)
+        # One token short at a tenth of a token per second
+        self.assertEqual(response['Retry-After'], '10')
+        self.assertContains(response, 'too quickly', status_code=429)
+        self.assertEqual(Quiz.objects.count(), 1)
+
+        # Other clients have buckets of their own
+        self.assertEqual(self.post_generate(5, REMOTE_ADDR='10.0.0.2').status_code, 302)
+
+    def test_bucket_refills_at_its_rate(self):
+        bucket = TokenBucket(capacity=10, rate=1)
+
+        self.assertEqual(bucket.take('client', 10, now=100), 0)
+        self.assertEqual(bucket.take('client', 5, now=102), 3)
+        self.assertEqual(bucket.take('client', 5, now=105), 0)
+        # Nothing accrues beyond the capacity
+        self.assertEqual(bucket.take('client', 10, now=1000), 0)
+        self.assertEqual(bucket.take('client', 1, now=1000), 1)
+
+    def test_bucket_charge_is_one_conditional_update(self):
+        bucket = TokenBucket(capacity=10, rate=1)
+        bucket.take('client', 1, now=100)
+        with self.assertNumQueries(1):
+            self.assertEqual(bucket.take('client', 4, now=100), 0)
+        self.assertEqual(RateLimitBucket.objects.get(key='client').tokens, 5)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                               'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                          'LOCATION': tempfile.mkdtemp(prefix='quiz-rate-limit-')}})
+    def test_shared_cache_limiter_uses_sliding_windows(self):
+        # Off unless configured: behind a proxy every client would share one bucket
+        self.assertIsNone(get_rate_limiter())
+        with override_settings(QUIZ_RATE_LIMIT_CAPACITY=10):
+            self.assertIsInstance(get_rate_limiter(), TokenBucket)
+        with override_settings(QUIZ_RATE_LIMIT_CACHE_ALIAS='shared', QUIZ_RATE_LIMIT_CAPACITY=10,
+                               QUIZ_RATE_LIMIT_PER_MINUTE=6):
+            limiter = get_rate_limiter()
+        self.assertIsInstance(limiter, SlidingWindowLimiter)
+        limiter.cache.clear()
+
+        # Windows of 100 seconds
+        self.assertEqual(limiter.take('client', 6, now=1000), 0)
+        self.assertEqual(limiter.take('client', 5, now=1010), 10)
+        # A refused charge is handed back
+        self.assertEqual(limiter.take('client', 4, now=1020), 0)
+        # Halfway through the next window, half of the previous one still counts
+        self.assertEqual(limiter.take('client', 5, now=1150), 0)
+        self.assertEqual(limiter.take('client', 1, now=1150), 10)
+        self.assertEqual(limiter.take('client', 1, now=1170), 0)
+
+    @override_settings(QUIZ_RATE_LIMIT_CAPACITY=3, QUIZ_RATE_LIMIT_PER_MINUTE=1)
+    def test_quizzes_served_from_bank_or_cache_are_not_charged(self):
+        reset_generation_cache()
+        self.addCleanup(reset_generation_cache)
+        question_bank.add_questions('Python', 'easy', make_quiz_data(num_questions=3).questions)
+        get_generation_cache().set('Cached', 'easy', 3, make_quiz_data(topic='Cached', num_questions=3))
+
+        self.assertEqual(self.post_generate().status_code, 302)
+        self.assertEqual(self.client.post(reverse('quiz:generate_quiz'),
+                                          {'topic': 'Cached', 'difficulty': 'easy', 'num_questions': 3},
+                                          ).status_code, 302)
+        # The whole budget is still there for a quiz the model has to write
+        self.assertEqual(self.post_generate().status_code, 302)
+        self.assertEqual(self.post_generate().status_code, 429)
+
+    def test_client_key_reads_forwarded_address_only_behind_trusted_proxies(self):
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1',
+                                        HTTP_X_FORWARDED_FOR='198.51.100.1, 203.0.113.7')
+        self.assertEqual(client_key(request), 'ip:10.0.0.1')
+        with override_settings(QUIZ_RATE_LIMIT_TRUSTED_PROXIES=1):
+            self.assertEqual(client_key(request), 'ip:203.0.113.7')
+
+    @override_settings(QUIZ_ADMISSION_MAX_IN_FLIGHT=2, QUIZ_ADMISSION_RETRY_AFTER=7, QUIZ_BANK_ENABLED=False)
+    def test_generation_is_shed_while_too_many_are_in_flight(self):
+        create_pending_quiz()
+        create_pending_quiz()
+
+        response = self.post_generate()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertEqual(Quiz.objects.count(), 2)
+
+        # Quizzes stuck pending past QUIZ_ADMISSION_STALE_SECONDS stop counting
+        Quiz.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.post_generate().status_code, 302)
+
+    @override_settings(QUIZ_RATE_LIMIT_CAPACITY=3)
+    async def test_async_view_returns_429(self):
+        await sync_to_async(get_rate_limiter().take)('ip:127.0.0.1', 3)
+        request = AsyncRequestFactory().post('/', {'topic': 'Python', 'difficulty': 'easy', 'num_questions': 3})
+        request.session = SessionStore()
+        request._messages = FallbackStorage(request)
+
+        response = await async_views.generate_quiz(request)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+class GenerationCacheTests(TestCase):
+    """Tests for the generated quiz cache"""
+
+    def setUp(self):
+        reset_generation_cache()
+        self.addCleanup(reset_generation_cache)
+
+    def test_key_normalizes_case_whitespace_and_unicode(self):
+        key = make_cache_key('Python Basics', 'easy', 5)
+        self.assertEqual(make_cache_key('  python   BASICS ', 'easy', 5), key)
+        self.assertEqual(make_cache_key('\uff30ython basics', 'easy', 5), key)
+        self.assertNotEqual(make_cache_key('Python Basics', 'hard', 5), key)
+        self.assertNotEqual(make_cache_key('Python Basics', 'easy', 6), key)
+
+    def test_lru_backend_evicts_oldest_and_expires(self):
+        backend = LocMemLRUBackend(ttl=60, max_entries=2)
+        backend.set('a', {'n': 1})
+        backend.set('b', {'n': 2})
+        backend.get('a')
+        backend.set('c', {'n': 3})
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(backend.get('a'), {'n': 1})
+
+        expired = LocMemLRUBackend(ttl=-1, max_entries=2)
+        expired.set('a', {'n': 1})
+        self.assertIsNone(expired.get('a'))
+
+    def test_db_backend_round_trip_and_size_bound(self):
+        cache = GenerationCache(DatabaseBackend(ttl=60, max_entries=1))
+        cache.set('Python', 'easy', 3, make_quiz_data())
+        cache.set('Django', 'easy', 3, make_quiz_data('Django'))
+        self.assertIsNone(cache.get('Python', 'easy', 3))
+        self.assertEqual(cache.get('django', 'easy', 3)['quiz']['topic'], 'Django')
+
+    def test_fallback_quizzes_are_not_cached(self):
+        cache = GenerationCache(LocMemLRUBackend(ttl=60, max_entries=10))
+        fallback = ai_quiz_service.create_fallback_quiz('Python', 'easy', 3)
+        cache.set('Python', 'easy', 3, fallback)
+        self.assertIsNone(cache.get('Python', 'easy', 3))
+
+    def test_identical_requests_hit_cache(self):
+        model = FakeGenerativeModel()
+        first = create_pending_quiz(topic='Python')
+        second = create_pending_quiz(topic='  PYTHON ')
+
+        with mock.patch.object(ai_quiz_service, 'model', model, create=True):
+            run_generation_job(first.pk)
+            run_generation_job(second.pk)
+
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(second.questions.count(), 3)
+        stats = self.client.get(reverse('quiz:generation_cache_stats')).json()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    @override_settings(QUIZ_GENERATION_CACHE_MODE='clone')
+    def test_clone_mode_copies_source_questions(self):
+        model = FakeGenerativeModel()
+        first = create_pending_quiz()
+        second = create_pending_quiz()
+
+        with mock.patch.object(ai_quiz_service, 'model', model, create=True):
+            run_generation_job(first.pk)
+            run_generation_job(second.pk)
+
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(
+            list(second.questions.values_list('question', flat=True)),
+            list(first.questions.values_list('question', flat=True)),
+        )
+        second.refresh_from_db()
+        self.assertEqual(second.status, GenerationStatus.READY)
+
+
+class SingleFlightTests(TestCase):
+    """Tests for coalescing of concurrent identical generations"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return 'result'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do('key', slow))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while flight.followers < 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['result'] * 5)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_errors_propagate_to_waiters_and_key_is_released(self):
+        flight = SingleFlight()
+
+        def boom():
+            raise RuntimeError('upstream down')
+
+        with self.assertRaises(RuntimeError):
+            flight.do('key', boom)
+        self.assertEqual(flight.do('key', lambda: 'ok'), 'ok')
+
+    def test_file_lock_is_exclusive(self):
+        with tempfile.TemporaryDirectory() as lock_dir:
+            with file_lock('key', lock_dir) as first:
+                self.assertTrue(first)
+                holder = []
+
+                def contend():
+                    with file_lock('key', lock_dir, timeout=0.1) as acquired:
+                        holder.append(acquired)
+
+                thread = threading.Thread(target=contend)
+                thread.start()
+                thread.join()
+                self.assertEqual(holder, [False])
+
+    @mock.patch('quiz.jobs.ai_quiz_service')
+    def test_generate_shared_reuses_result_from_shared_cache(self, service):
+        service.generate_quiz.return_value = make_quiz_data()
+        cache = GenerationCache(DatabaseBackend(ttl=60, max_entries=10))
+
+        with tempfile.TemporaryDirectory() as lock_dir, self.settings(QUIZ_SINGLEFLIGHT_LOCK_DIR=lock_dir):
+            generate_shared('Python', 'easy', 3, cache)
+            generate_shared('python', 'easy', 3, cache)
+
+        self.assertEqual(service.generate_quiz.call_count, 1)
+
+
+class QuestionBankTests(TestCase):
+    """Tests for the pre-generated question bank"""
+
+    def test_draw_requires_enough_questions_and_consumes_them(self):
+        question_bank.add_questions('Python', 'easy', make_quiz_data(num_questions=4).questions)
+
+        self.assertIsNone(question_bank.draw('python', 'easy', 5))
+        self.assertEqual(question_bank.available('Python', 'easy'), 4)
+
+        quiz_data = question_bank.draw(' PYTHON', 'easy', 3)
+        self.assertEqual(len(quiz_data.questions), 3)
+        self.assertEqual(question_bank.available('Python', 'easy'), 1)
+
+    @mock.patch('quiz.question_bank.ai_quiz_service')
+    def test_refill_tops_up_to_low_water_mark_and_skips_fallback(self, service):
+        service.generate_quiz.return_value = make_quiz_data(num_questions=5)
+        self.assertEqual(question_bank.refill('Python', 'easy', low_water_mark=12, batch_size=5), 15)
+        self.assertEqual(service.generate_quiz.call_count, 3)
+
+        service.generate_quiz.return_value = ai_quiz_service.create_fallback_quiz('Django', 'easy', 5)
+        self.assertEqual(question_bank.refill('Django', 'easy', low_water_mark=12, batch_size=5), 0)
+
+    @mock.patch('quiz.question_bank.ai_quiz_service')
+    def test_refill_command(self, service):
+        service.generate_quiz.return_value = make_quiz_data(num_questions=5)
+        out = StringIO()
+        call_command('refill_question_bank', topic=['Python'], difficulties=['easy'],
+                     low_water_mark=5, batch_size=5, stdout=out)
+        self.assertIn('Python (easy): +5 questions, 5 available', out.getvalue())
+
+    @override_settings(QUIZ_ASYNC_GENERATION=True)
+    def test_generate_quiz_is_served_from_bank_without_a_job(self):
+        question_bank.add_questions('Python', 'easy', make_quiz_data(num_questions=3).questions)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.client.post(reverse('quiz:generate_quiz'), {'topic': 'Python', 'difficulty': 'easy', 'num_questions': 3})
+
+        quiz = Quiz.objects.get()
+        self.assertEqual(quiz.status, GenerationStatus.READY)
+        self.assertEqual(quiz.questions.count(), 3)
+        self.assertEqual(len(callbacks), 0)
+        self.assertFalse(BankQuestion.objects.exists())
+
+
+class QuizRepositoryTests(TestCase):
+    """Tests for bulk quiz creation"""
+
+    def test_create_from_pydantic_uses_constant_queries(self):
+        for num_questions in (5, 20):
+            # Quiz, bulk questions, session and statistics INSERTs plus the savepoint pair
+            with self.assertNumQueries(6):
+                quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=num_questions))
+
+            self.assertEqual(quiz.status, GenerationStatus.READY)
+            self.assertEqual(quiz.total_questions, num_questions)
+            self.assertEqual(list(quiz.questions.values_list('order', flat=True)), list(range(num_questions)))
+            self.assertEqual(quiz.session.statistics.total_questions_answered, 0)
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            f.write(make_quiz_data(topic='Imported').model_dump_json())
+        self.addCleanup(os.unlink, f.name)
+
+        call_command('import_quizzes', f.name, stdout=StringIO())
+
+        quiz = Quiz.objects.get(topic='Imported')
+        self.assertEqual(quiz.questions.count(), 3)
+        self.assertTrue(QuizStatistics.objects.filter(session__quiz=quiz).exists())
+
+
+class SQLiteBackendTests(TransactionTestCase):
+    """Tests for the SQLite backend shared by several worker processes"""
+
+    def test_transactions_take_the_write_lock_when_they_begin(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite only")
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                create_pending_quiz()
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class PurgeQuizzesTests(TestCase):
+    """Tests for the retention purge"""
+
+    def make_quiz(self, days_idle, completed):
+        quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=3))
+        session = QuizSession.objects.get(quiz=quiz)
+        quiz_repository.record_answer(session, quiz.questions.get(order=0), 0, completes=completed)
+        QuizSession.objects.filter(pk=session.pk).update(
+            last_activity=timezone.now() - timedelta(days=days_idle))
+        return quiz
+
+    def setUp(self):
+        self.stale_incomplete = self.make_quiz(10, completed=False)
+        self.stale_completed = self.make_quiz(100, completed=True)
+        self.recent_incomplete = self.make_quiz(1, completed=False)
+        self.recent_completed = self.make_quiz(30, completed=True)
+
+    def purge(self, *args):
+        out = StringIO()
+        call_command('purge_quizzes', '--incomplete-days', '7', '--completed-days', '90', *args, stdout=out)
+        return out.getvalue()
+
+    def test_purges_expired_quizzes_and_their_rows(self):
+        output = self.purge('--batch-size', '1')
+
+        self.assertIn('Purged 2 quiz(zes), 14 rows', output)
+        self.assertEqual(set(Quiz.objects.values_list('pk', flat=True)),
+                         {self.recent_incomplete.pk, self.recent_completed.pk})
+        self.assertEqual(QuizSession.objects.count(), 2)
+        self.assertEqual(QuizStatistics.objects.count(), 2)
+        self.assertEqual(QuizAnswer.objects.count(), 2)
+        self.assertEqual(QuizQuestion.objects.count(), 6)
+
+    def test_dry_run_and_limit(self):
+        self.assertIn('2 quiz(zes) would be purged', self.purge('--dry-run'))
+        self.assertEqual(Quiz.objects.count(), 4)
+
+        self.assertIn('Purged 1 quiz(zes)', self.purge('--limit', '1'))
+        self.assertEqual(Quiz.objects.count(), 3)
+
+    def test_archive_keeps_a_copy_of_every_purged_quiz(self):
+        path = os.path.join(tempfile.mkdtemp(), 'purged.jsonl.gz')
+        self.purge('--archive', path)
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            archived = [json.loads(line) for line in f]
+        self.assertEqual({quiz['session_id'] for quiz in archived},
+                         {self.stale_incomplete.session_id, self.stale_completed.session_id})
+        completed = next(quiz for quiz in archived if quiz['session']['is_completed'])
+        self.assertEqual(len(completed['questions']), 3)
+        self.assertEqual(len(completed['session']['answers']), 1)
+        self.assertEqual(completed['session']['statistics']['total_questions_answered'], 1)
+
+    def test_quizzes_are_kept_when_the_archive_cannot_be_written(self):
+        purger = QuizPurger(7, 90, archive_path=os.path.join(tempfile.mkdtemp(), 'purged.jsonl.gz'))
+        with mock.patch.object(purger, 'write_archive', side_effect=OSError('No space left on device')):
+            with self.assertRaises(OSError):
+                purger.purge()
+
+        self.assertEqual(Quiz.objects.count(), 4)
+        self.assertEqual(QuizAnswer.objects.count(), 4)
+
+    def test_rerun_after_failed_batch_archives_each_quiz_once(self):
+        path = os.path.join(tempfile.mkdtemp(), 'purged.jsonl.gz')
+        purger = QuizPurger(7, 90, archive_path=path)
+        with mock.patch.object(purger, 'delete', side_effect=DatabaseError('disk I/O error')):
+            with self.assertRaises(DatabaseError):
+                purger.purge()
+        self.assertEqual(Quiz.objects.count(), 4)
+
+        purger.purge()
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 4)
+        self.assertEqual(sorted(quiz['id'] for quiz in read_archive(path)),
+                         sorted([self.stale_incomplete.pk, self.stale_completed.pk]))
+        self.assertEqual(Quiz.objects.count(), 2)
+
+    def test_cached_results_of_purged_quizzes_are_invalidated(self):
+        results_url = reverse('quiz:quiz_results', args=[self.stale_completed.session_id])
+        self.assertEqual(self.client.get(results_url).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purge()
+        self.assertEqual(self.client.get(results_url).status_code, 302)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AdminChangelistTests(TestCase):
+    """Query budgets for the admin changelists; none may grow with the number of rows shown"""
+
+    # Session, user, row estimate, COUNT(*) (the table is under the estimate threshold), page rows
+    CHANGELIST_QUERIES = 5
+
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+
+    def add_quizzes(self, count):
+        for i in range(count):
+            quiz = quiz_repository.create_from_pydantic(make_quiz_data(topic=f'Topic {i}', num_questions=3))
+            session = QuizSession.objects.get(quiz=quiz)
+            quiz_repository.record_answers(session, [(question, 0) for question in quiz.questions.all()],
+                                           completes=True)
+            BankQuestion.objects.create(topic=f'Topic {i}', topic_key=f'topic {i}', difficulty='easy',
+                                        question='Q' * 80, option_a='A', option_b='B', option_c='C',
+                                        option_d='D', correct_answer=0, explanation='E')
+
+    def test_changelists_use_constant_queries(self):
+        models = [Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics, BankQuestion]
+        for count in (2, 10):
+            self.add_quizzes(count)
+            for model in models:
+                url = reverse(f'admin:quiz_{model._meta.model_name}_changelist')
+                with self.subTest(model=model.__name__, rows=model.objects.count()):
+                    with self.assertNumQueries(self.CHANGELIST_QUERIES):
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_previews_are_truncated_in_the_database(self):
+        self.add_quizzes(1)
+        response = self.client.get(reverse('admin:quiz_bankquestion_changelist'))
+        self.assertContains(response, 'Q' * 50 + '...')
+        self.assertNotContains(response, 'Q' * 51)
+
+        response = self.client.get(reverse('admin:quiz_quizanswer_changelist'))
+        self.assertContains(response, 'Question 1 about Topic 0?')
+
+    def test_big_unfiltered_lists_use_the_row_estimate(self):
+        self.add_quizzes(2)
+        with mock.patch('quiz.admin.estimated_row_count', return_value=250_000):
+            self.assertEqual(EstimatedCountPaginator(QuizAnswer.objects.order_by('pk'), 100).count, 250_000)
+            # Filtered lists are counted exactly
+            self.assertEqual(EstimatedCountPaginator(QuizAnswer.objects.filter(is_correct=False), 100).count,
+                             QuizAnswer.objects.filter(is_correct=False).count())
+        with mock.patch('quiz.admin.estimated_row_count', return_value=50):
+            self.assertEqual(EstimatedCountPaginator(QuizAnswer.objects.order_by('pk'), 100).count, 6)
+
+
+class IncrementalStatisticsTests(TestCase):
+    """Tests for incrementally maintained answer statistics"""
+
+    def setUp(self):
+        self.quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=20))
+        self.session = QuizSession.objects.get(quiz=self.quiz)
+        self.questions = list(self.quiz.questions.all())
+
+    def answer(self, count, correct_every=2):
+        for question in self.questions[:count]:
+            selected = question.correct_answer if question.order % correct_every == 0 else (question.correct_answer + 1) % 4
+            quiz_repository.record_answer(self.session, question, selected)
+
+    def test_record_answer_cost_does_not_grow_with_answers(self):
+        self.answer(15)
+        # Savepoint, answer INSERT, session UPDATE, statistics UPDATE, release
+        with self.assertNumQueries(5):
+            quiz_repository.record_answer(self.session, self.questions[15], self.questions[15].correct_answer,
+                                          completes=True)
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.current_question_index, 16)
+        self.assertEqual(self.session.current_score, 9)
+        self.assertTrue(self.session.is_completed)
+
+    def test_incremental_counters_match_recompute(self):
+        self.answer(7)
+        stats = QuizStatistics.objects.get(session=self.session)
+        incremental = (stats.total_questions_answered, stats.correct_answers, stats.incorrect_answers)
+
+        self.assertFalse(stats.recompute())
+        self.assertEqual(incremental, (7, 4, 3))
+        self.assertAlmostEqual(stats.percentage, 4 / 7 * 100)
+
+    def test_recompute_command_repairs_drift(self):
+        self.answer(4)
+        QuizStatistics.objects.filter(session=self.session).update(correct_answers=0, percentage=0)
+
+        out = StringIO()
+        call_command('recompute_statistics', stdout=out)
+
+        self.assertIn('repaired 1', out.getvalue())
+        stats = QuizStatistics.objects.get(session=self.session)
+        self.assertEqual((stats.correct_answers, stats.percentage), (2, 50.0))
+
+
+class QueryBudgetTests(TestCase):
+    """Query budgets for the per-question request paths; none may grow with quiz length"""
+
+    # Joined quiz + session lookup, current question
+    DETAIL_QUERIES = 2
+    # Joined lookup, current question, savepoint, answer INSERT, session and statistics UPDATEs, release
+    SUBMIT_QUERIES = 7
+    # Joined quiz + session + statistics lookup
+    STATUS_QUERIES = 1
+
+    def play(self, num_questions):
+        quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=num_questions))
+        detail_url = reverse('quiz:quiz_detail', args=[quiz.session_id])
+        submit_url = reverse('quiz:submit_answer', args=[quiz.session_id])
+
+        for _ in range(num_questions):
+            with self.assertNumQueries(self.DETAIL_QUERIES):
+                response = self.client.get(detail_url)
+            self.assertTemplateUsed(response, 'quiz/quiz_detail.html')
+
+            with self.assertNumQueries(self.SUBMIT_QUERIES):
+                self.client.post(submit_url, {'selected_option': 0})
+
+        with self.assertNumQueries(self.DETAIL_QUERIES):
+            response = self.client.get(detail_url)
+        self.assertRedirects(response, reverse('quiz:quiz_results', args=[quiz.session_id]),
+                             fetch_redirect_response=False)
+
+        with self.assertNumQueries(self.STATUS_QUERIES):
+            status = self.client.get(reverse('quiz:quiz_status', args=[quiz.session_id])).json()
+        self.assertTrue(status['is_completed'])
+        self.assertEqual(status['statistics']['total_answered'], num_questions)
+
+    def test_5_question_quiz(self):
+        self.play(5)
+
+    def test_20_question_quiz(self):
+        self.play(20)
+
+    def test_repeated_answer_advances_without_duplicating(self):
+        quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=3))
+        session = QuizSession.objects.get(quiz=quiz)
+        quiz_repository.record_answer(session, quiz.questions.get(order=0), 0)
+        QuizSession.objects.filter(pk=session.pk).update(current_question_index=0)
+
+        self.client.post(reverse('quiz:submit_answer', args=[quiz.session_id]), {'selected_option': 1})
+
+        session.refresh_from_db()
+        self.assertEqual(session.current_question_index, 1)
+        self.assertEqual(session.answers.count(), 1)
+
+
+class QuizApiTests(TestCase):
+    """Tests for the single-payload JSON quiz API"""
+
+    def fetch(self, quiz):
+        return self.client.get(reverse('quiz:quiz_api', args=[quiz.session_id])).json()
+
+    def submit(self, quiz, body):
+        return self.client.post(reverse('quiz:quiz_answers_api', args=[quiz.session_id]),
+                                json.dumps(body), content_type='application/json')
+
+    def test_quiz_payload_hides_answers(self):
+        quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=5))
+        with self.assertNumQueries(2):
+            data = self.fetch(quiz)
+
+        self.assertEqual(len(data['questions']), 5)
+        self.assertEqual(data['questions'][0]['options'], ['A', 'B', 'C', 'D'])
+        self.assertNotIn('correct_answer', data['questions'][0])
+        self.assertNotIn('explanation', data['questions'][0])
+        self.assertTrue(data['token'])
+
+    def test_whole_quiz_is_graded_in_one_request(self):
+        for num_questions in (5, 20):
+            quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=num_questions))
+            data = self.fetch(quiz)
+            answers = [{'question_id': q['id'], 'selected_option': 0} for q in data['questions']]
+
+            # Lookup, questions, answered check, savepoint, bulk INSERT, two UPDATEs, release
+            with self.assertNumQueries(8):
+                result = self.submit(quiz, {'token': data['token'], 'answers': answers}).json()
+
+            expected_correct = len(range(0, num_questions, 4))
+            self.assertEqual(len(result['results']), num_questions)
+            self.assertEqual(result['current_score'], expected_correct)
+            self.assertTrue(result['is_completed'])
+            self.assertEqual(result['statistics']['correct'], expected_correct)
+
+            stats = QuizStatistics.objects.get(session__quiz=quiz)
+            self.assertFalse(stats.recompute())
+            self.assertEqual(stats.total_questions_answered, num_questions)
+
+    def test_single_answers_and_resubmissions(self):
+        quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=3))
+        data = self.fetch(quiz)
+        first = {'token': data['token'], 'question_id': data['questions'][0]['id'], 'selected_option': 0}
+
+        result = self.submit(quiz, first).json()
+        self.assertTrue(result['results'][0]['is_correct'])
+        self.assertFalse(result['is_completed'])
+
+        result = self.submit(quiz, dict(first, selected_option=2)).json()
+        self.assertEqual(result['results'], [])
+        self.assertEqual(result['skipped'], [first['question_id']])
+        self.assertEqual(QuizSession.objects.get(quiz=quiz).current_score, 1)
+
+    def test_token_and_input_are_validated(self):
+        quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=3))
+        other = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=3))
+        question_id = quiz.questions.first().id
+
+        answer = {'question_id': question_id, 'selected_option': 1}
+        self.assertEqual(self.submit(quiz, dict(answer, token='forged')).status_code, 403)
+        self.assertEqual(self.submit(quiz, dict(answer, token=self.fetch(other)['token'])).status_code, 403)
+
+        token = self.fetch(quiz)['token']
+        self.assertEqual(self.submit(quiz, dict(answer, token=token, selected_option=7)).status_code, 400)
+        foreign = {'question_id': other.questions.first().id, 'selected_option': 1}
+        self.assertEqual(self.submit(quiz, dict(foreign, token=token)).status_code, 400)
+        self.assertFalse(QuizAnswer.objects.exists())
+
+
+class StreamingGenerationTests(TestCase):
+    """Tests for streamed generation and incremental parsing"""
+
+    def setUp(self):
+        reset_generation_cache()
+        self.addCleanup(reset_generation_cache)
+
+    def test_parser_emits_each_question_when_its_object_closes(self):
+        model = FakeGenerativeModel()
+        text = model.build_response(ai_quiz_service.generate_quiz_prompt('Python', 'easy', 3))
+        parser = IncrementalQuestionParser('easy')
+
+        emitted_at = []
+        for position, char in enumerate(text):
+            for question in parser.feed(char):
+                emitted_at.append(position)
+
+        self.assertEqual(len(emitted_at), 3)
+        self.assertLess(emitted_at[0], len(text) // 2)
+        self.assertEqual(parser.invalid, 0)
+
+    def test_parser_skips_invalid_objects_and_fills_difficulty(self):
+        parser = IncrementalQuestionParser('hard')
+        questions = parser.feed(
+            '[{"question": "Broken", "correct_answer": 9}, '
+            '{"question": "Has {braces} and \\"quotes\\"?", "option_a": "a", "option_b": "b", '
+            '"option_c": "c", "option_d": "d", "correct_answer": 1, "explanation": "e"}]'
+        )
+        self.assertEqual(len(questions), 1)
+        self.assertEqual(questions[0].question, 'Has {braces} and "quotes"?')
+        self.assertEqual(questions[0].difficulty, 'hard')
+        self.assertEqual(parser.invalid, 1)
+
+    def test_streaming_service_reports_questions_in_order(self):
+        seen = []
+        with mock.patch.object(ai_quiz_service, 'model', FakeGenerativeModel(chunk_size=16), create=True):
+            quiz_data = ai_quiz_service.generate_quiz_streaming('Python', 'easy', 4, seen.append)
+
+        self.assertFalse(quiz_data.is_fallback)
+        self.assertEqual([q.question for q in seen], [q.question for q in quiz_data.questions])
+        self.assertEqual(len(seen), 4)
+
+    @override_settings(QUIZ_STREAMING_GENERATION=True)
+    def test_first_question_is_playable_while_generation_continues(self):
+        quiz = create_pending_quiz(num_questions=5)
+        detail_url = reverse('quiz:quiz_detail', args=[quiz.session_id])
+        templates = []
+        record_first_question = quiz_repository.record_first_question
+
+        def check_detail(quiz_id, seconds):
+            record_first_question(quiz_id, seconds)
+            response = self.client.get(detail_url)
+            templates.extend(t.name for t in response.templates)
+            self.assertEqual(Quiz.objects.get(pk=quiz_id).status, GenerationStatus.GENERATING)
+
+        with mock.patch.object(ai_quiz_service, 'model', FakeGenerativeModel(chunk_size=16), create=True), \
+                mock.patch.object(quiz_repository, 'record_first_question', side_effect=check_detail):
+            run_generation_job(quiz.pk)
+
+        self.assertIn('quiz/quiz_detail.html', templates)
+        quiz.refresh_from_db()
+        self.assertEqual(quiz.status, GenerationStatus.READY)
+        self.assertEqual(quiz.questions.count(), 5)
+        self.assertIsNotNone(quiz.time_to_first_question)
+
+    def test_waiting_for_next_question_renders_generating_page(self):
+        quiz = create_pending_quiz(num_questions=3)
+        Quiz.objects.filter(pk=quiz.pk).update(status=GenerationStatus.GENERATING)
+        quiz_repository.add_question(quiz, make_quiz_data().questions[0], order=0)
+        QuizSession.objects.filter(quiz=quiz).update(current_question_index=1)
+
+        response = self.client.get(reverse('quiz:quiz_detail', args=[quiz.session_id]))
+        self.assertTemplateUsed(response, 'quiz/generating.html')
+        # A sync worker is not tied up by an open event stream
+        self.assertNotContains(response, reverse('quiz:quiz_events', args=[quiz.session_id]))
+
+        status = self.client.get(reverse('quiz:generation_status', args=[quiz.session_id]), {'after': 0}).json()
+        self.assertEqual(status['questions_generated'], 1)
+        self.assertFalse(status['is_ready'])
+
+
+class AsyncViewTests(TestCase):
+    """Tests for the ASGI (async) views and async generation"""
+
+    def setUp(self):
+        reset_generation_cache()
+        self.addCleanup(reset_generation_cache)
+        self.factory = AsyncRequestFactory()
+        self.model = FakeGenerativeModel(chunk_size=32)
+        patcher = mock.patch.object(ai_quiz_service, 'model', self.model, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def call(self, view, method='get', data=None, **kwargs):
+        request = getattr(self.factory, method)('/', data or {})
+        request.session = SessionStore()
+        request._messages = FallbackStorage(request)
+        return await view(request, **kwargs)
+
+    @override_settings(QUIZ_ASYNC_VIEWS=True)
+    async def test_generating_page_follows_event_stream(self):
+        quiz = await sync_to_async(create_pending_quiz)()
+
+        response = await self.call(async_views.quiz_detail, session_id=quiz.session_id)
+
+        self.assertContains(response, reverse('quiz:quiz_events', args=[quiz.session_id]))
+
+    @override_settings(QUIZ_ASYNC_GENERATION=False)
+    async def test_generate_play_and_status(self):
+        response = await self.call(async_views.generate_quiz, 'post',
+                                   {'topic': 'Python', 'difficulty': 'easy', 'num_questions': 3})
+        quiz = await Quiz.objects.aget()
+        self.assertEqual(response.url, reverse('quiz:quiz_detail', args=[quiz.session_id]))
+        self.assertEqual(quiz.status, GenerationStatus.READY)
+        self.assertEqual(await quiz.questions.acount(), 3)
+
+        response = await self.call(async_views.quiz_detail, session_id=quiz.session_id)
+        first = await quiz.questions.afirst()
+        self.assertContains(response, first.question)
+
+        await self.call(async_views.submit_answer, 'post', {'selected_option': first.correct_answer},
+                        session_id=quiz.session_id)
+        status = json.loads((await self.call(async_views.quiz_status, session_id=quiz.session_id)).content)
+        self.assertEqual(status['current_question_index'], 1)
+        self.assertEqual(status['current_score'], 1)
+        self.assertEqual(status['statistics']['total_answered'], 1)
+
+        generation = json.loads((await self.call(async_views.generation_status, session_id=quiz.session_id,
+                                                 data={'wait': 5})).content)
+        self.assertTrue(generation['is_ready'])
+        self.assertEqual(generation['questions_generated'], 3)
+
+    async def test_get_is_rejected_by_post_only_views(self):
+        response = await self.call(async_views.generate_quiz, 'get')
+        self.assertEqual(response.status_code, 405)
+
+    @override_settings(QUIZ_GENERATION_CHUNK_SIZE=0)
+    async def test_concurrent_generations_overlap_on_one_loop(self):
+        self.model.latency = 0.2
+        started = time.monotonic()
+        quizzes = await asyncio.gather(*(
+            ai_quiz_service.generate_quiz_async(f'Topic {i}', 'easy', 3) for i in range(10)
+        ))
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(self.model.calls, 10)
+        self.assertTrue(all(len(quiz.questions) == 3 and not quiz.is_fallback for quiz in quizzes))
+
+    async def test_identical_async_generations_are_coalesced(self):
+        self.model.latency = 0.1
+        results = await asyncio.gather(*(generate_shared_async('Python', 'easy', 3) for _ in range(5)))
+        self.assertEqual(self.model.calls, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    @override_settings(QUIZ_GENERATION_CHUNK_SIZE=5)
+    async def test_chunked_async_generation_streams_each_question_once(self):
+        seen = []
+
+        async def on_question(question):
+            seen.append(question)
+
+        quiz_data = await ai_quiz_service.generate_quiz_async('Python', 'easy', 12, on_question)
+        self.assertEqual(self.model.calls, 3)
+        self.assertEqual([q.question for q in seen], [q.question for q in quiz_data.questions])
+        self.assertEqual(len(seen), 12)
+
+
+class ChunkedGenerationTests(TestCase):
+    """Tests for splitting large quizzes into concurrent batches"""
+
+    def generate(self, model, num_questions=20, **kwargs):
+        with mock.patch.object(ai_quiz_service, 'model', model, create=True):
+            return ai_quiz_service.generate_quiz('Python', 'easy', num_questions, **kwargs)
+
+    @override_settings(QUIZ_GENERATION_CHUNK_SIZE=5)
+    def test_large_quiz_is_generated_in_batches(self):
+        model = FakeGenerativeModel()
+        quiz_data = self.generate(model)
+
+        self.assertEqual(model.calls, 4)
+        self.assertEqual(len(quiz_data.questions), 20)
+        self.assertEqual(len({q.question for q in quiz_data.questions}), 20)
+
+    @override_settings(QUIZ_GENERATION_CHUNK_SIZE=5, QUIZ_GENERATION_CHUNK_THRESHOLD=10)
+    def test_only_quizzes_over_the_threshold_are_chunked_in_balanced_batches(self):
+        model = FakeGenerativeModel()
+        self.assertEqual(len(self.generate(model, num_questions=10).questions), 10)
+        self.assertEqual(model.calls, 1)
+
+        self.assertEqual(ai_quiz_service.chunk_sizes(12), [4, 4, 4])
+        self.assertEqual(ai_quiz_service.chunk_sizes(11), [4, 4, 3])
+        self.assertEqual(ai_quiz_service.chunk_sizes(20), [5, 5, 5, 5])
+
+    @override_settings(QUIZ_GENERATION_CHUNK_SIZE=5)
+    def test_near_duplicate_questions_are_dropped(self):
+        # Every batch answers with the same five questions
+        text = FakeGenerativeModel().build_response(ai_quiz_service.generate_quiz_prompt('Python', 'easy', 5))
+        quiz_data = self.generate(FakeGenerativeModel(response_text=text))
+
+        self.assertFalse(quiz_data.is_fallback)
+        self.assertEqual(len(quiz_data.questions), 5)
+
+    @override_settings(QUIZ_GENERATION_CHUNK_SIZE=5, QUIZ_GENERATION_CHUNK_RETRIES=1)
+    def test_failing_batch_is_retried_then_skipped(self):
+        class FailingBatchModel(FakeGenerativeModel):
+            def generate_content(self, prompt, stream=False, **kwargs):
+                if 'batch 2 of' in prompt:
+                    self.calls += 1
+                    raise RuntimeError('upstream error')
+                return super().generate_content(prompt, stream=stream, **kwargs)
+
+        model = FailingBatchModel()
+        quiz_data = self.generate(model)
+
+        self.assertFalse(quiz_data.is_fallback)
+        self.assertEqual(len(quiz_data.questions), 15)
+        self.assertEqual(model.calls, 5)
+
+    @override_settings(QUIZ_GENERATION_CHUNK_SIZE=5)
+    def test_streamed_batches_report_each_question_once(self):
+        seen = []
+        with mock.patch.object(ai_quiz_service, 'model', FakeGenerativeModel(chunk_size=32), create=True):
+            quiz_data = ai_quiz_service.generate_quiz_streaming('Python', 'easy', 12, seen.append)
+
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(seen, quiz_data.questions)
+
+
+class NearDuplicateTests(TestCase):
+    """Tests for dropping and regenerating near-duplicate questions"""
+
+    def setUp(self):
+        stored_indexes.clear()
+
+    def duplicated_response(self):
+        """Three questions, the third a rewording of the first"""
+        questions = FakeGenerativeModel.build_questions('Python', 'easy', 3)
+        questions[2] = dict(questions[0], question="Which statement about Python is true of the concepts 1a, 1b, and 1c?")
+        return json.dumps({'topic': 'Python', 'difficulty': 'easy', 'questions': questions})
+
+    def top_up_model(self):
+        """Fake model that answers the first call with duplicated_response"""
+        model = FakeGenerativeModel()
+        model.prompts = []
+        build_response = model.build_response
+
+        def respond(prompt):
+            model.prompts.append(prompt)
+            return self.duplicated_response() if len(model.prompts) == 1 else build_response(prompt)
+        model.build_response = respond
+        return model
+
+    def test_reworded_questions_are_near_duplicates(self):
+        dedup = QuestionDeduplicator('Algorithms', threshold=0.6, stored=False)
+        dedup.add("What is the time complexity of binary search?")
+
+        self.assertEqual(dedup.duplicate_of("What is the time complexity of the binary search algorithm?"), 'quiz')
+        self.assertIsNone(dedup.duplicate_of("What is the worst-case time complexity of quicksort?"))
+
+        # Sharing the topic's words does not make questions similar
+        topic = 'Introduction to machine learning algorithms'
+        first, second = FakeGenerativeModel.build_questions(topic, 'easy', 2)
+        dedup = QuestionDeduplicator(topic, stored=False)
+        dedup.add(first['question'])
+        self.assertIsNone(dedup.duplicate_of(second['question']))
+
+    def test_similarity_index_returns_nearest_first(self):
+        index = SimilarityIndex()
+        index.add_many([
+            (1, "How does a hash table resolve collisions with open addressing?"),
+            (2, "How does a hash table resolve collisions with chaining?"),
+            (3, "Why is merge sort stable?"),
+        ])
+
+        matches = index.nearest("How does a hash table resolve collisions using open addressing?", threshold=0.3)
+        self.assertEqual([key for key, _ in matches], [1, 2])
+        self.assertEqual(index.nearest("Why is merge sort stable?", threshold=0.9), [(3, 1.0)])
+
+    def test_dropped_duplicates_are_regenerated(self):
+        model = self.top_up_model()
+        with mock.patch.object(ai_quiz_service, 'model', model, create=True):
+            quiz_data = ai_quiz_service.generate_quiz('Python', 'easy', 3)
+
+        self.assertEqual(len(quiz_data.questions), 3)
+        self.assertEqual(len({q.question for q in quiz_data.questions}), 3)
+        self.assertEqual(model.calls, 2)
+        # The follow-up call asks for the missing question and lists the accepted ones
+        self.assertIn('with 1 multiple choice questions', model.prompts[1])
+        self.assertIn(quiz_data.questions[0].question, model.prompts[1])
+
+    async def test_async_generation_regenerates_duplicates(self):
+        model = self.top_up_model()
+        with mock.patch.object(ai_quiz_service, 'model', model, create=True):
+            quiz_data = await ai_quiz_service.generate_quiz_async('Python', 'easy', 3)
+
+        self.assertEqual(len({q.question for q in quiz_data.questions}), 3)
+        self.assertEqual(model.calls, 2)
+
+    @override_settings(QUIZ_DEDUP_STORED=True)
+    def test_questions_stored_for_the_topic_are_avoided(self):
+        stored = FakeGenerativeModel.build_questions('Python', 'easy', 1)[0]['question']
+        quiz = Quiz.objects.create(topic='Python', difficulty='easy', total_questions=1)
+        QuizQuestion.objects.create(quiz=quiz, question=stored, option_a='A', option_b='B', option_c='C',
+                                    option_d='D', correct_answer=0, explanation='', difficulty='easy', order=0)
+
+        with mock.patch.object(ai_quiz_service, 'model', FakeGenerativeModel(), create=True):
+            quiz_data = ai_quiz_service.generate_quiz('Python', 'easy', 3)
+
+        self.assertEqual(len(quiz_data.questions), 3)
+        self.assertNotIn(stored, [q.question for q in quiz_data.questions])
+
+
+class ResilienceTests(TestCase):
+    """Tests for deadlines, retries, the concurrency cap and the circuit breaker around LLM calls"""
+
+    def make_guard(self, threshold=3, reset=60, retries=2, timeout=0.05, max_concurrent=4, acquire_timeout=0.05):
+        return LLMGuard(CircuitBreaker(threshold, reset), ConcurrencyLimiter(max_concurrent, acquire_timeout),
+                        timeout=timeout, retries=retries, backoff=0)
+
+    def generate(self, model, guard, num_questions=3):
+        with mock.patch.object(ai_quiz_service, 'model', model, create=True), \
+                mock.patch.object(ai_quiz_service, 'guard', guard):
+            return ai_quiz_service.generate_quiz('Python', 'easy', num_questions)
+
+    def test_transient_errors_are_retried(self):
+        guard = self.make_guard()
+        model = FaultInjectingModel(faults=['error', 'hang'])
+
+        quiz_data = self.generate(model, guard)
+
+        self.assertFalse(quiz_data.is_fallback)
+        self.assertEqual(model.calls, 3)
+        self.assertEqual(guard.snapshot()['retries'], 2)
+        self.assertEqual(guard.snapshot()['timeouts'], 1)
+        self.assertEqual(guard.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_non_transient_errors_are_not_retried(self):
+        guard = self.make_guard()
+        model = FaultInjectingModel(faults=[ValueError('bad request')])
+
+        self.assertTrue(self.generate(model, guard).is_fallback)
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(guard.breaker.snapshot()['failures'], 0)
+
+    def test_breaker_trips_and_fails_fast(self):
+        guard = self.make_guard(threshold=3, retries=2)
+        model = FaultInjectingModel(default='error')
+
+        self.assertTrue(self.generate(model, guard).is_fallback)
+        self.assertEqual(guard.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(model.calls, 3)
+
+        # While open the model is not called at all
+        self.assertTrue(self.generate(model, guard).is_fallback)
+        self.assertEqual(model.calls, 3)
+        circuit = guard.snapshot()['circuit']
+        self.assertEqual(circuit['trips'], 1)
+        self.assertEqual(circuit['rejected'], 1)
+
+    def test_breaker_half_opens_after_reset(self):
+        guard = self.make_guard(threshold=1, reset=0.05, retries=0)
+        self.generate(FaultInjectingModel(default='error'), guard)
+        self.assertEqual(guard.breaker.state, CircuitBreaker.OPEN)
+
+        time.sleep(0.06)
+        self.assertEqual(guard.breaker.state, CircuitBreaker.HALF_OPEN)
+        # A failed trial reopens the circuit, a successful one closes it
+        self.generate(FaultInjectingModel(default='error'), guard)
+        self.assertEqual(guard.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(guard.breaker.trips, 2)
+
+        time.sleep(0.06)
+        self.assertFalse(self.generate(FaultInjectingModel(), guard).is_fallback)
+        self.assertEqual(guard.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_limiter_rejects_when_saturated(self):
+        limiter = ConcurrencyLimiter(max_concurrent=1, acquire_timeout=0.01)
+        with limiter.slot():
+            with self.assertRaises(LLMUnavailable):
+                with limiter.slot():
+                    pass
+        self.assertEqual(limiter.snapshot(), {'max_concurrent': 1, 'in_use': 0, 'peak': 1, 'rejected': 1})
+
+    def test_async_deadline_cancels_hung_call(self):
+        guard = self.make_guard(retries=1)
+        model = FaultInjectingModel(faults=['hang'])
+
+        async def generate():
+            with mock.patch.object(ai_quiz_service, 'model', model, create=True), \
+                    mock.patch.object(ai_quiz_service, 'guard', guard):
+                return await ai_quiz_service.generate_quiz_async('Python', 'easy', 3)
+
+        started = time.monotonic()
+        quiz_data = asyncio.run(generate())
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertFalse(quiz_data.is_fallback)
+        self.assertEqual(guard.timeouts, 1)
+
+    @override_settings(QUIZ_STREAMING_GENERATION=False, QUIZ_GENERATION_CACHE_BACKEND='none')
+    def test_open_circuit_serves_bank_quiz(self):
+        question_bank.add_questions('Python', 'easy', make_quiz_data(num_questions=3).questions)
+        guard = self.make_guard(threshold=1)
+        guard.breaker.record_failure()
+        quiz = create_pending_quiz()
+        model = FaultInjectingModel()
+
+        with mock.patch.object(ai_quiz_service, 'model', model, create=True), \
+                mock.patch.object(ai_quiz_service, 'guard', guard):
+            run_generation_job(quiz.pk)
+
+        quiz.refresh_from_db()
+        self.assertEqual(quiz.status, GenerationStatus.READY)
+        self.assertEqual(model.calls, 0)
+        self.assertEqual(list(quiz.questions.values_list('question', flat=True)),
+                         [q.question for q in make_quiz_data(num_questions=3).questions])
+        self.assertEqual(question_bank.available('Python', 'easy'), 0)
+
+    def test_status_endpoint(self):
+        response = self.client.get(reverse('quiz:llm_status'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(response.json()['circuit']['state'], ('closed', 'open', 'half_open'))
+
+
+class LLMRouterTests(TestCase):
+    """Tests for the pluggable LLM backends and the latency-aware router"""
+
+    def serve(self, model):
+        server = serve_openai_compatible(model)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        host, port = server.server_address[:2]
+        return OpenAICompatibleModel(f'http://{host}:{port}/v1', 'fake', timeout=5)
+
+    def test_routes_to_fastest_healthy_backend(self):
+        router = LLMRouter({'slow': FakeGenerativeModel(), 'fast': FakeGenerativeModel(),
+                            'flaky': FakeGenerativeModel()}, min_samples=2)
+        # Unmeasured backends are tried first
+        self.assertEqual(router.ranked('full'), ['slow', 'fast', 'flaky'])
+
+        for _ in range(3):
+            router.stats['slow'].record('full', 2.0)
+            router.stats['fast'].record('full', 0.5)
+            router.stats['flaky'].record('full', 0.1)
+            router.stats['flaky'].record_error()
+            router.stats['flaky'].record_error()
+        self.assertEqual(router.ranked('full'), ['fast', 'slow', 'flaky'])
+
+        prompt = ai_quiz_service.generate_quiz_prompt('Python', 'easy', 2)
+        router.generate_content(prompt)
+        self.assertEqual([router.backends[name].calls for name in ('slow', 'fast', 'flaky')], [0, 1, 0])
+        self.assertEqual(router.snapshot()['fast']['rank']['full'], 0)
+
+    def test_hedged_call_returns_first_answer(self):
+        metrics.registry.reset()
+        slow, fast = FakeGenerativeModel(latency=1.0), FakeGenerativeModel()
+        router = LLMRouter({'slow': slow, 'fast': fast}, hedge_delay=0.05)
+        prompt = ai_quiz_service.generate_quiz_prompt('Python', 'easy', 2)
+
+        started = time.monotonic()
+        response = router.generate_content(prompt)
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(len(parse_quiz_response(response.text, 'Python', 'easy').questions), 2)
+        self.assertEqual((slow.calls, fast.calls), (1, 1))
+        self.assertEqual(metrics.LLM_HEDGES.value(winner='hedge'), 1)
+
+    def test_hedge_is_skipped_without_a_free_call_slot(self):
+        metrics.registry.reset()
+        slow, fast = FakeGenerativeModel(latency=0.3), FakeGenerativeModel()
+        limiter = ConcurrencyLimiter(max_concurrent=1)
+        router = LLMRouter({'slow': slow, 'fast': fast}, hedge_delay=0.05, limiter=limiter)
+        prompt = ai_quiz_service.generate_quiz_prompt('Python', 'easy', 2)
+
+        # The caller's slot is the only one
+        with limiter.slot():
+            router.generate_content(prompt)
+
+        self.assertEqual((slow.calls, fast.calls), (1, 0))
+        self.assertEqual(metrics.LLM_HEDGES_SKIPPED.value(), 1)
+        self.assertEqual(limiter.snapshot()['peak'], 1)
+
+    def test_losing_attempt_holds_a_call_slot_until_it_ends(self):
+        slow, fast = FakeGenerativeModel(latency=0.3), FakeGenerativeModel()
+        limiter = ConcurrencyLimiter(max_concurrent=2)
+        router = LLMRouter({'slow': slow, 'fast': fast}, hedge_delay=0.05, limiter=limiter)
+        prompt = ai_quiz_service.generate_quiz_prompt('Python', 'easy', 2)
+
+        with limiter.slot():
+            router.generate_content(prompt)
+        self.assertEqual(fast.calls, 1)
+        # The call has returned, but the slow attempt is still running on the shared executor
+        self.assertEqual(limiter.in_use, 1)
+        self.assertTrue(any(thread.name.startswith('llm-attempt') for thread in threading.enumerate()))
+
+        deadline = time.monotonic() + 2
+        while limiter.in_use and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(limiter.in_use, 0)
+        self.assertEqual(limiter.snapshot()['peak'], 2)
+
+    def test_async_hedged_stream_cancels_loser(self):
+        slow, fast = FakeGenerativeModel(latency=1.0), FakeGenerativeModel()
+        router = LLMRouter({'slow': slow, 'fast': fast}, hedge_delay=0.05)
+        prompt = ai_quiz_service.generate_quiz_prompt('Python', 'easy', 2)
+
+        async def generate():
+            return ''.join([chunk.text async for chunk in await router.generate_content_async(prompt, stream=True)])
+
+        started = time.monotonic()
+        text = asyncio.run(generate())
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(text, FakeGenerativeModel().build_response(prompt))
+        self.assertEqual(router.stats['slow'].snapshot()['samples'], 0)
+
+    def test_fails_over_to_next_backend(self):
+        broken = FaultInjectingModel(default='error')
+        router = LLMRouter({'broken': broken, 'offline': FakeGenerativeModel()}, hedge=False)
+
+        with mock.patch.object(ai_quiz_service, 'model', router, create=True):
+            quiz_data = ai_quiz_service.generate_quiz('Python', 'easy', 3)
+
+        self.assertFalse(quiz_data.is_fallback)
+        self.assertEqual(broken.calls, 1)
+        self.assertEqual(router.stats['broken'].snapshot()['error_rate'], 0.0)  # under min_samples
+        self.assertEqual(list(router.stats['broken'].errors), [True])
+
+    def test_openai_compatible_backend(self):
+        model = self.serve(FakeGenerativeModel(chunk_size=16))
+
+        with mock.patch.object(ai_quiz_service, 'model', model, create=True):
+            quiz_data = ai_quiz_service.generate_quiz('Python', 'easy', 3)
+        self.assertFalse(quiz_data.is_fallback)
+        self.assertEqual(len(quiz_data.questions), 3)
+
+        prompt = ai_quiz_service.generate_quiz_prompt('Python', 'easy', 2)
+        chunks = list(model.generate_content(prompt, stream=True))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunk.text for chunk in chunks), FakeGenerativeModel().build_response(prompt))
+
+        async def stream():
+            return ''.join([chunk.text async for chunk in await model.generate_content_async(prompt, stream=True)])
+        self.assertEqual(asyncio.run(stream()), FakeGenerativeModel().build_response(prompt))
+
+    def test_openai_compatible_errors_are_transient(self):
+        model = self.serve(FaultInjectingModel(default='error'))
+        with self.assertRaises(ConnectionError):
+            model.generate_content('Create a quiz')
+
+    def test_configured_backends_build_router(self):
+        model = self.serve(FakeGenerativeModel())
+        with override_settings(QUIZ_FAKE_LLM=False, QUIZ_LLM_BACKENDS=['openai', 'offline'],
+                               QUIZ_OPENAI_BASE_URL=model.url.rsplit('/chat/completions', 1)[0]):
+            router = AIQuizService().create_model()
+            self.assertIsInstance(router, LLMRouter)
+            self.assertEqual(list(router.backends), ['openai', 'offline'])
+
+            with override_settings(QUIZ_LLM_BACKENDS=['offline']):
+                self.assertIsInstance(AIQuizService().create_model(), FakeGenerativeModel)
+
+        with mock.patch.object(ai_quiz_service, 'model', router, create=True):
+            response = self.client.get(reverse('quiz:llm_status'))
+        self.assertEqual(set(response.json()['backends']), {'openai', 'offline'})
+
+
+class MetricsTests(TestCase):
+    """Tests for hot-path instrumentation and the /metrics endpoint"""
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def generate(self, model, num_questions=3):
+        with mock.patch.object(ai_quiz_service, 'model', model, create=True):
+            return ai_quiz_service.generate_quiz('Python', 'easy', num_questions)
+
+    def test_generation_records_llm_call_parse_and_result(self):
+        self.generate(FakeGenerativeModel())
+        self.generate(FakeGenerativeModel(response_text='no quiz here'))
+
+        self.assertEqual(metrics.LLM_REQUEST_SECONDS.count(mode='sync', outcome='ok'), 2)
+        self.assertEqual(metrics.LLM_PROMPT_CHARS.count(mode='sync'), 2)
+        self.assertEqual(metrics.PARSE_SECONDS.count(mode='full'), 2)
+        self.assertEqual(metrics.GENERATIONS.value(result='ai'), 1)
+        self.assertEqual(metrics.GENERATIONS.value(result='fallback'), 1)
+
+    def test_view_latency_and_query_count(self):
+        quiz = quiz_repository.create_from_pydantic(make_quiz_data())
+        self.client.get(reverse('quiz:quiz_status', args=[quiz.session_id]))
+
+        self.assertEqual(metrics.VIEW_SECONDS.count(view='quiz:quiz_status', method='GET', status=200), 1)
+        self.assertIn('quiz_view_queries_sum{view="quiz:quiz_status"} 1\n', metrics.registry.render())
+
+    @override_settings(QUIZ_METRICS_ENDPOINT=True)
+    def test_metrics_endpoint_renders_prometheus_text(self):
+        self.generate(FakeGenerativeModel())
+        response = self.client.get(reverse('quiz:metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE quiz_llm_request_seconds histogram', body)
+        self.assertIn('quiz_llm_request_seconds_bucket{mode="sync",outcome="ok",le="+Inf"} 1', body)
+        self.assertIn('quiz_generations_total{result="ai"} 1', body)
+        self.assertIn('quiz_llm_circuit_state{state="closed"}', body)
+
+    def test_structured_log_lines(self):
+        with self.assertLogs('quiz.metrics', 'INFO') as logs:
+            self.generate(FakeGenerativeModel())
+
+        events = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertEqual([event['event'] for event in events], ['llm_call', 'generation'])
+        self.assertEqual(events[1]['result'], 'ai')
+
+    @override_settings(QUIZ_METRICS_ENABLED=False)
+    def test_disabled_metrics_record_nothing(self):
+        self.generate(FakeGenerativeModel())
+
+        self.assertEqual(metrics.LLM_REQUEST_SECONDS.count(mode='sync', outcome='ok'), 0)
+        self.assertEqual(self.client.get(reverse('quiz:metrics')).status_code, 404)
+
+    def test_metrics_endpoint_is_off_by_default(self):
+        self.generate(FakeGenerativeModel())
+
+        self.assertEqual(metrics.GENERATIONS.value(result='ai'), 1)
+        self.assertEqual(self.client.get(reverse('quiz:metrics')).status_code, 404)
+
+
+class LazyAIServiceTests(TestCase):
+    """Tests for deferred AI client setup"""
+
+    def test_model_is_set_up_once_on_first_use(self):
+        service = AIQuizService()
+        self.assertNotIn('model', service.__dict__)
+
+        with mock.patch.object(AIQuizService, 'create_model', return_value=FakeGenerativeModel()) as create:
+            self.assertFalse(service.generate_quiz('Python', 'easy', 3).is_fallback)
+            service.generate_quiz('Python', 'easy', 3)
+        self.assertEqual(create.call_count, 1)
+
+    def test_warm_up_sets_up_the_model(self):
+        service = AIQuizService()
+        model = FakeGenerativeModel()
+        with mock.patch.object(AIQuizService, 'create_model', return_value=model):
+            self.assertIs(service.warm_up(), model)
+        self.assertIs(service.model, model)
+
+    @override_settings(QUIZ_FAKE_LLM=True, QUIZ_FAKE_LLM_LATENCY=0)
+    def test_fake_llm_setting(self):
+        self.assertIsInstance(AIQuizService().model, FakeGenerativeModel)
+
+    def test_missing_attributes_still_raise(self):
+        with self.assertRaises(AttributeError):
+            AIQuizService().no_such_attribute
+
+
+class StatusUpdatesTests(TestCase):
+    """Tests for conditional status polling and the status event stream"""
+
+    def status(self, quiz, **headers):
+        return self.client.get(reverse('quiz:quiz_status', args=[quiz.session_id]), **headers)
+
+    def events(self, quiz, **headers):
+        response = self.client.get(reverse('quiz:quiz_events', args=[quiz.session_id]), **headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return b''.join(response.streaming_content).decode()
+
+    def test_unchanged_status_gets_304(self):
+        quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=3))
+        etag = self.status(quiz)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.status(quiz, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.client.post(reverse('quiz:submit_answer', args=[quiz.session_id]), {'selected_option': 0})
+        response = self.status(quiz, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['current_question_index'], 1)
+
+    def test_generation_progress_changes_etag(self):
+        quiz = create_pending_quiz()
+        etag = self.status(quiz)['ETag']
+        Quiz.objects.filter(pk=quiz.pk).update(status=GenerationStatus.GENERATING)
+        quiz_repository.mark_ready(quiz.pk, 3)
+        self.assertNotEqual(self.status(quiz, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_statistics_repair_changes_etag(self):
+        quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=3))
+        self.client.post(reverse('quiz:submit_answer', args=[quiz.session_id]), {'selected_option': 0})
+        QuizStatistics.objects.filter(session__quiz=quiz).update(correct_answers=0, incorrect_answers=1)
+        etag = self.status(quiz)['ETag']
+
+        call_command('recompute_statistics', stdout=StringIO())
+        response = self.status(quiz, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['statistics']['correct'], 1)
+
+    @override_settings(QUIZ_STATUS_STREAM_MAX_SECONDS=0)
+    def test_stream_reports_generation_progress(self):
+        quiz = create_pending_quiz()
+        quiz_repository.add_questions(quiz, make_quiz_data(num_questions=1))
+        body = self.events(quiz)
+
+        self.assertIn('event: status', body)
+        data = json.loads(body.split('data: ')[1].split('\n')[0])
+        self.assertEqual(data['status'], GenerationStatus.PENDING)
+        self.assertEqual(data['questions_generated'], 1)
+        self.assertNotIn('event: end', body)
+
+        # A reconnecting client that already saw this status gets no new event
+        event_id = body.split('id: ')[1].split('\n')[0]
+        self.assertNotIn('event: status', self.events(quiz, HTTP_LAST_EVENT_ID=event_id))
+
+    @override_settings(QUIZ_STATUS_STREAM_INTERVAL=0.01, QUIZ_STATUS_STREAM_MAX_SECONDS=5)
+    def test_stream_ends_when_quiz_completes(self):
+        quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=1))
+        session = QuizSession.objects.get(quiz=quiz)
+        quiz_repository.record_answer(session, quiz.questions.get(), 0, completes=True)
+
+        body = self.events(quiz)
+        self.assertEqual(body.count('event: status'), 1)
+        self.assertIn('event: end', body)
+        self.assertIn('"is_completed": true', body)
+
+    @override_settings(QUIZ_STATUS_STREAM_MAX_SECONDS=0)
+    async def test_async_stream(self):
+        quiz = await sync_to_async(create_pending_quiz)()
+        request = AsyncRequestFactory().get('/')
+        response = await async_views.quiz_events(request, session_id=quiz.session_id)
+        body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        self.assertIn('"questions_generated": 0', body)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                        'LOCATION': tempfile.mkdtemp(prefix='quiz-results-cache-')}})
+class ResultsCacheTests(TestCase):
+    """Tests for the versioned cache of rendered results"""
+
+    def setUp(self):
+        cache.clear()
+        self.quiz = quiz_repository.create_from_pydantic(make_quiz_data(num_questions=2))
+        self.results_url = reverse('quiz:quiz_results', args=[self.quiz.session_id])
+
+    def complete(self, selected_option=0):
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('quiz:submit_answer', args=[self.quiz.session_id]),
+                                 {'selected_option': selected_option})
+
+    def test_repeat_view_is_served_from_cache(self):
+        self.complete()
+        first = self.client.get(self.results_url)
+        self.assertContains(first, 'Question 1 about Python?')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.results_url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertIn('Last-Modified', second)
+
+    def test_conditional_request_gets_304(self):
+        self.complete()
+        etag = self.client.get(self.results_url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.results_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_restart_and_new_answers_invalidate(self):
+        self.complete(selected_option=0)
+        first = self.client.get(self.results_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('quiz:restart_quiz', args=[self.quiz.session_id]))
+        self.assertRedirects(self.client.get(self.results_url),
+                             reverse('quiz:quiz_detail', args=[self.quiz.session_id]),
+                             fetch_redirect_response=False)
+
+        # Question 2's correct answer is B, so answering B everywhere changes the score
+        self.complete(selected_option=1)
+        second = self.client.get(self.results_url)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertNotEqual(second.content, first.content)
+        response = self.client.get(self.results_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_api_answers_invalidate(self):
+        version = ResultsCache(60).version(self.quiz.session_id)
+        data = self.client.get(reverse('quiz:quiz_api', args=[self.quiz.session_id])).json()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('quiz:quiz_answers_api', args=[self.quiz.session_id]),
+                                        json.dumps({'token': data['token'], 'question_id': data['questions'][0]['id'],
+                                                    'selected_option': 0}),
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(ResultsCache(60).version(self.quiz.session_id), version)
+
+    def test_incomplete_quiz_is_not_cached(self):
+        self.client.get(self.results_url)
+        self.complete()
+        self.assertContains(self.client.get(self.results_url), 'Question 2 about Python?')
+
+    def test_process_local_cache_is_not_used(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertIsNone(get_results_cache())
+
+    @override_settings(QUIZ_RESULTS_CACHE_TTL=0)
+    def test_disabled_cache_renders_every_time(self):
+        self.complete()
+        response = self.client.get(self.results_url)
+        self.assertContains(response, 'Question 1 about Python?')
+        self.assertNotIn('ETag', response)
+        with self.assertNumQueries(2):
+            self.client.get(self.results_url)
+
+
+class ResponseParserTests(TestCase):
+    """Corpus tests for the model response parser"""
+
+    def test_corpus_salvage(self):
+        for num_questions in (3, 10, 20):
+            for name, text, expected in build_response_corpus(num_questions):
+                with self.subTest(name=name, num_questions=num_questions):
+                    result = parse_quiz_response(text, 'Python', 'medium')
+                    self.assertEqual(len(result.questions), expected)
+
+    def test_extract_json_is_brace_balanced_and_string_aware(self):
+        text = 'Options [A] to [D]: {"q": "a } b", "n": {"x": [1]}} and {"other": 1}'
+        self.assertEqual(extract_json(text), '{"q": "a } b", "n": {"x": [1]}}')
+
+    def test_repair_json_leaves_commas_inside_strings(self):
+        self.assertEqual(repair_json('{"a": "x, }", "b": [1, 2, ], }'), '{"a": "x, }", "b": [1, 2 ] }')
+
+    def test_compact_format_maps_to_full_questions(self):
+        questions = FakeGenerativeModel.build_questions('Python', 'easy', 3)
+        # Letter answers are accepted as in the verbose format
+        compact = [FakeGenerativeModel.compact_question(dict(q, correct_answer='ABCD'[q['correct_answer']]))
+                   for q in questions]
+        compact[2]['o'] = compact[2]['o'][:3]
+        text = json.dumps(compact, separators=(',', ':'))
+
+        result = parse_quiz_response(text, 'Python', 'easy')
+        self.assertEqual(result.invalid, 1)
+        self.assertEqual(result.questions, [QuizQuestionPydantic(**q) for q in questions[:2]])
+
+        parser = IncrementalQuestionParser('easy')
+        streamed = [q for start in range(0, len(text), 7) for q in parser.feed(text[start:start + 7])]
+        self.assertEqual(streamed, result.questions)
+
+    def test_compact_format_generates_the_same_quiz_in_fewer_tokens(self):
+        quizzes, usages = {}, {}
+        for response_format in ('verbose', 'compact'):
+            with override_settings(QUIZ_RESPONSE_FORMAT=response_format, QUIZ_GENERATION_CHUNK_SIZE=5,
+                                   QUIZ_GENERATION_CHUNK_THRESHOLD=5), \
+                    mock.patch.object(ai_quiz_service, 'model', FakeGenerativeModel(), create=True), \
+                    metrics.generation_usage() as usage:
+                quizzes[response_format] = ai_quiz_service.generate_quiz('Python', 'medium', 10)
+            usages[response_format] = usage
+
+        # Batches are merged in the order they finish
+        self.assertEqual(*[sorted(q.model_dump_json() for q in quizzes[f].questions) for f in ('compact', 'verbose')])
+        # Two batches of five, counted from the chunk threads
+        self.assertEqual(usages['compact'].calls, 2)
+        self.assertLess(usages['compact'].prompt_chars, usages['verbose'].prompt_chars * 0.7)
+        self.assertLess(usages['compact'].response_tokens, usages['verbose'].response_tokens * 0.6)
+
+    def test_generation_usage_is_recorded(self):
+        metrics.registry.reset()
+        model = FakeGenerativeModel()
+        with mock.patch.object(ai_quiz_service, 'model', model, create=True), \
+                self.assertLogs('quiz.metrics', level='INFO') as logs:
+            asyncio.run(ai_quiz_service.generate_quiz_async('Python', 'easy', 3))
+
+        self.assertEqual(metrics.GENERATION_RESPONSE_TOKENS.count(format='verbose'), 1)
+        event = [json.loads(line.split(':', 2)[2]) for line in logs.output if '"generation"' in line][0]
+        prompt = ai_quiz_service.generate_quiz_prompt('Python', 'easy', 3)
+        self.assertEqual((event['model_calls'], event['prompt_chars'], event['response_chars']),
+                         (1, len(prompt), len(model.build_response(prompt))))
+        self.assertEqual(event['response_tokens'], metrics.estimate_tokens(event['response_chars']))
+
+    def test_generate_quiz_keeps_valid_questions_from_messy_output(self):
+        text = dict((name, text) for name, text, _ in build_response_corpus(5))['trailing commas']
+        with override_settings(QUIZ_GENERATION_CHUNK_SIZE=0), \
+                mock.patch.object(ai_quiz_service, 'model', FakeGenerativeModel(response_text=text), create=True):
+            quiz_data = ai_quiz_service.generate_quiz('Python', 'medium', 5)
+
+        self.assertFalse(quiz_data.is_fallback)
+        self.assertEqual(len(quiz_data.questions), 5)
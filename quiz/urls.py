@@ -1,17 +1,31 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'quiz'
 
+# ASGI deployments serve the hot request paths with coroutine views
+if getattr(settings, 'QUIZ_ASYNC_VIEWS', False):
+    from . import async_views as request_views
+else:
+    request_views = views
+
 urlpatterns = [
     # Main pages
     path('', views.index, name='index'),
-    path('generate/', views.generate_quiz, name='generate_quiz'),
-    path('quiz/<str:session_id>/', views.quiz_detail, name='quiz_detail'),
-    path('quiz/<str:session_id>/submit/', views.submit_answer, name='submit_answer'),
+    path('generate/', request_views.generate_quiz, name='generate_quiz'),
+    path('quiz/<str:session_id>/', request_views.quiz_detail, name='quiz_detail'),
+    path('quiz/<str:session_id>/submit/', request_views.submit_answer, name='submit_answer'),
     path('quiz/<str:session_id>/results/', views.quiz_results, name='quiz_results'),
     path('quiz/<str:session_id>/restart/', views.restart_quiz, name='restart_quiz'),
     
     # API endpoints
-    path('api/quiz/<str:session_id>/status/', views.quiz_status, name='quiz_status'),
+    path('api/quiz/<str:session_id>/', views.quiz_api, name='quiz_api'),
+    path('api/quiz/<str:session_id>/answers/', views.quiz_answers_api, name='quiz_answers_api'),
+    path('api/quiz/<str:session_id>/status/', request_views.quiz_status, name='quiz_status'),
+    path('api/quiz/<str:session_id>/events/', request_views.quiz_events, name='quiz_events'),
+    path('api/quiz/<str:session_id>/generation/', request_views.generation_status, name='generation_status'),
+    path('api/generation-cache/stats/', views.generation_cache_stats, name='generation_cache_stats'),
+    path('api/llm/status/', views.llm_status, name='llm_status'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
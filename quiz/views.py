@@ -1,14 +1,119 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.conf import settings
+from django.core import signing
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.safestring import mark_safe
+import hashlib
 import json
-import uuid
+import time
 
-from .models import Quiz, QuizQuestion, QuizSession, QuizAnswer, QuizStatistics
+from .models import Quiz, GenerationStatus
+from . import metrics
+from .admission import Throttled, admit_generation, check_rate
 from .ai_service import ai_quiz_service
+from .jobs import enqueue_generation, expire_stale_generation, run_generation_job
+from .llm_backends import LLMRouter
+from .repository import quiz_repository
+from .question_bank import question_bank
+from .generation_cache import get_generation_cache
+from .results_cache import get_results_cache, invalidate_results
+from .singleflight import generation_flight, async_generation_flight
+
+
+def read_generation_form(data):
+    """Validated (topic, difficulty, num_questions) from the quiz generation form"""
+    topic = data.get('topic', '').strip()
+    difficulty = data.get('difficulty', 'medium')
+    num_questions = int(data.get('num_questions', 10))
+    
+    # Validate inputs
+    if difficulty not in ['easy', 'medium', 'hard']:
+        difficulty = 'medium'
+    
+    if num_questions < 1 or num_questions > 20:
+        num_questions = 10
+    
+    return topic, difficulty, num_questions
+
+
+def start_quiz(topic, difficulty, num_questions, enqueue=True, charge=None):
+    """Create a quiz from the question bank, or a pending one awaiting generation
+
+    Returns (quiz, from_bank). With enqueue the generation job is scheduled on the
+    background executor once the transaction commits. charge() (the client's rate limit) is
+    called only when the quiz needs the model, not when the bank or the generation cache
+    serves it. Raises Throttled when the quiz would need generating and the client is over
+    its rate or admission control is shedding load.
+    """
+    with transaction.atomic():
+        # Popular topics are assembled straight from the question bank when it has enough questions
+        bank_quiz = None
+        if getattr(settings, 'QUIZ_BANK_ENABLED', True):
+            bank_quiz = question_bank.draw(topic, difficulty, num_questions)
+        
+        if bank_quiz:
+            return quiz_repository.create_from_pydantic(bank_quiz, topic=topic), True
+        
+        # Otherwise the quiz is generated (or copied from the generation cache): charge the
+        # client for a generation, and refuse it while too many others are waiting for the model
+        if charge:
+            cache = get_generation_cache()
+            if not (cache and cache.contains(topic, difficulty, num_questions)):
+                charge()
+        admit_generation()
+        
+        # Create a pending quiz; questions are generated by a background job
+        quiz = quiz_repository.create_pending(topic, difficulty, num_questions)
+        if enqueue:
+            enqueue_generation(quiz)
+        return quiz, False
+
+
+def throttled_response(request, throttled):
+    """The home page with status 429 and Retry-After, for a refused generation request"""
+    if throttled.reason == 'rate':
+        messages.error(request, f'You are generating quizzes too quickly. '
+                                f'Please try again in {throttled.retry_after_header} seconds.')
+    else:
+        messages.error(request, 'The quiz generator is busy. Please try again in a few seconds.')
+    response = render(request, 'quiz/index.html', status=429)
+    response['Retry-After'] = throttled.retry_after_header
+    return response
+
+
+def get_quiz_or_404(session_id, with_statistics=False):
+    """Quiz with its session (and statistics) prefetched in a single joined query"""
+    related = 'session__statistics' if with_statistics else 'session'
+    quiz = get_object_or_404(Quiz.objects.select_related(related), session_id=session_id)
+    expire_stale_generation(quiz)
+    return quiz
+
+
+def render_generating(request, quiz, waiting_for):
+    """The page shown while questions are still being generated (or generation failed)
+
+    It follows progress over the status event stream (or long-polls) only with QUIZ_ASYNC_VIEWS:
+    under WSGI a held request ties up a worker, so the page polls every
+    QUIZ_GENERATION_POLL_INTERVAL seconds instead.
+    """
+    return render(request, 'quiz/generating.html', {
+        'quiz': quiz,
+        'waiting_for': waiting_for,
+        'live_updates': getattr(settings, 'QUIZ_ASYNC_VIEWS', False),
+        'poll_interval_ms': int(getattr(settings, 'QUIZ_GENERATION_POLL_INTERVAL', 2) * 1000),
+    })
+
+
+def get_current_question(quiz, index):
+    """The question at position index, or None once the (so far generated) questions run out"""
+    return quiz.questions.filter(order=index).first()
 
 
 def index(request):
@@ -20,61 +125,28 @@ def index(request):
 def generate_quiz(request):
     """Generate a new quiz using AI"""
     try:
-        # Get form data
-        topic = request.POST.get('topic', '').strip()
-        difficulty = request.POST.get('difficulty', 'medium')
-        num_questions = int(request.POST.get('num_questions', 10))
+        topic, difficulty, num_questions = read_generation_form(request.POST)
         
         if not topic:
             messages.error(request, 'Topic is required')
             return redirect('quiz:index')
         
-        # Validate inputs
-        if difficulty not in ['easy', 'medium', 'hard']:
-            difficulty = 'medium'
-        
-        if num_questions < 1 or num_questions > 20:
-            num_questions = 10
-        
-        # Generate quiz using AI
-        quiz_data = ai_quiz_service.generate_quiz(topic, difficulty, num_questions)
-        
-        # Create quiz in database
-        with transaction.atomic():
-            # Create the quiz
-            quiz = Quiz.objects.create(
-                session_id=str(uuid.uuid4()),
-                topic=quiz_data.topic,
-                difficulty=quiz_data.difficulty,
-                total_questions=len(quiz_data.questions)
-            )
-            
-            # Create questions
-            for idx, question_data in enumerate(quiz_data.questions):
-                QuizQuestion.objects.create(
-                    quiz=quiz,
-                    question=question_data.question,
-                    option_a=question_data.option_a,
-                    option_b=question_data.option_b,
-                    option_c=question_data.option_c,
-                    option_d=question_data.option_d,
-                    correct_answer=question_data.correct_answer,
-                    explanation=question_data.explanation,
-                    difficulty=question_data.difficulty,
-                    order=idx
-                )
-            
-            # Create quiz session
-            quiz_session = QuizSession.objects.create(quiz=quiz)
-            
-            # Create statistics
-            QuizStatistics.objects.create(session=quiz_session)
+        # Charged by the number of questions asked for, unless the bank or cache serves them
+        async_generation = getattr(settings, 'QUIZ_ASYNC_GENERATION', True)
+        quiz, from_bank = start_quiz(topic, difficulty, num_questions, enqueue=async_generation,
+                                     charge=lambda: check_rate(request, num_questions))
+        
+        if not from_bank and not async_generation:
+            # Legacy mode: generate inside the request
+            run_generation_job(quiz.pk)
         
         # Store quiz session ID in Django session
         request.session['quiz_session_id'] = quiz.session_id
         
         return redirect('quiz:quiz_detail', session_id=quiz.session_id)
         
+    except Throttled as e:
+        return throttled_response(request, e)
     except Exception as e:
         messages.error(request, f'Error generating quiz: {str(e)}')
         return redirect('quiz:index')
@@ -83,28 +155,35 @@ def generate_quiz(request):
 def quiz_detail(request, session_id):
     """Display quiz questions"""
     try:
-        quiz = get_object_or_404(Quiz, session_id=session_id)
-        quiz_session = get_object_or_404(QuizSession, quiz=quiz)
+        quiz = get_quiz_or_404(session_id)
+        quiz_session = quiz.session
         
-        # Get current question
-        questions = quiz.questions.all()
+        # Fetch only the current question
         current_index = quiz_session.current_question_index
+        current_question = get_current_question(quiz, current_index)
         
-        if current_index >= len(questions):
+        if current_question is None:
+            if not quiz.is_ready:
+                # Questions are still being generated (or generation failed)
+                return render_generating(request, quiz, current_index)
+            
+            if not quiz_session.is_completed:
+                # The last question was answered while generation was still finishing
+                quiz_session.is_completed = True
+                quiz_session.save(update_fields=['is_completed', 'last_activity'])
+            
             # Quiz completed, redirect to results
             return redirect('quiz:quiz_results', session_id=session_id)
         
-        current_question = questions[current_index]
-        
-        # Calculate progress
-        progress_percentage = ((current_index) / len(questions)) * 100
+        # Calculate progress (questions may still be streaming in, so use the quiz total)
+        progress_percentage = ((current_index) / quiz.total_questions) * 100
         
         context = {
             'quiz': quiz,
             'quiz_session': quiz_session,
             'current_question': current_question,
             'question_number': current_index + 1,
-            'total_questions': len(questions),
+            'total_questions': quiz.total_questions,
             'progress_percentage': progress_percentage,
             'options': current_question.options,
         }
@@ -120,8 +199,8 @@ def quiz_detail(request, session_id):
 def submit_answer(request, session_id):
     """Submit an answer for a quiz question"""
     try:
-        quiz = get_object_or_404(Quiz, session_id=session_id)
-        quiz_session = get_object_or_404(QuizSession, quiz=quiz)
+        quiz = get_quiz_or_404(session_id)
+        quiz_session = quiz.session
         
         # Get submitted answer
         selected_option = request.POST.get('selected_option')
@@ -132,52 +211,23 @@ def submit_answer(request, session_id):
         selected_option = int(selected_option)
         
         # Get current question
-        questions = quiz.questions.all()
         current_index = quiz_session.current_question_index
+        current_question = get_current_question(quiz, current_index)
         
-        if current_index >= len(questions):
+        if current_question is None:
+            if not quiz.is_ready:
+                return redirect('quiz:quiz_detail', session_id=session_id)
             return redirect('quiz:quiz_results', session_id=session_id)
         
-        current_question = questions[current_index]
-        
-        # Check if already answered
-        existing_answer = QuizAnswer.objects.filter(
-            session=quiz_session, 
-            question=current_question
-        ).first()
-        
-        if existing_answer:
+        # Save the answer; score and statistics are incremented in the same transaction.
+        # Once generation is done total_questions is the stored question count.
+        completes = quiz.is_ready and current_index + 1 >= quiz.total_questions
+        try:
+            quiz_repository.record_answer(quiz_session, current_question, selected_option, completes=completes)
+            invalidate_results(session_id)
+        except IntegrityError:
             # Already answered, move to next question
-            quiz_session.current_question_index += 1
-            quiz_session.save()
-            return redirect('quiz:quiz_detail', session_id=session_id)
-        
-        # Calculate score
-        is_correct = selected_option == current_question.correct_answer
-        score_change = 1 if is_correct else 0
-        
-        # Save answer
-        QuizAnswer.objects.create(
-            session=quiz_session,
-            question=current_question,
-            selected_option=selected_option,
-            is_correct=is_correct,
-            score_change=score_change
-        )
-        
-        # Update session
-        quiz_session.current_score += score_change
-        quiz_session.current_question_index += 1
-        
-        # Check if quiz is completed
-        if quiz_session.current_question_index >= len(questions):
-            quiz_session.is_completed = True
-        
-        quiz_session.save()
-        
-        # Update statistics
-        stats = quiz_session.statistics
-        stats.update_statistics()
+            quiz_repository.skip_question(quiz_session)
         
         return redirect('quiz:quiz_detail', session_id=session_id)
         
@@ -187,44 +237,65 @@ def submit_answer(request, session_id):
 
 
 def quiz_results(request, session_id):
-    """Display quiz results"""
+    """Display quiz results
+
+    The rendered results are cached per results version (see results_cache), so repeat views
+    run no queries and clients revalidating with If-None-Match/If-Modified-Since get a 304.
+    """
     try:
-        quiz = get_object_or_404(Quiz, session_id=session_id)
-        quiz_session = get_object_or_404(QuizSession, quiz=quiz)
-        
-        if not quiz_session.is_completed:
-            return redirect('quiz:quiz_detail', session_id=session_id)
-        
-        # Get all answers with questions
-        answers = quiz_session.answers.select_related('question').order_by('question__order')
-        
-        # Get statistics
-        stats = quiz_session.statistics
-        
-        # Prepare detailed results
-        detailed_results = []
-        for answer in answers:
-            question = answer.question
-            detailed_results.append({
-                'question': question.question,
-                'options': question.options,
-                'selected_option': answer.selected_option,
-                'correct_answer': question.correct_answer,
-                'is_correct': answer.is_correct,
-                'explanation': question.explanation,
-                'selected_text': question.options[answer.selected_option],
-                'correct_text': question.options[question.correct_answer],
-            })
-        
-        context = {
-            'quiz': quiz,
-            'quiz_session': quiz_session,
-            'stats': stats,
-            'detailed_results': detailed_results,
-        }
-        
-        return render(request, 'quiz/results.html', context)
-        
+        results_cache = get_results_cache()
+        version = results_cache.version(session_id) if results_cache else None
+        entry = results_cache.get(session_id, version) if results_cache else None
+
+        if entry is None:
+            quiz = get_quiz_or_404(session_id, with_statistics=True)
+            quiz_session = quiz.session
+
+            if not quiz_session.is_completed:
+                return redirect('quiz:quiz_detail', session_id=session_id)
+
+            # Get all answers with questions
+            answers = quiz_session.answers.select_related('question').order_by('question__order')
+
+            # Get statistics
+            stats = quiz_session.statistics
+
+            # Prepare detailed results
+            detailed_results = []
+            for answer in answers:
+                question = answer.question
+                options = question.options
+                detailed_results.append({
+                    'question': question.question,
+                    'options': options,
+                    'selected_option': answer.selected_option,
+                    'correct_answer': question.correct_answer,
+                    'is_correct': answer.is_correct,
+                    'explanation': question.explanation,
+                    'selected_text': options[answer.selected_option],
+                    'correct_text': options[question.correct_answer],
+                })
+
+            context = {
+                'quiz': quiz,
+                'quiz_session': quiz_session,
+                'stats': stats,
+                'detailed_results': detailed_results,
+            }
+            html = render_to_string('quiz/results_content.html', context, request)
+            if results_cache is None:
+                return render(request, 'quiz/results.html', {'results_html': mark_safe(html)})
+            entry = results_cache.set(session_id, version, html, quiz_session.last_activity.timestamp())
+
+        response = get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'])
+        if response is None:
+            response = render(request, 'quiz/results.html', {'results_html': mark_safe(entry['html'])})
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        # Browsers must revalidate, since a submit or restart changes the results
+        response['Cache-Control'] = 'no-cache'
+        return response
+
     except Exception as e:
         messages.error(request, f'Error loading results: {str(e)}')
         return redirect('quiz:index')
@@ -233,8 +304,8 @@ def quiz_results(request, session_id):
 def restart_quiz(request, session_id):
     """Restart the quiz from the beginning"""
     try:
-        quiz = get_object_or_404(Quiz, session_id=session_id)
-        quiz_session = get_object_or_404(QuizSession, quiz=quiz)
+        quiz = get_quiz_or_404(session_id, with_statistics=True)
+        quiz_session = quiz.session
         
         # Reset session data
         quiz_session.current_score = 0
@@ -252,6 +323,7 @@ def restart_quiz(request, session_id):
         stats.incorrect_answers = 0
         stats.percentage = 0.0
         stats.save()
+        invalidate_results(session_id)
         
         messages.success(request, 'Quiz restarted successfully!')
         return redirect('quiz:quiz_detail', session_id=session_id)
@@ -261,20 +333,276 @@ def restart_quiz(request, session_id):
         return redirect('quiz:index')
 
 
+def status_payload(quiz):
+    """JSON body of the quiz status endpoint, from a quiz loaded with session__statistics"""
+    quiz_session = quiz.session
+    stats = quiz_session.statistics
+    return {
+        'quiz_id': quiz.session_id,
+        'topic': quiz.topic,
+        'difficulty': quiz.difficulty,
+        'status': quiz.status,
+        'total_questions': quiz.total_questions,
+        'current_question_index': quiz_session.current_question_index,
+        'current_score': quiz_session.current_score,
+        'is_completed': quiz_session.is_completed,
+        'statistics': {
+            'total_answered': stats.total_questions_answered,
+            'correct': stats.correct_answers,
+            'incorrect': stats.incorrect_answers,
+            'percentage': stats.percentage,
+        }
+    }
+
+
+def status_etag(quiz, questions_generated=None):
+    """ETag of a quiz's status, from a quiz loaded with session__statistics
+
+    Every answer, skip and restart bumps QuizSession.last_activity; generation progress
+    changes the quiz's status and question counts instead, and statistics repairs
+    (recompute_statistics) change only the counters, so those are part of the tag too.
+    """
+    stats = quiz.session.statistics
+    raw = (f"{quiz.session_id}|{quiz.session.last_activity.isoformat()}|{quiz.status}|"
+           f"{quiz.total_questions}|{questions_generated}|{stats.total_questions_answered}|"
+           f"{stats.correct_answers}|{stats.incorrect_answers}")
+    return '"%s"' % hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def status_response(request, quiz):
+    """Status JSON, or a 304 when the client's If-None-Match is still current"""
+    etag = status_etag(quiz)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(status_payload(quiz))
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
 @require_http_methods(["GET"])
 def quiz_status(request, session_id):
-    """API endpoint to get quiz status (JSON response)"""
+    """API endpoint to get quiz status (JSON response, conditional on If-None-Match)"""
     try:
-        quiz = get_object_or_404(Quiz, session_id=session_id)
-        quiz_session = get_object_or_404(QuizSession, quiz=quiz)
-        stats = quiz_session.statistics
+        quiz = get_quiz_or_404(session_id, with_statistics=True)
+        return status_response(request, quiz)
         
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def stream_settings():
+    """(poll interval, heartbeat interval, maximum lifetime) of status streams, in seconds"""
+    return (getattr(settings, 'QUIZ_STATUS_STREAM_INTERVAL', 1.0),
+            getattr(settings, 'QUIZ_STATUS_STREAM_HEARTBEAT', 15),
+            getattr(settings, 'QUIZ_STATUS_STREAM_MAX_SECONDS', 300))
+
+
+def stream_snapshot(quiz, questions_generated):
+    """(event id, data) of one status event: the status payload plus generation progress"""
+    data = status_payload(quiz)
+    data['questions_generated'] = questions_generated
+    data['error'] = quiz.error_message or None
+    return status_etag(quiz, questions_generated), data
+
+
+def is_generating(quiz):
+    return quiz.status in (GenerationStatus.PENDING, GenerationStatus.GENERATING)
+
+
+def stream_finished(data):
+    """Whether a status can no longer change without the user acting (completed or failed quiz)"""
+    return data['is_completed'] or data['status'] == GenerationStatus.FAILED
+
+
+def sse_event(data, event_id=None, event='status'):
+    """One server-sent event"""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def event_stream_response(events):
+    """text/event-stream response over a (sync or async) iterator of events"""
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def status_events(session_id, last_event_id=None):
+    """Server-sent status events for one quiz, each sent only when the status changed
+
+    Polls the database every QUIZ_STATUS_STREAM_INTERVAL seconds on the server side, so one
+    open stream replaces a client polling loop; the questions are counted only while they
+    are being generated. Ends after a final 'end' event once the quiz is completed or its
+    generation failed, or silently after QUIZ_STATUS_STREAM_MAX_SECONDS (EventSource clients
+    then reconnect with Last-Event-ID and only get an event if something changed).
+    """
+    interval, heartbeat, max_seconds = stream_settings()
+    deadline = time.monotonic() + max_seconds
+    last_sent = time.monotonic()
+    yield f"retry: {int(interval * 2000)}\n\n"
+    
+    queryset = Quiz.objects.select_related('session__statistics')
+    while True:
+        quiz = queryset.filter(session_id=session_id).first()
+        if quiz is None:
+            yield sse_event({'error': 'Quiz not found'}, event='end')
+            return
+        expire_stale_generation(quiz)
+        
+        questions_generated = quiz.questions.count() if is_generating(quiz) else quiz.total_questions
+        event_id, data = stream_snapshot(quiz, questions_generated)
+        if event_id != last_event_id:
+            yield sse_event(data, event_id)
+            last_event_id, last_sent = event_id, time.monotonic()
+        elif time.monotonic() - last_sent >= heartbeat:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        
+        if stream_finished(data):
+            yield sse_event(data, event_id, event='end')
+            return
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(interval)
+
+
+@require_http_methods(["GET"])
+def quiz_events(request, session_id):
+    """Server-sent events stream of quiz status and generation progress (see status_events)
+
+    Under WSGI each open stream holds a worker thread; serve it with QUIZ_ASYNC_VIEWS under
+    ASGI where many tabs are expected.
+    """
+    get_quiz_or_404(session_id)
+    return event_stream_response(status_events(session_id, request.headers.get('Last-Event-ID')))
+
+
+API_TOKEN_SALT = 'quiz.api'
+
+
+def make_quiz_token(session_id):
+    """Signed token that authorizes answer submission for one quiz through the JSON API"""
+    return signing.dumps({'quiz': session_id}, salt=API_TOKEN_SALT, compress=True)
+
+
+def check_quiz_token(token, session_id):
+    """Whether token was issued for this quiz and has not expired"""
+    max_age = getattr(settings, 'QUIZ_API_TOKEN_MAX_AGE', 24 * 60 * 60)
+    try:
+        payload = signing.loads(token or '', salt=API_TOKEN_SALT, max_age=max_age)
+    except signing.BadSignature:
+        return False
+    return isinstance(payload, dict) and payload.get('quiz') == session_id
+
+
+@require_http_methods(["GET"])
+def quiz_api(request, session_id):
+    """API endpoint returning the whole quiz (without answers) so clients can progress locally
+
+    The response carries a signed token for submitting answers to quiz_answers_api.
+    """
+    try:
+        quiz = get_quiz_or_404(session_id)
+        quiz_session = quiz.session
         data = {
             'quiz_id': session_id,
             'topic': quiz.topic,
             'difficulty': quiz.difficulty,
+            'status': quiz.status,
+            'is_ready': quiz.is_ready,
             'total_questions': quiz.total_questions,
             'current_question_index': quiz_session.current_question_index,
+            'is_completed': quiz_session.is_completed,
+            'token': make_quiz_token(session_id),
+            'questions': [
+                {
+                    'id': question.id,
+                    'order': question.order,
+                    'question': question.question,
+                    'options': question.options,
+                }
+                for question in quiz.questions.all()
+            ],
+        }
+        
+        return JsonResponse(data)
+        
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def quiz_answers_api(request, session_id):
+    """API endpoint grading one or many answers in a single transaction
+
+    Body: {"token": ..., "answers": [{"question_id": 1, "selected_option": 2}, ...]}, or a single
+    {"token": ..., "question_id": ..., "selected_option": ...}. Questions that were already
+    answered are reported in "skipped" and not graded again.
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+        if not isinstance(payload, dict):
+            raise ValueError('Expected a JSON object')
+    except ValueError as e:
+        return JsonResponse({'error': f'Invalid JSON: {e}'}, status=400)
+    
+    # The token stands in for the CSRF check: only clients that fetched the quiz can answer
+    if not check_quiz_token(payload.get('token'), session_id):
+        return JsonResponse({'error': 'Invalid or expired token'}, status=403)
+    
+    submitted = payload.get('answers')
+    if submitted is None:
+        submitted = [payload]
+    try:
+        selections = {}
+        for item in submitted:
+            question_id, selected_option = int(item['question_id']), int(item['selected_option'])
+            if not 0 <= selected_option <= 3:
+                raise ValueError(f'selected_option must be 0-3, got {selected_option}')
+            selections.setdefault(question_id, selected_option)
+    except (TypeError, KeyError, ValueError) as e:
+        return JsonResponse({'error': f'Invalid answers: {e}'}, status=400)
+    
+    try:
+        quiz = get_quiz_or_404(session_id, with_statistics=True)
+        quiz_session = quiz.session
+        stats = quiz_session.statistics
+        
+        questions = quiz.questions.in_bulk(list(selections))
+        unknown = sorted(set(selections) - set(questions))
+        if unknown:
+            return JsonResponse({'error': f'Questions not in this quiz: {unknown}'}, status=400)
+        
+        answered = set(quiz_session.answers.filter(question_id__in=list(selections))
+                       .values_list('question_id', flat=True))
+        graded = [(questions[question_id], selected_option)
+                  for question_id, selected_option in selections.items() if question_id not in answered]
+        
+        completes = quiz.is_ready and stats.total_questions_answered + len(graded) >= quiz.total_questions
+        answers = quiz_repository.record_answers(quiz_session, graded, completes=completes)
+        if answers:
+            invalidate_results(session_id)
+        
+        data = {
+            'quiz_id': session_id,
+            'results': [
+                {
+                    'question_id': answer.question_id,
+                    'selected_option': answer.selected_option,
+                    'is_correct': answer.is_correct,
+                    'correct_answer': answer.question.correct_answer,
+                    'explanation': answer.question.explanation,
+                }
+                for answer in answers
+            ],
+            'skipped': sorted(answered),
             'current_score': quiz_session.current_score,
             'is_completed': quiz_session.is_completed,
             'statistics': {
@@ -287,5 +615,74 @@ def quiz_status(request, session_id):
         
         return JsonResponse(data)
         
+    except IntegrityError:
+        # A concurrent submission stored one of these answers first
+        return JsonResponse({'error': 'Answers were submitted concurrently, please retry'}, status=409)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
+
+
+@require_http_methods(["GET"])
+def generation_status(request, session_id):
+    """API endpoint to poll quiz generation progress
+
+    Answers at once: a long-poll would hold a sync worker for its whole wait, so ?wait= is
+    only honoured by the async view (QUIZ_ASYNC_VIEWS).
+    """
+    try:
+        quiz = get_object_or_404(Quiz, session_id=session_id)
+        expire_stale_generation(quiz)
+        questions_generated = quiz.questions.count()
+        
+        data = {
+            'quiz_id': session_id,
+            'status': quiz.status,
+            'is_ready': quiz.is_ready,
+            'total_questions': quiz.total_questions,
+            'questions_generated': questions_generated,
+            'time_to_first_question': quiz.time_to_first_question,
+            'error': quiz.error_message or None,
+        }
+        
+        return JsonResponse(data)
+        
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@require_http_methods(["GET"])
+def generation_cache_stats(request):
+    """API endpoint exposing generation cache hit/miss counters for this process"""
+    flights = (generation_flight, async_generation_flight)
+    coalescing = {
+        'leaders': sum(flight.leaders for flight in flights),
+        'coalesced': sum(flight.followers for flight in flights),
+        'in_flight': sum(flight.in_flight() for flight in flights),
+    }
+    
+    cache = get_generation_cache()
+    if cache is None:
+        return JsonResponse({'enabled': False, 'single_flight': coalescing})
+    
+    return JsonResponse(dict(enabled=True, single_flight=coalescing, **cache.stats()))
+
+
+@require_http_methods(["GET"])
+def llm_status(request):
+    """API endpoint exposing circuit breaker state, trip counts, call-slot usage and backend latencies for this process"""
+    data = ai_quiz_service.guard.snapshot()
+    # Read from __dict__ so reporting does not set the model up
+    model = ai_quiz_service.__dict__.get('model')
+    if isinstance(model, LLMRouter):
+        data['backends'] = model.snapshot()
+    return JsonResponse(data)
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """Prometheus scrape endpoint for this process's quiz metrics"""
+    if not metrics.endpoint_enabled():
+        return HttpResponse(status=404)
+    
+    body = metrics.registry.render(metrics.render_breaker_gauges(ai_quiz_service.guard.snapshot()))
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
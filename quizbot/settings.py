@@ -52,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "quiz.middleware.MetricsMiddleware",  # Per-view latency and query counts (QUIZ_METRICS_ENABLED)
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # Add WhiteNoise for static files
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -87,6 +88,9 @@ WSGI_APPLICATION = "quizbot.wsgi.application"
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 # Use PostgreSQL in production, SQLite in development
+# SQLite transactions take the write lock when they begin and wait up to SQLITE_TIMEOUT seconds
+# for it (see quizbot/sqlite/base.py), so concurrent workers queue rather than fail
+SQLITE_TIMEOUT = config('SQLITE_TIMEOUT', default=20, cast=int)
 try:
     if config('DATABASE_URL', default=None):
         # Production database (PostgreSQL)
@@ -102,16 +106,18 @@ try:
         # Development database (SQLite)
         DATABASES = {
             "default": {
-                "ENGINE": "django.db.backends.sqlite3",
+                "ENGINE": "quizbot.sqlite",
                 "NAME": BASE_DIR / "db.sqlite3",
+                "OPTIONS": {"timeout": SQLITE_TIMEOUT},
             }
         }
 except ImportError:
     # Fallback to SQLite if dj_database_url is not available
     DATABASES = {
         "default": {
-            "ENGINE": "django.db.backends.sqlite3",
+            "ENGINE": "quizbot.sqlite",
             "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": {"timeout": SQLITE_TIMEOUT},
         }
     }
 
@@ -169,3 +175,141 @@ GOOGLE_GENERATIVE_AI_API_KEY = config('GOOGLE_GENERATIVE_AI_API_KEY', default='y
 
 # Template directories
 TEMPLATES[0]['DIRS'] = [BASE_DIR / 'templates']
+
+# Logging: quiz.metrics writes one JSON line per LLM call, generation and request at INFO
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'quiz': {'handlers': ['console'], 'level': config('QUIZ_LOG_LEVEL', default='INFO')},
+        'quiz.metrics': {'level': config('QUIZ_METRICS_LOG_LEVEL', default='WARNING')},
+    },
+}
+
+# Metrics: counters and histograms served at /metrics in the Prometheus text format
+QUIZ_METRICS_ENABLED = config('QUIZ_METRICS_ENABLED', default=True, cast=bool)
+# /metrics is unauthenticated and reports only the worker process that answers it; keep it off
+# unless each worker is scraped directly on a private address
+QUIZ_METRICS_ENDPOINT = config('QUIZ_METRICS_ENDPOINT', default=False, cast=bool)
+
+# Quiz generation
+# Generate questions on a background thread pool so the POST returns immediately
+QUIZ_ASYNC_GENERATION = config('QUIZ_ASYNC_GENERATION', default=True, cast=bool)
+# Serve generate/detail/submit/status with async views; enable when running under ASGI (uvicorn)
+QUIZ_ASYNC_VIEWS = config('QUIZ_ASYNC_VIEWS', default=False, cast=bool)
+QUIZ_GENERATION_WORKERS = config('QUIZ_GENERATION_WORKERS', default=4, cast=int)
+# Lifetime (seconds) of the signed token the JSON quiz API issues for answer submission
+QUIZ_API_TOKEN_MAX_AGE = config('QUIZ_API_TOKEN_MAX_AGE', default=24 * 60 * 60, cast=int)
+# Upper bound (seconds) a client may long-poll the generation status endpoint
+QUIZ_GENERATION_MAX_WAIT = config('QUIZ_GENERATION_MAX_WAIT', default=25, cast=int)
+QUIZ_GENERATION_POLL_INTERVAL = config('QUIZ_GENERATION_POLL_INTERVAL', default=2, cast=float)
+# Server-sent status streams: database poll interval, keep-alive comment interval and lifetime (seconds)
+QUIZ_STATUS_STREAM_INTERVAL = config('QUIZ_STATUS_STREAM_INTERVAL', default=1.0, cast=float)
+QUIZ_STATUS_STREAM_HEARTBEAT = config('QUIZ_STATUS_STREAM_HEARTBEAT', default=15, cast=int)
+QUIZ_STATUS_STREAM_MAX_SECONDS = config('QUIZ_STATUS_STREAM_MAX_SECONDS', default=300, cast=int)
+
+# Generated quiz cache: 'locmem' (per-process LRU), 'django' (cache framework), 'db' or 'none'
+QUIZ_GENERATION_CACHE_BACKEND = config('QUIZ_GENERATION_CACHE_BACKEND', default='locmem')
+QUIZ_GENERATION_CACHE_TTL = config('QUIZ_GENERATION_CACHE_TTL', default=24 * 60 * 60, cast=int)
+QUIZ_GENERATION_CACHE_MAX_ENTRIES = config('QUIZ_GENERATION_CACHE_MAX_ENTRIES', default=1000, cast=int)
+# 'payload' rebuilds questions from the cached quiz, 'clone' copies the rows of the source quiz
+QUIZ_GENERATION_CACHE_MODE = config('QUIZ_GENERATION_CACHE_MODE', default='payload')
+
+# Rendered results pages, cached per session and invalidated when the session is answered or restarted;
+# only used when the alias is shared by all workers (not the default local-memory cache)
+QUIZ_RESULTS_CACHE_ALIAS = config('QUIZ_RESULTS_CACHE_ALIAS', default='default')
+# Seconds a rendered results page is kept (0 disables the results cache)
+QUIZ_RESULTS_CACHE_TTL = config('QUIZ_RESULTS_CACHE_TTL', default=60 * 60, cast=int)
+
+# Retention (purge_quizzes): days of inactivity after which unfinished and completed quizzes are
+# deleted (0 keeps them), and quizzes deleted per transaction
+QUIZ_RETENTION_INCOMPLETE_DAYS = config('QUIZ_RETENTION_INCOMPLETE_DAYS', default=7, cast=float)
+QUIZ_RETENTION_COMPLETED_DAYS = config('QUIZ_RETENTION_COMPLETED_DAYS', default=90, cast=float)
+QUIZ_PURGE_BATCH_SIZE = config('QUIZ_PURGE_BATCH_SIZE', default=500, cast=int)
+
+# Admin changelists over tables with at least this many rows show the planner's row estimate
+# instead of running COUNT(*) (unfiltered lists only)
+QUIZ_ADMIN_COUNT_ESTIMATE_THRESHOLD = config('QUIZ_ADMIN_COUNT_ESTIMATE_THRESHOLD', default=100_000, cast=int)
+
+# Generation admission control: a per-client token bucket charged one token per question the model
+# has to generate (capacity 0, the default, disables it), and a cap on quizzes pending or generating
+# across all workers (0 disables it). The buckets live in the cache alias when it is shared by all
+# workers, otherwise in the database. Behind a platform proxy (Railway, Render, Heroku) set
+# QUIZ_RATE_LIMIT_TRUSTED_PROXIES=1 when enabling the bucket, or every client shares the proxy's
+QUIZ_RATE_LIMIT_CAPACITY = config('QUIZ_RATE_LIMIT_CAPACITY', default=0, cast=int)
+QUIZ_RATE_LIMIT_PER_MINUTE = config('QUIZ_RATE_LIMIT_PER_MINUTE', default=20, cast=float)
+QUIZ_RATE_LIMIT_CACHE_ALIAS = config('QUIZ_RATE_LIMIT_CACHE_ALIAS', default='default')
+QUIZ_RATE_LIMIT_TRUSTED_PROXIES = config('QUIZ_RATE_LIMIT_TRUSTED_PROXIES', default=0, cast=int)
+QUIZ_ADMISSION_MAX_IN_FLIGHT = config('QUIZ_ADMISSION_MAX_IN_FLIGHT', default=50, cast=int)
+QUIZ_ADMISSION_RETRY_AFTER = config('QUIZ_ADMISSION_RETRY_AFTER', default=15, cast=int)
+QUIZ_ADMISSION_STALE_SECONDS = config('QUIZ_ADMISSION_STALE_SECONDS', default=600, cast=int)
+
+# Single-flight coalescing of identical concurrent generations
+# Lock files used to coordinate worker processes when the generation cache is shared ('django' or 'db')
+QUIZ_SINGLEFLIGHT_LOCK_DIR = config('QUIZ_SINGLEFLIGHT_LOCK_DIR', default=None)
+QUIZ_SINGLEFLIGHT_TIMEOUT = config('QUIZ_SINGLEFLIGHT_TIMEOUT', default=120, cast=int)
+
+# Question bank of pre-generated questions for popular topics
+QUIZ_BANK_ENABLED = config('QUIZ_BANK_ENABLED', default=True, cast=bool)
+QUIZ_BANK_HOT_TOPICS = config('QUIZ_BANK_HOT_TOPICS', default='', cast=Csv())
+QUIZ_BANK_DIFFICULTIES = ['easy', 'medium', 'hard']
+QUIZ_BANK_LOW_WATER_MARK = config('QUIZ_BANK_LOW_WATER_MARK', default=40, cast=int)
+QUIZ_BANK_BATCH_SIZE = config('QUIZ_BANK_BATCH_SIZE', default=10, cast=int)
+
+# Stream generation and persist each question as it arrives, so question 1 is playable early
+QUIZ_STREAMING_GENERATION = config('QUIZ_STREAMING_GENERATION', default=True, cast=bool)
+
+# Answer with the deterministic fake model instead of Gemini (load tests against a running server)
+QUIZ_FAKE_LLM = config('QUIZ_FAKE_LLM', default=False, cast=bool)
+QUIZ_FAKE_LLM_LATENCY = config('QUIZ_FAKE_LLM_LATENCY', default=0.5, cast=float)
+
+# Resilience around LLM calls: per-call deadline (seconds), retries of transient errors with
+# jittered exponential backoff, a per-process cap on concurrent calls (and how long to wait for
+# a free slot), and a circuit breaker that fails fast after consecutive failures until the reset
+QUIZ_LLM_TIMEOUT = config('QUIZ_LLM_TIMEOUT', default=30, cast=float)
+QUIZ_LLM_RETRIES = config('QUIZ_LLM_RETRIES', default=2, cast=int)
+QUIZ_LLM_RETRY_BACKOFF = config('QUIZ_LLM_RETRY_BACKOFF', default=0.5, cast=float)
+QUIZ_LLM_MAX_CONCURRENCY = config('QUIZ_LLM_MAX_CONCURRENCY', default=8, cast=int)
+QUIZ_LLM_ACQUIRE_TIMEOUT = config('QUIZ_LLM_ACQUIRE_TIMEOUT', default=5, cast=float)
+QUIZ_LLM_BREAKER_THRESHOLD = config('QUIZ_LLM_BREAKER_THRESHOLD', default=5, cast=int)
+QUIZ_LLM_BREAKER_RESET = config('QUIZ_LLM_BREAKER_RESET', default=30, cast=float)
+
+# LLM backends, in order of preference until latencies are measured: gemini, openai (any
+# OpenAI-compatible /chat/completions endpoint) and offline (the fake model). With several, calls
+# are routed to the fastest healthy backend, and a call slower than that backend's
+# QUIZ_LLM_HEDGE_PERCENTILE latency (QUIZ_LLM_HEDGE_DELAY seconds until measured) is also sent
+# to the next one; the first answer wins
+QUIZ_LLM_BACKENDS = config('QUIZ_LLM_BACKENDS', default='gemini', cast=Csv())
+QUIZ_GEMINI_MODEL = config('QUIZ_GEMINI_MODEL', default='gemini-1.5-flash')
+QUIZ_OPENAI_BASE_URL = config('QUIZ_OPENAI_BASE_URL', default='')
+QUIZ_OPENAI_MODEL = config('QUIZ_OPENAI_MODEL', default='gpt-4o-mini')
+QUIZ_OPENAI_API_KEY = config('QUIZ_OPENAI_API_KEY', default='')
+QUIZ_LLM_ROUTER_WINDOW = config('QUIZ_LLM_ROUTER_WINDOW', default=100, cast=int)
+QUIZ_LLM_ROUTER_MAX_ERROR_RATE = config('QUIZ_LLM_ROUTER_MAX_ERROR_RATE', default=0.5, cast=float)
+QUIZ_LLM_HEDGE = config('QUIZ_LLM_HEDGE', default=True, cast=bool)
+QUIZ_LLM_HEDGE_PERCENTILE = config('QUIZ_LLM_HEDGE_PERCENTILE', default=95, cast=float)
+QUIZ_LLM_HEDGE_DELAY = config('QUIZ_LLM_HEDGE_DELAY', default=2.0, cast=float)
+
+# Split quizzes of more than QUIZ_GENERATION_CHUNK_THRESHOLD questions into balanced concurrent
+# sub-requests of at most QUIZ_GENERATION_CHUNK_SIZE questions (0 disables chunking)
+QUIZ_GENERATION_CHUNK_SIZE = config('QUIZ_GENERATION_CHUNK_SIZE', default=5, cast=int)
+QUIZ_GENERATION_CHUNK_THRESHOLD = config('QUIZ_GENERATION_CHUNK_THRESHOLD', default=10, cast=int)
+QUIZ_GENERATION_CHUNK_CONCURRENCY = config('QUIZ_GENERATION_CHUNK_CONCURRENCY', default=4, cast=int)
+QUIZ_GENERATION_CHUNK_RETRIES = config('QUIZ_GENERATION_CHUNK_RETRIES', default=1, cast=int)
+
+# Response format asked of the model: 'compact' (a minified array of short-key questions, fewer
+# output tokens) or 'verbose' (the full quiz object); either is parsed. Token counts in the
+# generation metrics are estimated at QUIZ_CHARS_PER_TOKEN characters per token
+QUIZ_RESPONSE_FORMAT = config('QUIZ_RESPONSE_FORMAT', default='verbose')
+QUIZ_CHARS_PER_TOKEN = config('QUIZ_CHARS_PER_TOKEN', default=4.0, cast=float)
+
+# Near-duplicate questions (shingle Jaccard similarity at or above the threshold, 0 disables) are
+# dropped and regenerated; QUIZ_DEDUP_STORED also compares with the topic's earlier questions
+QUIZ_DEDUP_THRESHOLD = config('QUIZ_DEDUP_THRESHOLD', default=0.6, cast=float)
+QUIZ_DEDUP_REGENERATE_ATTEMPTS = config('QUIZ_DEDUP_REGENERATE_ATTEMPTS', default=1, cast=int)
+QUIZ_DEDUP_STORED = config('QUIZ_DEDUP_STORED', default=False, cast=bool)
+QUIZ_DEDUP_TOPIC_LIMIT = config('QUIZ_DEDUP_TOPIC_LIMIT', default=5000, cast=int)
+QUIZ_DEDUP_INDEX_TTL = config('QUIZ_DEDUP_INDEX_TTL', default=600, cast=int)
@@ -0,0 +1,19 @@
+"""
+SQLite backend for several worker processes sharing one database file
+Transactions begin IMMEDIATE, so an atomic block that reads before it writes (drawing from the
+question bank, then creating the quiz) takes the write lock up front and waits out the busy
+timeout (OPTIONS['timeout']) instead of failing with "database is locked" when it upgrades
+its read lock. WAL journaling lets readers carry on while a writer holds that lock.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def init_connection_state(self):
+        super().init_connection_state()
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')